@@ -0,0 +1,121 @@
+"""
+Benchmark: latencia de lectura de la trazabilidad con cada almacén.
+
+Siembra N lotes con P procesos (cada uno con un control y un transporte) en
+un fichero SQLite temporal y mide ``LoteService.obtener_trazabilidad`` y la
+búsqueda por código con los backends ``orm``, ``memoria`` y ``cache`` (caché
+local de Django). Con los almacenes se mide la primera pasada, que compone y
+guarda cada documento, y una segunda con todos los documentos guardados.
+
+    python benchmarks/bench_almacen_trazas.py [N] [PROCESOS_POR_LOTE] [LECTURAS]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+from django.conf import settings
+
+
+def preparar(directorio, n, procesos_por_lote):
+    settings.DATABASES['default']['NAME'] = str(Path(directorio) / 'bench.sqlite3')
+    settings.DATABASE_READ_REPLICAS = {}
+    settings.SNAPSHOT_ROOT = Path(directorio) / 'snapshots'
+    settings.AUDITORIA = {'ACTIVA': False}
+    # Caché local sin el límite de 300 entradas por defecto
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 10 * n},
+    }}
+    django.setup()
+    from django.core.management import call_command
+    from django.db import transaction
+    from django.utils import timezone
+    from core.models import ControlCalidad, LoteCultivo, ProcesoTransformacion, Transporte
+    from core.repositories import ControlCalidadRepository
+
+    call_command('migrate', 'core', verbosity=0)
+    ahora = timezone.now()
+    with transaction.atomic():
+        lotes = LoteCultivo.objects.bulk_create([
+            LoteCultivo(
+                codigo_lote=f'T-{i:07d}', finca=f'Finca {i % 50}', variedad='Kent', hectareas='1.50',
+                fecha_siembra=date(2025, 1, 1), fecha_cosecha=date(2025, 6, 1), responsable='Responsable',
+            )
+            for i in range(n)
+        ], batch_size=5000)
+        procesos = ProcesoTransformacion.objects.bulk_create([
+            ProcesoTransformacion(
+                lote=lote, fecha_lavado=ahora, responsable_lavado='Luis', metodo_lavado='Inmersion',
+                fecha_empaquetado=ahora + timedelta(hours=2), tipo_empaque='Caja', cantidad_empaquetada=10,
+                unidad_medida='kg'
+            )
+            for lote in lotes for _ in range(procesos_por_lote)
+        ], batch_size=5000)
+        ControlCalidadRepository.crear_varios([
+            {'proceso_id': p.id, 'inspector': 'Eva', 'estado': ControlCalidad.APROBADO,
+             'ph': Decimal('4.0'), 'brix': Decimal('14.0')}
+            for p in procesos
+        ])
+        Transporte.objects.bulk_create([
+            Transporte(
+                lote_id=p.lote_id, proceso=p, fecha_salida=ahora, fecha_entrega=ahora + timedelta(hours=30),
+                vehiculo='ABC-123', conductor='Juan', destino='Lima',
+                temperatura_minima=Decimal('10.0'), temperatura_maxima=Decimal('14.0'),
+                temperatura_promedio=Decimal('12.0'), recibido_por='Rosa', estado_entrega='ENTREGADO'
+            )
+            for p in procesos
+        ], batch_size=5000)
+    return [(lote.id, lote.codigo_lote) for lote in lotes]
+
+
+def medir(nombre, funcion, muestras):
+    inicio = time.perf_counter()
+    for muestra in muestras:
+        resultado, mensaje = funcion(muestra)
+        assert resultado, mensaje
+    duracion = (time.perf_counter() - inicio) / len(muestras)
+    print(f'{nombre:<40} {duracion * 1000:>8.3f} ms/lectura')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    procesos_por_lote = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    lecturas = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    with tempfile.TemporaryDirectory() as directorio:
+        lotes = preparar(directorio, n, procesos_por_lote)
+        from business.services import LoteService
+        from core import almacen_trazas
+
+        azar = random.Random(1)
+        # Lecturas concentradas en un subconjunto caliente, como los QR recién impresos
+        calientes = azar.sample(lotes, min(len(lotes), lecturas // 4))
+        muestras = [azar.choice(calientes) for _ in range(lecturas)]
+        print(f'{n} lotes, {procesos_por_lote} procesos por lote, {lecturas} lecturas '
+              f'sobre {len(calientes)} lotes')
+
+        for backend in ('orm', 'memoria', 'cache'):
+            settings.ALMACEN_TRAZAS = {'BACKEND': backend, 'MAX_DOCUMENTOS': len(calientes)}
+            almacen_trazas.reiniciar()
+            medir(f'{backend}: por id (primera pasada)',
+                  lambda m: LoteService.obtener_trazabilidad(m[0]), muestras)
+            medir(f'{backend}: por id (documentos guardados)',
+                  lambda m: LoteService.obtener_trazabilidad(m[0]), muestras)
+            medir(f'{backend}: por código',
+                  lambda m: LoteService.obtener_trazabilidad_por_codigo(m[1]), muestras)
+            print(f'  {almacen_trazas.almacen_trazas().metricas()}')
+
+        # Mismo documento por ambos caminos
+        lote_id = muestras[0][0]
+        assert LoteService.obtener_trazabilidad(lote_id)[0] == LoteService.componer_trazabilidad(lote_id)
+
+
+if __name__ == '__main__':
+    main()
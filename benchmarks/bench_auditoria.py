@@ -0,0 +1,105 @@
+"""
+Benchmark: coste de la auditoría en las escrituras con un historial grande.
+
+Rellena ``RegistroAuditoria`` con N filas y mide, sobre un fichero SQLite
+temporal, cuánto tarda ``LoteRepository.actualizar`` sin auditoría y con
+ella (configuración por defecto), cada actualización en su propia
+transacción y en transacciones de ``POR_TRANSACCION`` actualizaciones (un
+solo INSERT de auditoría por transacción), y cuánto una reconstrucción de la
+trazabilidad.
+
+    python benchmarks/bench_auditoria.py [FILAS_HISTORIAL] [ACTUALIZACIONES]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+from django.conf import settings
+
+LOTES = 1000
+POR_TRANSACCION = 50
+
+
+def preparar(directorio, filas):
+    settings.DATABASES['default']['NAME'] = str(Path(directorio) / 'bench.sqlite3')
+    settings.DATABASE_READ_REPLICAS = {}
+    settings.SNAPSHOT_ROOT = Path(directorio) / 'snapshots'
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from core.models import LoteCultivo
+
+    call_command('migrate', 'core', verbosity=0)
+    LoteCultivo.objects.bulk_create([
+        LoteCultivo(
+            codigo_lote=f'A-{i:07d}', finca=f'Finca {i % 50}', variedad='Kent', hectareas='1.50',
+            fecha_siembra=date(2025, 1, 1), fecha_cosecha=date(2025, 6, 1), responsable='Responsable',
+        )
+        for i in range(LOTES)
+    ])
+    lote_ids = list(LoteCultivo.objects.values_list('id', flat=True))
+    inicio = timezone.now() - timedelta(days=365)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("INSERT INTO core_actorauditoria (nombre) VALUES ('historico')")
+        for desde in range(0, filas, 100_000):
+            cursor.executemany(
+                'INSERT INTO core_registroauditoria (fecha, entidad, objeto_id, lote_id, operacion, actor_id, cambios) '
+                "VALUES (%s, 'L', %s, %s, 'M', 1, '{\"responsable\":\"Historico\"}')",
+                [
+                    (inicio + timedelta(seconds=i), lote_ids[i % LOTES], lote_ids[i % LOTES])
+                    for i in range(desde, min(filas, desde + 100_000))
+                ]
+            )
+    return lote_ids
+
+
+def medir(nombre, lote_ids, actualizaciones, por_transaccion=1):
+    from django.db import transaction
+    from core.repositories import LoteRepository
+
+    inicio = time.perf_counter()
+    for desde in range(0, actualizaciones, por_transaccion):
+        with transaction.atomic():
+            for i in range(desde, min(actualizaciones, desde + por_transaccion)):
+                # Un valor distinto en cada fase: sin cambios no hay entrada de auditoría
+                LoteRepository.actualizar(lote_ids[i % len(lote_ids)], {'responsable': f'{nombre} {i}'})
+    duracion = time.perf_counter() - inicio
+    print(f'{nombre:<44} {duracion / actualizaciones * 1000:>8.3f} ms/actualización')
+    return duracion
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    actualizaciones = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    with tempfile.TemporaryDirectory() as directorio:
+        lote_ids = preparar(directorio, filas)
+        from django.utils import timezone
+        from business.services import AuditoriaService
+        from core.auditoria import auditor
+
+        print(f'{filas} filas de historial, {actualizaciones} actualizaciones')
+        for por_transaccion in (1, POR_TRANSACCION):
+            settings.AUDITORIA = {'ACTIVA': False}
+            sin = medir(f'Sin auditoría ({por_transaccion}/transacción)', lote_ids, actualizaciones, por_transaccion)
+            settings.AUDITORIA = {'ACTIVA': True}
+            con = medir(f'Con auditoría ({por_transaccion}/transacción)', lote_ids, actualizaciones, por_transaccion)
+            print(f'{"Sobrecoste":<44} {(con / sin - 1) * 100:>8.1f} %')
+        print(auditor.metricas())
+
+        inicio = time.perf_counter()
+        resultado, mensaje = AuditoriaService.reconstruir(lote_ids[0], timezone.now())
+        duracion = time.perf_counter() - inicio
+        print(f'{"Reconstrucción de un lote":<44} {duracion * 1000:>8.1f} ms '
+              f'({resultado["entradas_aplicadas"] if resultado else mensaje} entradas)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: una transacción por alta frente a escritura agrupada (group commit).
+
+Varios hilos envían ``POST /api/procesos/`` de uno en uno con el cliente de
+pruebas de Django, como los dispositivos que registran cada alta por
+separado: cada petición pasa por los middlewares, la limitación de ingesta
+(con sus valores por defecto) y la vista, sobre un fichero SQLite temporal
+(con fsync real).
+
+    python benchmarks/bench_escritura_agrupada.py [HILOS] [ALTAS_POR_HILO]
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+from django.conf import settings
+
+
+def preparar(directorio):
+    settings.DATABASES['default']['NAME'] = str(Path(directorio) / 'bench.sqlite3')
+    settings.DATABASE_READ_REPLICAS = {}
+    settings.SNAPSHOT_ROOT = Path(directorio) / 'snapshots'
+    settings.ALLOWED_HOSTS = ['testserver']
+    # Todas las peticiones salen de la misma IP: sin límite de tasa, sí de admisión
+    settings.INGESTA_LIMITES = {'TASA': 1e6, 'RAFAGA': 10 ** 6}
+    django.setup()
+    from django.core.management import call_command
+    from core.models import LoteCultivo
+
+    call_command('migrate', 'core', verbosity=0)
+    return LoteCultivo.objects.create(
+        codigo_lote='BENCH-1', finca='Finca', variedad='Kent', hectareas='1.50',
+        fecha_siembra=date(2025, 1, 1), fecha_cosecha=date(2025, 6, 1), responsable='Responsable',
+    ).id
+
+
+def medir(nombre, lote_id, hilos, altas):
+    from django.db import connection
+    from django.test import Client
+    from presentation.throttling import admision
+
+    lavado = datetime(2025, 6, 2, 8, tzinfo=timezone.utc)
+    cuerpo = json.dumps({
+        'lote_id': lote_id, 'fecha_lavado': lavado.isoformat(), 'responsable_lavado': 'Luis',
+        'metodo_lavado': 'Inmersion', 'fecha_empaquetado': (lavado + timedelta(hours=2)).isoformat(),
+        'tipo_empaque': 'Caja', 'cantidad_empaquetada': 10, 'unidad_medida': 'kg',
+    })
+    errores = []
+
+    def trabajar():
+        cliente = Client()
+        for _ in range(altas):
+            response = cliente.post('/api/procesos/', cuerpo, content_type='application/json')
+            if response.status_code != 201:
+                errores.append(response.status_code)
+        connection.close()
+
+    trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+    inicio = time.perf_counter()
+    for hilo in trabajadores:
+        hilo.start()
+    for hilo in trabajadores:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+    total = hilos * altas - len(errores)
+    print(f'{nombre:<26} {duracion * 1000:>10.1f} ms {total / duracion:>10.0f} altas/s  '
+          f'({len(errores)} errores: {sorted(set(errores))})')
+    print(f'  admisión: {admision.metricas()}')
+    admision.reiniciar()
+
+
+def main():
+    hilos = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    altas = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as directorio:
+        lote_id = preparar(directorio)
+        # Los 429 de la cola de admisión se cuentan; no hace falta su traza
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        print(f'{hilos} hilos x {altas} altas')
+        settings.ESCRITURA_AGRUPADA = {'ACTIVA': False}
+        medir('Transacción por alta', lote_id, hilos, altas)
+        settings.ESCRITURA_AGRUPADA = {'ACTIVA': True, 'MAX_FILAS': 200, 'ESPERA_MS': 2.0}
+        medir('Escritura agrupada', lote_id, hilos, altas)
+        from core.escritura_agrupada import escritor_agrupado
+        print(f'  escritor: {escritor_agrupado.metricas()}')
+
+
+if __name__ == '__main__':
+    main()
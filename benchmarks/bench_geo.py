@@ -0,0 +1,101 @@
+"""
+Benchmark: índice R*Tree frente a recorrer todos los lotes con haversine.
+
+Siembra N lotes con coordenadas repartidas por Perú y compara, para puntos
+al azar, la búsqueda por radio y los k más cercanos de ``GeoService`` con un
+recorrido completo que calcula la distancia a cada lote en Python.
+
+    python benchmarks/bench_geo.py [N] [CONSULTAS]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+from django.conf import settings
+
+# Caja aproximada de Perú
+LATITUDES = (-18.0, -0.5)
+LONGITUDES = (-81.0, -69.0)
+RADIO_KM = 50
+K = 10
+
+
+def preparar(n):
+    settings.DATABASES['default']['NAME'] = ':memory:'
+    settings.DATABASE_READ_REPLICAS = {}
+    django.setup()
+    from django.core.management import call_command
+    from core.models import LoteCultivo
+
+    call_command('migrate', 'core', verbosity=0)
+    azar = random.Random(1)
+    LoteCultivo.objects.bulk_create(
+        [
+            LoteCultivo(
+                codigo_lote=f'G-{i:07d}', finca=f'Finca {i}', variedad='Kent', hectareas='1.50',
+                fecha_siembra=date(2025, 1, 1), fecha_cosecha=date(2025, 6, 1), responsable='Responsable',
+                latitud=Decimal(f'{azar.uniform(*LATITUDES):.6f}'),
+                longitud=Decimal(f'{azar.uniform(*LONGITUDES):.6f}'),
+            )
+            for i in range(n)
+        ],
+        batch_size=5000,
+    )
+
+
+def recorrido_completo(lat, lon, radio_km=None, k=None):
+    from business.geo import distancia_km
+    from core.models import LoteCultivo
+
+    filas = []
+    for fila in LoteCultivo.objects.exclude(latitud=None).values(
+        'id', 'codigo_lote', 'finca', 'variedad', 'fecha_cosecha', 'latitud', 'longitud'
+    ):
+        fila['distancia_km'] = distancia_km(lat, lon, float(fila['latitud']), float(fila['longitud']))
+        if radio_km is None or fila['distancia_km'] <= radio_km:
+            filas.append(fila)
+    filas.sort(key=lambda fila: fila['distancia_km'])
+    return filas[:k] if k else filas
+
+
+def medir(nombre, funcion, puntos):
+    inicio = time.perf_counter()
+    total = sum(funcion(lat, lon) for lat, lon in puntos)
+    duracion = (time.perf_counter() - inicio) / len(puntos)
+    print(f'{nombre:<34} {duracion * 1000:>9.2f} ms/consulta  ({total / len(puntos):.1f} filas)')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    consultas = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    preparar(n)
+    from business.services import GeoService
+
+    azar = random.Random(2)
+    puntos = [(azar.uniform(*LATITUDES), azar.uniform(*LONGITUDES)) for _ in range(consultas)]
+    print(f'{n} lotes, {consultas} consultas')
+
+    medir(f'Recorrido completo (radio {RADIO_KM} km)',
+          lambda lat, lon: len(recorrido_completo(lat, lon, radio_km=RADIO_KM)), puntos)
+    medir(f'R*Tree (radio {RADIO_KM} km)',
+          lambda lat, lon: GeoService.buscar_en_radio('lotes', lat, lon, RADIO_KM)[0]['count'], puntos)
+    medir(f'Recorrido completo (k={K})', lambda lat, lon: len(recorrido_completo(lat, lon, k=K)), puntos)
+    medir(f'R*Tree (k={K})', lambda lat, lon: GeoService.mas_cercanos('lotes', lat, lon, K)[0]['count'], puntos)
+
+    # Mismos resultados por ambos caminos
+    lat, lon = puntos[0]
+    esperados = [fila['id'] for fila in recorrido_completo(lat, lon, radio_km=RADIO_KM)]
+    obtenidos = [fila['id'] for fila in GeoService.buscar_en_radio('lotes', lat, lon, RADIO_KM)[0]['resultados']]
+    assert esperados == obtenidos, 'Los resultados del índice no coinciden con el recorrido completo'
+
+
+if __name__ == '__main__':
+    main()
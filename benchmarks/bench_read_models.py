@@ -0,0 +1,76 @@
+"""
+Benchmark: modelos de Django frente a modelos de lectura con __slots__.
+
+Mide el tiempo de construcción y la memoria retenida al cargar N lotes como
+instancias de ``LoteCultivo`` y como ``LoteView`` desde ``values_list()``.
+
+    python benchmarks/bench_read_models.py [N]
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+from django.conf import settings
+
+
+def preparar(n):
+    settings.DATABASES['default']['NAME'] = ':memory:'
+    settings.DATABASE_READ_REPLICAS = {}
+    django.setup()
+    from django.core.management import call_command
+    from core.models import LoteCultivo
+
+    call_command('migrate', 'core', verbosity=0)
+    LoteCultivo.objects.bulk_create(
+        [
+            LoteCultivo(
+                codigo_lote=f'B-{i:07d}', finca=f'Finca {i % 50}', variedad='Kent',
+                hectareas='1.50', fecha_siembra=date(2025, 1, 1), fecha_cosecha=date(2025, 6, 1),
+                responsable='Responsable',
+            )
+            for i in range(n)
+        ],
+        batch_size=5000,
+    )
+
+
+def medir(nombre, cargar):
+    # El tiempo se mide sin tracemalloc, que ralentiza cada asignación
+    gc.collect()
+    inicio = time.perf_counter()
+    resultado = cargar()
+    duracion = time.perf_counter() - inicio
+    filas = len(resultado)
+    del resultado
+
+    gc.collect()
+    tracemalloc.start()
+    resultado = cargar()
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultado
+    print(f'{nombre:<28} {duracion * 1000:>10.1f} ms {memoria / 2**20:>10.1f} MiB  ({filas} filas)')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    preparar(n)
+    from core.models import LoteCultivo
+    from core.read_models import LoteView
+
+    print(f'{"Carga de " + str(n) + " lotes":<28} {"tiempo":>13} {"memoria":>14}')
+    medir('LoteCultivo (modelo)', lambda: list(LoteCultivo.objects.all()))
+    medir('LoteCultivo .only()', lambda: list(LoteCultivo.objects.only(*LoteView.CAMPOS)))
+    medir('LoteView (values_list)', lambda: [LoteView(*f) for f in LoteCultivo.objects.values_list(*LoteView.CAMPOS)])
+
+
+if __name__ == '__main__':
+    main()
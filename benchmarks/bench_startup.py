@@ -0,0 +1,70 @@
+"""
+Benchmark de arranque en frío: tiempo, RSS e importaciones más costosas.
+
+Lanza un proceso nuevo por perfil de settings que hace lo mismo que un
+worker WSGI antes de atender la primera petición (``django.setup()`` y
+carga de las URLs) y resume el informe de ``python -X importtime``.
+
+    python benchmarks/bench_startup.py [settings ...] > benchmarks/startup_importtime.txt
+"""
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+REPETICIONES = 15
+TOP = 15
+
+ARRANQUE = """
+import os, resource, time
+inicio = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+duracion = time.perf_counter() - inicio
+print(f'{duracion:.6f} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}')
+"""
+
+
+def ejecutar(settings, importtime=False):
+    entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings, 'PYTHONPATH': str(RAIZ)}
+    comando = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', ARRANQUE]
+    return subprocess.run(comando, cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True)
+
+
+def importaciones_costosas(stderr):
+    """Módulos de primer nivel (importados directamente por el arranque) por tiempo acumulado"""
+    filas = []
+    for linea in stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, modulo = linea.split('|')
+        # El anidamiento se indica con sangría tras el separador
+        if modulo[1:].startswith(' '):
+            continue
+        filas.append((int(acumulado), modulo.strip()))
+    return sorted(filas, reverse=True)
+
+
+def main():
+    perfiles = sys.argv[1:] or ['config.settings', 'config.settings_api']
+    for settings in perfiles:
+        tiempos, rss = [], []
+        for _ in range(REPETICIONES):
+            duracion, memoria = ejecutar(settings).stdout.split()
+            tiempos.append(float(duracion) * 1000)
+            rss.append(int(memoria) / 1024)
+        print(f'== {settings}')
+        print(f'arranque (mediana de {REPETICIONES}): {statistics.median(tiempos):.1f} ms')
+        print(f'RSS máximo: {statistics.median(rss):.1f} MiB')
+        print(f'importaciones de primer nivel más costosas (acumulado, us):')
+        for acumulado, modulo in importaciones_costosas(ejecutar(settings, importtime=True).stderr)[:TOP]:
+            print(f'  {acumulado:>9}  {modulo}')
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Central de eventos en proceso para el seguimiento en vivo de los transportes.
+
+Los servicios publican los cambios de ``Transporte`` (salidas, lecturas de
+temperatura, excursiones y entregas) y la vista SSE los reparte entre los
+suscriptores filtrados por lote o destino, sin consultar la base de datos.
+Los eventos se difunden al confirmarse la transacción y se guardan en un
+historial corto, para que un cliente que se reconecta con ``Last-Event-ID``
+recupere lo que se perdió.
+
+La central vive en la memoria del proceso: con varios workers ASGI cada uno
+sólo ve los eventos publicados en él.
+"""
+import asyncio
+import itertools
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+CONFIGURACION_POR_DEFECTO = {
+    'MAX_SUSCRIPTORES': 1000,   # conexiones SSE simultáneas por proceso
+    'COLA_MAXIMA': 100,         # eventos pendientes por suscriptor antes de desconectarlo
+    'HISTORIAL': 500,           # eventos recientes para reanudar con Last-Event-ID
+    'KEEPALIVE': 15.0,          # segundos entre comentarios de mantenimiento
+    'DURACION_MAXIMA': 300.0,   # segundos antes de cerrar y forzar la reconexión
+    'RECONEXION_MS': 3000,      # espera sugerida al navegador para reconectar
+}
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'EVENTOS_TRANSPORTE', {})}
+
+
+def normalizar_destino(destino: str) -> str:
+    return ' '.join(destino.split()).casefold()
+
+
+class Suscripcion:
+    """Cola de un cliente SSE, ligada al bucle de eventos que la atiende"""
+
+    __slots__ = ('bucle', 'cola', 'lote_id', 'destino', 'desbordada')
+
+    def __init__(self, bucle, maximo: int, lote_id: Optional[int], destino: Optional[str]):
+        self.bucle = bucle
+        self.cola = asyncio.Queue(maxsize=maximo)
+        self.lote_id = lote_id
+        self.destino = normalizar_destino(destino) if destino else None
+        self.desbordada = False
+
+    @property
+    def clave(self):
+        if self.lote_id is not None:
+            return ('lote', self.lote_id)
+        if self.destino:
+            return ('destino', self.destino)
+        return None
+
+    def acepta(self, evento: Dict[str, Any]) -> bool:
+        if self.lote_id is not None and evento['lote_id'] != self.lote_id:
+            return False
+        if self.destino and normalizar_destino(evento['destino']) != self.destino:
+            return False
+        return True
+
+    def entregar(self, evento: Dict[str, Any]) -> None:
+        """Se ejecuta en el bucle del suscriptor; un cliente lento se desconecta"""
+        if self.desbordada:
+            return
+        if self.cola.full():
+            # Vaciar y cerrar: el cliente reconecta y recupera con Last-Event-ID
+            self.desbordada = True
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(None)
+            return
+        self.cola.put_nowait(evento)
+
+
+class CentralEventos:
+    """Publicación y suscripción de eventos de transporte dentro del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self._ids = itertools.count(1)
+            self._historial = deque(maxlen=configuracion()['HISTORIAL'])
+            self._por_clave: Dict[Any, set] = {}
+            self._total = 0
+            self.publicados = 0
+            self.desconectados = 0
+
+    def publicar(self, tipo: str, transporte, **datos) -> None:
+        """Difunde el evento cuando se confirme la transacción en curso"""
+        evento = {
+            'tipo': tipo,
+            'transporte_id': transporte.id,
+            'lote_id': transporte.lote_id,
+            'destino': transporte.destino,
+            'fecha': timezone.now().isoformat(),
+            'datos': datos,
+        }
+        transaction.on_commit(lambda: self._difundir(evento))
+
+    def _difundir(self, evento: Dict[str, Any]) -> None:
+        with self._lock:
+            evento['id'] = next(self._ids)
+            self._historial.append(evento)
+            self.publicados += 1
+            claves = (None, ('lote', evento['lote_id']), ('destino', normalizar_destino(evento['destino'])))
+            destinatarios = [s for clave in claves for s in self._por_clave.get(clave, ())]
+        for suscripcion in destinatarios:
+            if not suscripcion.acepta(evento):
+                continue
+            try:
+                suscripcion.bucle.call_soon_threadsafe(suscripcion.entregar, evento)
+            except RuntimeError:
+                # Bucle cerrado: el servidor terminó sin cancelar la suscripción
+                self.cancelar(suscripcion)
+
+    def suscribir(self, lote_id: Optional[int] = None, destino: Optional[str] = None,
+                  ultimo_id: Optional[int] = None) -> Optional[Suscripcion]:
+        """Crea una suscripción en el bucle actual; None si se alcanzó el máximo"""
+        config = configuracion()
+        suscripcion = Suscripcion(asyncio.get_running_loop(), config['COLA_MAXIMA'], lote_id, destino)
+        with self._lock:
+            if self._total >= config['MAX_SUSCRIPTORES']:
+                return None
+            self._por_clave.setdefault(suscripcion.clave, set()).add(suscripcion)
+            self._total += 1
+            pendientes = []
+            if ultimo_id is not None:
+                pendientes = [e for e in self._historial if e['id'] > ultimo_id and suscripcion.acepta(e)]
+        for evento in pendientes[-config['COLA_MAXIMA']:]:
+            suscripcion.entregar(evento)
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion) -> None:
+        with self._lock:
+            grupo = self._por_clave.get(suscripcion.clave)
+            if grupo is None or suscripcion not in grupo:
+                return
+            grupo.discard(suscripcion)
+            if not grupo:
+                del self._por_clave[suscripcion.clave]
+            self._total -= 1
+            self.desconectados += suscripcion.desbordada
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'suscriptores': self._total,
+                'publicados': self.publicados,
+                'desconectados_por_lentitud': self.desconectados,
+                'ultimo_id': self._historial[-1]['id'] if self._historial else 0,
+            }
+
+
+eventos_transporte = CentralEventos()
@@ -0,0 +1,43 @@
+"""
+Cálculos geográficos para las búsquedas por distancia de fincas y destinos.
+"""
+import math
+from typing import List, Tuple
+
+RADIO_TIERRA_KM = 6371.0088
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180
+# Mitad de la circunferencia: ningún punto está más lejos
+DISTANCIA_MAXIMA_KM = math.pi * RADIO_TIERRA_KM
+
+
+def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia de círculo máximo (haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def cajas_alrededor(lat: float, lon: float, radio_km: float) -> List[Tuple[float, float, float, float]]:
+    """Cajas (min_lat, max_lat, min_lon, max_lon) que cubren el círculo dado
+
+    Se parte en dos si cruza el antimeridiano y abarca todas las longitudes
+    si alcanza un polo.
+    """
+    delta_lat = radio_km / KM_POR_GRADO
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90 or radio_km >= DISTANCIA_MAXIMA_KM:
+        return [(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)]
+
+    # Extensión exacta en longitud de un casquete esférico
+    seno = math.sin(radio_km / RADIO_TIERRA_KM) / math.cos(math.radians(lat))
+    if seno >= 1:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    delta_lon = math.degrees(math.asin(seno))
+    min_lon, max_lon = lon - delta_lon, lon + delta_lon
+    if min_lon < -180:
+        return [(min_lat, max_lat, min_lon + 360, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
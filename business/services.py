@@ -1,12 +1,56 @@
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, Tuple
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
 from decimal import Decimal
+import django
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connections
+from django.utils import timezone
 from core.repositories import (
     LoteRepository, 
     ProcesoRepository, 
-    TransporteRepository
+    ControlCalidadRepository,
+    TransporteRepository,
+    ArchivoRepository,
+    GenealogiaRepository,
+    GeoRepository,
+    AuditoriaRepository,
+    ResumenRepository,
+    VerificacionRepository
 )
+from core.almacen_trazas import almacen_trazas
 from .validators import TraceabilityValidator
+from .eventos import eventos_transporte, normalizar_destino
+from . import geo
+
+
+def resumen_calidad_a_dict(resumen) -> Dict[str, Any]:
+    """Representación JSON de un ResumenCalidadProceso / ResumenCalidadLote"""
+    if not resumen or not resumen.total_controles:
+        return {'controles': 0, 'ratio_aprobacion': None, 'brix': None, 'ph': None}
+    
+    def medida(campo):
+        conteo = getattr(resumen, f'{campo}_conteo')
+        if not conteo:
+            return None
+        return {
+            'promedio': round(float(getattr(resumen, f'{campo}_suma')) / conteo, 2),
+            'min': float(getattr(resumen, f'{campo}_min')),
+            'max': float(getattr(resumen, f'{campo}_max')),
+        }
+    
+    return {
+        'controles': resumen.total_controles,
+        'ratio_aprobacion': round(resumen.aprobados / resumen.total_controles, 4),
+        'brix': medida('brix'),
+        'ph': medida('ph')
+    }
 
 
 class LoteService:
@@ -27,8 +71,12 @@ class LoteService:
                 if not valido:
                     return None, mensaje
             
+            if ArchivoRepository.existe_codigo(data.get('codigo_lote')):
+                return None, "Ya existe un lote archivado con ese código"
+            
             # Crear el lote
             lote = LoteRepository.crear(data)
+            almacen_trazas().escribir([lote.id], LoteService.componer_trazabilidad)
             return {
                 'id': lote.id,
                 'codigo_lote': lote.codigo_lote,
@@ -43,62 +91,96 @@ class LoteService:
     def obtener_trazabilidad(lote_id: int) -> Tuple[Optional[Dict], str]:
         """Obtiene la trazabilidad completa de un lote"""
         try:
-            lote = LoteRepository.obtener_por_id(lote_id)
-            if not lote:
+            trazabilidad = almacen_trazas().obtener(lote_id, LoteService.componer_trazabilidad)
+            if not trazabilidad:
                 return None, "Lote no encontrado"
-            
-            # Verificar trazabilidad completa
-            completa, mensaje = TraceabilityValidator.calcular_trazabilidad_completa(lote_id)
-            
-            # Obtener datos relacionados
-            procesos = ProcesoRepository.obtener_por_lote(lote_id)
-            transportes = TransporteRepository.obtener_por_lote(lote_id)
-            
-            trazabilidad = {
-                'lote': {
-                    'id': lote.id,
-                    'codigo': lote.codigo_lote,
-                    'finca': lote.finca,
-                    'fecha_cosecha': lote.fecha_cosecha.isoformat() if lote.fecha_cosecha else None,
-                    'responsable': lote.responsable,
-                    'variedad': lote.variedad
-                },
-                'procesos': [
-                    {
-                        'id': p.id,
-                        'fecha_lavado': p.fecha_lavado.isoformat() if p.fecha_lavado else None,
-                        'fecha_empaquetado': p.fecha_empaquetado.isoformat() if p.fecha_empaquetado else None,
-                        'tipo_empaque': p.tipo_empaque,
-                        'controles_calidad': [
-                            {
-                                'fecha': c.fecha_control.isoformat() if c.fecha_control else None,
-                                'inspector': c.inspector,
-                                'estado': c.get_estado_display(),
-                                'brix': str(c.brix) if c.brix else None
-                            }
-                            for c in p.controles.all()
-                        ]
-                    }
-                    for p in procesos
-                ],
-                'transportes': [
-                    {
-                        'id': t.id,
-                        'fecha_salida': t.fecha_salida.isoformat() if t.fecha_salida else None,
-                        'fecha_entrega': t.fecha_entrega.isoformat() if t.fecha_entrega else None,
-                        'destino': t.destino,
-                        'temperatura_promedio': float(t.temperatura_promedio) if t.temperatura_promedio else None,
-                        'estado_entrega': t.estado_entrega
-                    }
-                    for t in transportes
-                ],
-                'trazabilidad_completa': completa,
-                'mensaje_estado': mensaje
-            }
-            
             return trazabilidad, "Trazabilidad obtenida exitosamente"
         except Exception as e:
             return None, f"Error al obtener trazabilidad: {str(e)}"
+    
+    @staticmethod
+    def componer_trazabilidad(lote_id: int) -> Optional[Dict]:
+        """Documento de trazabilidad compuesto con el ORM (None si el lote no existe)"""
+        lote = LoteRepository.obtener_vista(lote_id)
+        using = None
+        if not lote:
+            # Lotes de temporadas cerradas: buscar en el archivo
+            using = ArchivoRepository.base_de_lote(lote_id)
+            if using:
+                lote = LoteRepository.obtener_vista(lote_id, using=using)
+        if not lote:
+            return None
+        
+        # Obtener datos relacionados (una consulta por tabla)
+        procesos = ProcesoRepository.vistas_por_lote(lote_id, using=using)
+        controles = ControlCalidadRepository.vistas_por_lote(lote_id, using=using)
+        transportes = TransporteRepository.vistas_por_lote(lote_id, using=using)
+        resumen_lote, resumen_procesos = ControlCalidadRepository.resumenes_por_lote(lote_id, using=using)
+        
+        # Verificar trazabilidad completa
+        completa, mensaje = TraceabilityValidator.evaluar_trazabilidad(
+            lote, procesos, transportes, resumen_lote.aprobados if resumen_lote else 0
+        )
+        
+        return {
+            'lote': {
+                'id': lote.id,
+                'codigo': lote.codigo_lote,
+                'finca': lote.finca,
+                'fecha_cosecha': lote.fecha_cosecha.isoformat() if lote.fecha_cosecha else None,
+                'responsable': lote.responsable,
+                'variedad': lote.variedad
+            },
+            'procesos': [
+                {
+                    'id': p.id,
+                    'fecha_lavado': p.fecha_lavado.isoformat() if p.fecha_lavado else None,
+                    'fecha_empaquetado': p.fecha_empaquetado.isoformat() if p.fecha_empaquetado else None,
+                    'tipo_empaque': p.tipo_empaque,
+                    'controles_calidad': [
+                        {
+                            'fecha': c.fecha_control.isoformat() if c.fecha_control else None,
+                            'inspector': c.inspector,
+                            'estado': c.estado_display,
+                            'brix': str(c.brix) if c.brix else None
+                        }
+                        for c in controles.get(p.id, [])
+                    ],
+                    'resumen_calidad': resumen_calidad_a_dict(resumen_procesos.get(p.id))
+                }
+                for p in procesos
+            ],
+            'transportes': [
+                {
+                    'id': t.id,
+                    'fecha_salida': t.fecha_salida.isoformat() if t.fecha_salida else None,
+                    'fecha_entrega': t.fecha_entrega.isoformat() if t.fecha_entrega else None,
+                    'destino': t.destino,
+                    'temperatura_promedio': float(t.temperatura_promedio) if t.temperatura_promedio else None,
+                    'estado_entrega': t.estado_entrega
+                }
+                for t in transportes
+            ],
+            'resumen_calidad': resumen_calidad_a_dict(resumen_lote),
+            'trazabilidad_completa': completa,
+            'mensaje_estado': mensaje,
+            'archivado': using is not None
+        }
+    
+    @staticmethod
+    def obtener_trazabilidad_por_codigo(codigo: str) -> Tuple[Optional[Dict], str]:
+        """Trazabilidad a partir del código impreso en el QR (incluye lotes archivados)"""
+        try:
+            trazabilidad = almacen_trazas().obtener_por_codigo(codigo, LoteService.componer_trazabilidad)
+        except Exception as e:
+            return None, f"Error al obtener trazabilidad: {str(e)}"
+        if trazabilidad:
+            return trazabilidad, "Trazabilidad obtenida exitosamente"
+        lote = LoteRepository.obtener_por_codigo(codigo)
+        lote_id = lote.id if lote else ArchivoRepository.lote_id_por_codigo(codigo)
+        if lote_id is None:
+            return None, "Lote no encontrado"
+        return LoteService.obtener_trazabilidad(lote_id)
 
 
 class TransformacionService:
@@ -121,6 +203,7 @@ class TransformacionService:
             
             # Crear el proceso
             proceso = ProcesoRepository.crear_proceso(data)
+            almacen_trazas().escribir([proceso.lote_id], LoteService.componer_trazabilidad)
             return {
                 'id': proceso.id,
                 'lote_id': proceso.lote_id,
@@ -133,6 +216,32 @@ class TransformacionService:
             return None, f"Error al registrar proceso: {str(e)}"
 
 
+class ControlCalidadService:
+    """Servicio para gestión de Controles de Calidad"""
+    
+    @staticmethod
+    def registrar_controles(datos: List[Dict[str, Any]]) -> Tuple[Optional[Dict], str]:
+        """Registra uno o varios controles de laboratorio en una sola transacción"""
+        try:
+            for control in datos:
+                valido, mensaje = TraceabilityValidator.validar_control_calidad(
+                    control.get('ph'), control.get('brix')
+                )
+                if not valido:
+                    return None, mensaje
+            
+            controles, lote_ids = ControlCalidadRepository.crear_varios(datos)
+            almacen_trazas().escribir(lote_ids, LoteService.componer_trazabilidad)
+            return {
+                'creados': len(controles),
+                'ids': [c.id for c in controles]
+            }, "Controles registrados exitosamente"
+        except ObjectDoesNotExist as e:
+            return None, str(e)
+        except Exception as e:
+            return None, f"Error al registrar controles: {str(e)}"
+
+
 class TransporteService:
     """Servicio para gestión de Transportes"""
     
@@ -150,8 +259,12 @@ class TransporteService:
                     return None, mensaje
             
             # Crear el transporte
-            from core.models import Transporte
-            transporte = Transporte.objects.create(**data)
+            transporte = TransporteRepository.crear(data)
+            almacen_trazas().escribir([transporte.lote_id], LoteService.componer_trazabilidad)
+            eventos_transporte.publicar(
+                'salida', transporte,
+                fecha_salida=transporte.fecha_salida.isoformat() if transporte.fecha_salida else None
+            )
             return {
                 'id': transporte.id,
                 'lote_id': transporte.lote_id,
@@ -166,25 +279,538 @@ class TransporteService:
     def registrar_entrega(transporte_id: int, data: Dict[str, Any]) -> Tuple[Optional[Dict], str]:
         """Registra la entrega final del transporte"""
         try:
-            from core.models import Transporte
-            transporte = Transporte.objects.get(id=transporte_id)
-            
             fecha_entrega = data.get('fecha_entrega')
             if isinstance(fecha_entrega, str):
                 fecha_entrega = datetime.fromisoformat(fecha_entrega.replace('Z', '+00:00'))
             
-            transporte.fecha_entrega = fecha_entrega or datetime.now()
-            transporte.recibido_por = data.get('recibido_por', '')
-            transporte.estado_entrega = data.get('estado_entrega', 'ENTREGADO')
-            transporte.save()
+            transporte = TransporteRepository.registrar_entrega(transporte_id, {
+                'fecha_entrega': fecha_entrega or timezone.now(),
+                'recibido_por': data.get('recibido_por', ''),
+                'estado_entrega': data.get('estado_entrega', 'ENTREGADO'),
+            })
+            if not transporte:
+                return None, "Transporte no encontrado"
+            almacen_trazas().escribir([transporte.lote_id], LoteService.componer_trazabilidad)
+            EstimacionTransporteService.invalidar()
             
-            return {
+            entrega = {
                 'id': transporte.id,
                 'fecha_entrega': transporte.fecha_entrega.isoformat() if transporte.fecha_entrega else None,
                 'recibido_por': transporte.recibido_por,
                 'estado': transporte.estado_entrega
-            }, "Entrega registrada exitosamente"
-        except Transporte.DoesNotExist:
-            return None, "Transporte no encontrado"
+            }
+            eventos_transporte.publicar('entrega', transporte, **entrega)
+            return entrega, "Entrega registrada exitosamente"
+        except Exception as e:
+            return None, f"Error al registrar entrega: {str(e)}"
+    
+    @staticmethod
+    def registrar_temperatura(transporte_id: int, temperatura: Decimal) -> Tuple[Optional[Dict], str]:
+        """Registra una lectura de temperatura en ruta y avisa si sale del rango seguro"""
+        try:
+            transporte = TransporteRepository.registrar_temperatura(transporte_id, temperatura)
+            if not transporte:
+                return None, "Transporte no encontrado"
+            
+            en_rango, mensaje = TraceabilityValidator.validar_temperatura_transporte(temperatura)
+            lectura = {
+                'id': transporte.id,
+                'temperatura': float(temperatura),
+                'temperatura_minima': float(transporte.temperatura_minima),
+                'temperatura_maxima': float(transporte.temperatura_maxima),
+                'excursion': not en_rango
+            }
+            eventos_transporte.publicar('temperatura', transporte, **lectura)
+            if not en_rango:
+                eventos_transporte.publicar('excursion', transporte, temperatura=float(temperatura), motivo=mensaje)
+            return lectura, "Temperatura registrada exitosamente" if en_rango else mensaje
+        except Exception as e:
+            return None, f"Error al registrar temperatura: {str(e)}"
+
+
+class ArchivoService:
+    """Servicio para el archivado de temporadas cerradas"""
+    
+    @staticmethod
+    def archivar(fecha_corte: Optional[date] = None) -> Tuple[Optional[Dict], str]:
+        """Mueve al archivo los lotes cosechados antes del corte con todas sus entregas cerradas"""
+        try:
+            if fecha_corte is None:
+                fecha_corte = date.today() - timedelta(days=settings.ARCHIVO_DIAS_CORTE)
+            
+            por_temporada = ArchivoRepository.candidatos(fecha_corte)
+            archivados = {
+                temporada: ArchivoRepository.archivar_temporada(temporada, lote_ids)
+                for temporada, lote_ids in sorted(por_temporada.items())
+            }
+            # El archivado mueve las filas con SQL directo: auditoría, instantáneas
+            # y almacén reciben ``lotes_archivados``; los contadores se recuentan
+            # ya en lugar de esperar al hilo de reconciliación
+            if por_temporada:
+                ResumenRepository.reconciliar()
+            return {
+                'fecha_corte': fecha_corte.isoformat(),
+                'temporadas': archivados,
+                'total': sum(archivados.values())
+            }, "Archivado completado"
+        except Exception as e:
+            return None, f"Error al archivar: {str(e)}"
+
+
+class EstimacionTransporteService:
+    """Estimación de tiempo de tránsito y riesgo térmico por destino
+
+    Los modelos de todos los destinos se construyen con una consulta que
+    agrega el historial de entregas en SQLite y se guardan en memoria; cada
+    consulta es una búsqueda en un diccionario. Se reconstruyen cuando
+    caducan (``ESTIMACION_TTL_SEGUNDOS``) o tras registrarse una entrega en
+    este proceso (los demás la ven al caducar los suyos); mientras un hilo
+    los reconstruye, el resto sirve los anteriores.
+    """
+    
+    _modelos: Dict[str, Dict[str, Any]] = {}
+    _generado_en: Optional[float] = None
+    _invalidaciones = 0
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def normalizar_destino(destino: str) -> str:
+        return normalizar_destino(destino)
+    
+    @staticmethod
+    def _deciles(horas_en, n: int) -> Dict[str, float]:
+        """p10, mediana y p90 'inclusive' (como ``statistics.quantiles``) y máximo
+
+        ``horas_en(j)`` es la duración en la posición ``j`` del destino
+        ordenado por duración; sólo se piden las posiciones que se usan.
+        """
+        def decil(i):
+            if n == 1:
+                return horas_en(0)
+            j, delta = divmod(i * (n - 1), 10)
+            return horas_en(j) if not delta else (horas_en(j) * (10 - delta) + horas_en(j + 1) * delta) / 10
+        
+        return {
+            'mediana': round(decil(5), 2),
+            'p10': round(decil(1), 2),
+            'p90': round(decil(9), 2),
+            'max': round(horas_en(n - 1), 2),
+        }
+    
+    @classmethod
+    def construir_modelos(cls) -> Dict[str, Dict[str, Any]]:
+        """Modelos de todos los destinos a partir de las muestras que agrega SQLite
+
+        Las variantes de escritura de un destino (mayúsculas, espacios) se
+        ordenan por separado; si un destino tiene varias, sus duraciones se
+        leen juntas para calcular los deciles.
+        """
+        variantes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for destino, n, excursiones, posicion, horas in TransporteRepository.muestras_entregas(
+            TraceabilityValidator.TEMPERATURA_MINIMA, TraceabilityValidator.TEMPERATURA_MAXIMA
+        ):
+            muestra = variantes.setdefault(cls.normalizar_destino(destino), {}).setdefault(
+                destino, {'n': n, 'excursiones': excursiones, 'horas': {}}
+            )
+            muestra['horas'][posicion] = horas
+        
+        modelos = {}
+        for clave, por_destino in variantes.items():
+            n = sum(m['n'] for m in por_destino.values())
+            if len(por_destino) == 1:
+                horas_en = next(iter(por_destino.values()))['horas'].__getitem__
+            else:
+                horas_en = TransporteRepository.horas_entregas(list(por_destino)).__getitem__
+            modelos[clave] = {
+                'destino': min(por_destino),
+                'muestras': n,
+                'transito_horas': cls._deciles(horas_en, n),
+                'probabilidad_excursion': round(sum(m['excursiones'] for m in por_destino.values()) / n, 4),
+            }
+        return modelos
+    
+    @classmethod
+    def _modelos_vigentes(cls) -> Dict[str, Dict[str, Any]]:
+        ttl = settings.ESTIMACION_TTL_SEGUNDOS
+        if cls._generado_en is None or time.monotonic() - cls._generado_en > ttl:
+            # Un solo hilo reconstruye; el resto sigue con los modelos anteriores
+            bloqueante = not cls._modelos
+            if cls._lock.acquire(blocking=bloqueante):
+                try:
+                    if cls._generado_en is None or time.monotonic() - cls._generado_en > ttl:
+                        invalidaciones = cls._invalidaciones
+                        cls._modelos = cls.construir_modelos()
+                        # Una entrega registrada durante la lectura puede no estar en ella
+                        if cls._invalidaciones == invalidaciones:
+                            cls._generado_en = time.monotonic()
+                finally:
+                    cls._lock.release()
+        return cls._modelos
+    
+    @classmethod
+    def invalidar(cls) -> None:
+        """Fuerza la reconstrucción en la próxima consulta (p. ej. tras una entrega)"""
+        cls._invalidaciones += 1
+        cls._generado_en = None
+    
+    @classmethod
+    def estimar(cls, destino: str) -> Tuple[Optional[Dict], str]:
+        """Estimación para un destino a partir de los modelos en caché"""
+        try:
+            modelo = cls._modelos_vigentes().get(cls.normalizar_destino(destino))
+            if not modelo:
+                return None, "Sin historial de entregas para ese destino"
+            return modelo, "Estimación obtenida exitosamente"
+        except Exception as e:
+            return None, f"Error al estimar transporte: {str(e)}"
+
+
+class GenealogiaService:
+    """Servicio para el linaje de lotes repartidos y mezclados"""
+    
+    TIPOS = {'lote': 'L', 'proceso': 'P', 'transporte': 'T'}
+    NOMBRES = {v: k for k, v in TIPOS.items()}
+    
+    @staticmethod
+    def registrar_enlace(data: Dict[str, Any]) -> Tuple[Optional[Dict], str]:
+        """Registra que (parte de) un nodo pasó a otro: reparto o mezcla"""
+        try:
+            origen = (data['origen_tipo'], data['origen_id'])
+            destino = (data['destino_tipo'], data['destino_id'])
+            if origen == destino:
+                return None, "Un nodo no puede enlazarse consigo mismo"
+            for tipo, nodo_id in (origen, destino):
+                if not GenealogiaRepository.existe_nodo(tipo, nodo_id):
+                    return None, f"No existe {GenealogiaService.NOMBRES[tipo]} {nodo_id}"
+            
+            enlace = GenealogiaRepository.crear_enlace(data)
+            return {
+                'id': enlace.id,
+                'origen': f"{enlace.origen_tipo}{enlace.origen_id}",
+                'destino': f"{enlace.destino_tipo}{enlace.destino_id}",
+                'cantidad': float(enlace.cantidad) if enlace.cantidad is not None else None,
+                'unidad_medida': enlace.unidad_medida
+            }, "Enlace registrado exitosamente"
+        except Exception as e:
+            return None, f"Error al registrar enlace: {str(e)}"
+    
+    @staticmethod
+    def obtener_linaje(tipo: str, nodo_id: int, direccion: str) -> Tuple[Optional[Dict], str]:
+        """Todos los nodos aguas abajo ('adelante') o aguas arriba ('atras') de un nodo"""
+        try:
+            codigo = GenealogiaService.TIPOS.get(tipo)
+            if codigo is None or direccion not in ('adelante', 'atras'):
+                return None, "Tipo de nodo o dirección no válidos"
+            alias = GenealogiaRepository.alias_lectura()
+            if not GenealogiaRepository.existe_nodo(codigo, nodo_id, using=alias):
+                return None, f"No existe {tipo} {nodo_id}"
+            
+            nodos = GenealogiaRepository.trazar(
+                codigo, nodo_id, direccion, settings.GENEALOGIA_PROFUNDIDAD_MAXIMA, using=alias
+            )
+            descripcion = GenealogiaRepository.describir_nodos(nodos, using=alias)
+            return {
+                'origen': {'tipo': tipo, 'id': nodo_id},
+                'direccion': direccion,
+                'lotes': descripcion.get('L', []),
+                'procesos': descripcion.get('P', []),
+                'transportes': descripcion.get('T', [])
+            }, "Linaje obtenido exitosamente"
+        except Exception as e:
+            return None, f"Error al obtener linaje: {str(e)}"
+    
+    @staticmethod
+    def consumidores_por_finca(finca: str) -> Tuple[Optional[Dict], str]:
+        """Envíos que recibieron fruta de una finca, a través de cualquier reparto o mezcla"""
+        try:
+            envios = GenealogiaRepository.consumidores_por_finca(
+                finca, settings.GENEALOGIA_PROFUNDIDAD_MAXIMA
+            )
+            return {'finca': finca, 'envios': envios, 'count': len(envios)}, "Consumidores obtenidos exitosamente"
+        except Exception as e:
+            return None, f"Error al obtener consumidores: {str(e)}"
+
+
+class GeoService:
+    """Búsquedas por caja, radio y vecinos más cercanos de fincas y destinos"""
+    
+    RECURSOS = tuple(GeoRepository.INDICES)
+    
+    @staticmethod
+    def _resultado(recurso: str, filas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {'recurso': recurso, 'resultados': filas, 'count': len(filas)}
+    
+    @staticmethod
+    def _con_distancia(recurso: str, filas, lat: float, lon: float) -> List[Dict[str, Any]]:
+        for fila in filas:
+            fila['distancia_km'] = round(
+                geo.distancia_km(lat, lon, *GeoRepository.coordenadas(fila, recurso)), 3
+            )
+        return sorted(filas, key=lambda fila: fila['distancia_km'])
+    
+    @staticmethod
+    def _en_radio(recurso: str, lat: float, lon: float, radio_km: float) -> List[Dict[str, Any]]:
+        filas = [
+            fila
+            for caja in geo.cajas_alrededor(lat, lon, radio_km)
+            for fila in GeoRepository.en_caja(recurso, *caja)
+        ]
+        filas = GeoService._con_distancia(recurso, filas, lat, lon)
+        return [fila for fila in filas if fila['distancia_km'] <= radio_km]
+    
+    @staticmethod
+    def buscar_en_caja(recurso: str, min_lat: float, max_lat: float,
+                       min_lon: float, max_lon: float) -> Tuple[Optional[Dict], str]:
+        """Lotes (por su finca) o transportes (por su destino) dentro de una caja"""
+        try:
+            if recurso not in GeoService.RECURSOS:
+                return None, "Recurso no válido"
+            if min_lat > max_lat:
+                return None, "La caja no es válida"
+            # Una caja con min_lon > max_lon cruza el antimeridiano
+            cajas = [(min_lat, max_lat, min_lon, max_lon)]
+            if min_lon > max_lon:
+                cajas = [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+            limite = settings.GEO_MAX_RESULTADOS
+            filas = [fila for caja in cajas for fila in GeoRepository.en_caja(recurso, *caja, limite=limite)]
+            return GeoService._resultado(recurso, filas[:limite]), "Búsqueda completada"
+        except Exception as e:
+            return None, f"Error en la búsqueda espacial: {str(e)}"
+    
+    @staticmethod
+    def buscar_en_radio(recurso: str, lat: float, lon: float, radio_km: float) -> Tuple[Optional[Dict], str]:
+        """Filas a menos de ``radio_km`` del punto, ordenadas por distancia"""
+        try:
+            if recurso not in GeoService.RECURSOS:
+                return None, "Recurso no válido"
+            filas = GeoService._en_radio(recurso, lat, lon, radio_km)
+            return GeoService._resultado(recurso, filas[:settings.GEO_MAX_RESULTADOS]), "Búsqueda completada"
+        except Exception as e:
+            return None, f"Error en la búsqueda espacial: {str(e)}"
+    
+    @staticmethod
+    def mas_cercanos(recurso: str, lat: float, lon: float, k: int) -> Tuple[Optional[Dict], str]:
+        """Los ``k`` más cercanos al punto
+
+        R*Tree no ordena por distancia: se busca en un radio que se amplía
+        hasta reunir ``k`` filas dentro del círculo (no sólo de la caja).
+        """
+        try:
+            if recurso not in GeoService.RECURSOS:
+                return None, "Recurso no válido"
+            radio = settings.GEO_RADIO_INICIAL_KM
+            while True:
+                filas = GeoService._en_radio(recurso, lat, lon, radio)
+                if len(filas) >= k or radio >= geo.DISTANCIA_MAXIMA_KM:
+                    break
+                radio *= 4
+            return GeoService._resultado(recurso, filas[:k]), "Búsqueda completada"
+        except Exception as e:
+            return None, f"Error en la búsqueda espacial: {str(e)}"
+    
+    @staticmethod
+    def ubicar(tipo: str, nombre: str, latitud, longitud) -> Tuple[Optional[Dict], str]:
+        """Asigna coordenadas a una finca (todos sus lotes) o a un destino (sus transportes)"""
+        try:
+            if tipo == 'finca':
+                actualizados = GeoRepository.ubicar_finca(nombre, latitud, longitud)
+            elif tipo == 'destino':
+                actualizados = GeoRepository.ubicar_destino(nombre, latitud, longitud)
+            else:
+                return None, "Tipo de ubicación no válido"
+            if not actualizados:
+                return None, f"No hay registros con {tipo} {nombre}"
+            return {
+                'tipo': tipo,
+                'nombre': nombre,
+                'latitud': float(latitud),
+                'longitud': float(longitud),
+                'actualizados': actualizados
+            }, "Ubicación registrada exitosamente"
+        except Exception as e:
+            return None, f"Error al registrar ubicación: {str(e)}"
+
+
+class ResumenService:
+    """Cifras del panel servidas desde contadores incrementales, sin COUNT por petición"""
+    
+    @staticmethod
+    def obtener_resumen() -> Tuple[Optional[Dict], str]:
+        try:
+            return {
+                **ResumenRepository.cifras(),
+                'reconciliacion': ResumenRepository.estado_reconciliacion()
+            }, "Resumen obtenido exitosamente"
+        except Exception as e:
+            return None, f"Error al obtener resumen: {str(e)}"
+
+
+class AuditoriaService:
+    """Historial de cambios de un lote y reconstrucción de su trazabilidad en una fecha"""
+    
+    ENTIDADES = {'L': 'lote', 'P': 'proceso', 'C': 'control', 'T': 'transporte'}
+    OPERACIONES = {
+        'C': 'creacion', 'M': 'modificacion', 'E': 'eliminacion', 'B': 'linea_base', 'A': 'archivado'
+    }
+    
+    @staticmethod
+    def historial(lote_id: int, limite: Optional[int] = None) -> Tuple[Optional[Dict], str]:
+        """Últimos cambios del lote y de sus procesos, controles y transportes"""
+        try:
+            limite = min(limite or settings.AUDITORIA_MAX_HISTORIAL, settings.AUDITORIA_MAX_HISTORIAL)
+            entradas = [
+                {
+                    'id': e['id'],
+                    'fecha': e['fecha'].isoformat(),
+                    'entidad': AuditoriaService.ENTIDADES[e['entidad']],
+                    'objeto_id': e['objeto_id'],
+                    'operacion': AuditoriaService.OPERACIONES[e['operacion']],
+                    'actor': e['actor__nombre'],
+                    'cambios': json.loads(e['cambios'])
+                }
+                for e in AuditoriaRepository.historial(lote_id, limite)
+            ]
+            if not entradas:
+                return None, "El lote no tiene historial"
+            return {'lote_id': lote_id, 'entradas': entradas, 'count': len(entradas)}, "Historial obtenido exitosamente"
+        except Exception as e:
+            return None, f"Error al obtener historial: {str(e)}"
+    
+    @staticmethod
+    def reconstruir(lote_id: int, fecha: datetime) -> Tuple[Optional[Dict], str]:
+        """Estado del lote, sus procesos (con controles) y transportes en ``fecha``
+
+        Se reproducen en orden las entradas del lote hasta la fecha; un campo
+        sin entrada (nulo en el alta o anterior a la línea base) vale None.
+        """
+        try:
+            estado: Dict[Tuple[str, int], Dict[str, Any]] = {}
+            entradas = AuditoriaRepository.entradas_hasta(lote_id, fecha)
+            for entidad, objeto_id, operacion, cambios in entradas:
+                if operacion == 'A':
+                    # Sigue existiendo, en el archivo de su temporada
+                    continue
+                if operacion == 'E':
+                    estado.pop((entidad, objeto_id), None)
+                elif operacion in ('C', 'B'):
+                    estado[(entidad, objeto_id)] = {'id': objeto_id, **json.loads(cambios)}
+                else:
+                    estado.setdefault((entidad, objeto_id), {'id': objeto_id}).update(json.loads(cambios))
+            
+            lote = estado.get(('L', lote_id))
+            if lote is None:
+                return None, "El lote no existía o no tiene historial en esa fecha"
+            
+            def de_tipo(entidad):
+                return [datos for (tipo, _), datos in sorted(estado.items()) if tipo == entidad]
+            
+            controles: Dict[Any, List[Dict[str, Any]]] = {}
+            for control in de_tipo('C'):
+                controles.setdefault(control.get('proceso_id'), []).append(control)
+            return {
+                'lote_id': lote_id,
+                'fecha': fecha.isoformat(),
+                'lote': lote,
+                'procesos': [
+                    {**proceso, 'controles_calidad': controles.get(proceso['id'], [])}
+                    for proceso in de_tipo('P')
+                ],
+                'transportes': de_tipo('T'),
+                'entradas_aplicadas': len(entradas)
+            }, "Trazabilidad reconstruida exitosamente"
+        except Exception as e:
+            return None, f"Error al reconstruir trazabilidad: {str(e)}"
+    
+    @staticmethod
+    def registrar_linea_base(tamano: int = 200) -> Tuple[Optional[Dict], str]:
+        """Registra el estado actual de los lotes que aún no tienen historial"""
+        try:
+            lote_ids = AuditoriaRepository.lotes_sin_historial()
+            entradas = 0
+            for inicio in range(0, len(lote_ids), tamano):
+                entradas += AuditoriaRepository.registrar_linea_base(lote_ids[inicio:inicio + tamano])
+            return {'lotes': len(lote_ids), 'entradas': entradas}, "Línea base registrada exitosamente"
+        except Exception as e:
+            return None, f"Error al registrar línea base: {str(e)}"
+
+
+class VerificacionService:
+    """Barrido de completitud de la trazabilidad antes de una ventana de exportación
+
+    El rango de ids de los lotes se reparte en particiones que un pool de
+    procesos evalúa con consultas por conjuntos sobre una instantánea de solo
+    lectura; cada partición cuesta dos consultas, no 3+N por lote.
+    """
+    
+    @staticmethod
+    def particiones(desde: int, hasta: int, total: int) -> List[Tuple[int, int]]:
+        """Reparte [desde, hasta] en como mucho ``total`` rangos contiguos"""
+        tamano = max(1, -(-(hasta - desde + 1) // max(1, total)))
+        return [(inicio, min(inicio + tamano - 1, hasta)) for inicio in range(desde, hasta + 1, tamano)]
+    
+    @staticmethod
+    def verificar_particion(ruta: Path, desde: int, hasta: int,
+                            temporada: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """Evalúa una partición; se ejecuta dentro de los procesos del pool"""
+        alias = VerificacionRepository.alias_instantanea(ruta)
+        verificados, filas = VerificacionRepository.lotes_incompletos(alias, desde, hasta, temporada)
+        incompletos = [
+            {
+                'lote_id': lote_id,
+                'codigo_lote': codigo,
+                'finca': finca,
+                'fecha_cosecha': str(fecha_cosecha),
+                'motivos': TraceabilityValidator.motivos_incompleta(procesos, transportes, aprobados),
+            }
+            for lote_id, codigo, finca, fecha_cosecha, procesos, transportes, aprobados in filas
+        ]
+        return verificados, incompletos
+    
+    @staticmethod
+    def verificar(ruta: Optional[Path] = None, temporada: Optional[int] = None,
+                  procesos: int = 1, particiones: Optional[int] = None) -> Tuple[Optional[Dict], str]:
+        """Verifica todos los lotes (o los de una temporada) y lista los incompletos
+
+        Sin ``ruta`` se toma una instantánea temporal de la primaria, que se
+        borra al terminar; con ``ruta`` se usa esa copia (p. ej. una réplica).
+        """
+        try:
+            with tempfile.TemporaryDirectory() as directorio:
+                if ruta is None:
+                    ruta = Path(directorio) / 'instantanea.sqlite3'
+                    VerificacionRepository.crear_instantanea(ruta)
+                
+                try:
+                    alias = VerificacionRepository.alias_instantanea(ruta)
+                    desde, hasta = VerificacionRepository.rango_ids(alias, temporada)
+                    rangos = []
+                    if desde is not None:
+                        rangos = VerificacionService.particiones(desde, hasta, particiones or procesos * 4)
+                
+                    if procesos <= 1 or len(rangos) <= 1:
+                        resultados = [
+                            VerificacionService.verificar_particion(ruta, inicio, fin, temporada)
+                            for inicio, fin in rangos
+                        ]
+                    else:
+                        # Ninguna conexión abierta debe heredarse en los procesos hijos
+                        connections.close_all()
+                        with ProcessPoolExecutor(max_workers=procesos, initializer=django.setup) as pool:
+                            futuros = [
+                                pool.submit(VerificacionService.verificar_particion, ruta, inicio, fin, temporada)
+                                for inicio, fin in rangos
+                            ]
+                            resultados = [futuro.result() for futuro in futuros]
+                finally:
+                    VerificacionRepository.liberar()
+            
+            incompletos = [lote for _, lotes in resultados for lote in lotes]
+            return {
+                'temporada': temporada,
+                'verificados': sum(verificados for verificados, _ in resultados),
+                'incompletos': incompletos,
+                'particiones': len(rangos),
+                'procesos': procesos
+            }, "Verificación completada"
         except Exception as e:
-            return None, f"Error al registrar entrega: {str(e)}"
\ No newline at end of file
+            return None, f"Error al verificar trazabilidad: {str(e)}"
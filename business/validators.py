@@ -1,11 +1,15 @@
 from datetime import datetime, date
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 from decimal import Decimal
 
 
 class TraceabilityValidator:
     """Validador para reglas de negocio del sistema de trazabilidad"""
     
+    # Rango de temperatura seguro para mangos durante el transporte (°C)
+    TEMPERATURA_MINIMA = Decimal('10')
+    TEMPERATURA_MAXIMA = Decimal('15')
+    
     @staticmethod
     def validar_fechas_cosecha(fecha_siembra, fecha_cosecha) -> Tuple[bool, str]:
         """Valida que las fechas de siembra y cosecha sean coherentes"""
@@ -35,12 +39,21 @@ class TraceabilityValidator:
         elif isinstance(temperatura, (int, float)):
             temperatura = Decimal(str(temperatura))
         
-        if temperatura < Decimal('10'):
+        if temperatura < TraceabilityValidator.TEMPERATURA_MINIMA:
             return False, "Temperatura demasiado baja para mangos (mínimo 10°C)"
-        if temperatura > Decimal('15'):
+        if temperatura > TraceabilityValidator.TEMPERATURA_MAXIMA:
             return False, "Temperatura demasiado alta para mangos (óptimo 10-15°C)"
         return True, "Temperatura adecuada"
     
+    @staticmethod
+    def validar_control_calidad(ph, brix) -> Tuple[bool, str]:
+        """Valida que las lecturas de laboratorio sean físicamente posibles"""
+        if ph is not None and not (Decimal('0') <= Decimal(str(ph)) <= Decimal('14')):
+            return False, "El pH debe estar entre 0 y 14"
+        if brix is not None and not (Decimal('0') <= Decimal(str(brix)) <= Decimal('40')):
+            return False, "Los grados Brix deben estar entre 0 y 40"
+        return True, "Control de calidad válido"
+    
     @staticmethod
     def validar_proceso_transformacion(fecha_lavado, fecha_empaquetado) -> Tuple[bool, str]:
         """Valida que el proceso de transformación sea coherente"""
@@ -60,25 +73,40 @@ class TraceabilityValidator:
         return True, "Proceso de transformación válido"
     
     @staticmethod
-    def calcular_trazabilidad_completa(lote_id: int) -> Tuple[bool, str]:
+    def calcular_trazabilidad_completa(lote_id: int, using: Optional[str] = None) -> Tuple[bool, str]:
         """Verifica si un lote tiene trazabilidad completa"""
-        from core.repositories import LoteRepository, ProcesoRepository, TransporteRepository
+        from core.repositories import (
+            LoteRepository, ProcesoRepository, ControlCalidadRepository, TransporteRepository
+        )
         
-        lote = LoteRepository.obtener_por_id(lote_id)
+        resumen_lote, _ = ControlCalidadRepository.resumenes_por_lote(lote_id, using=using)
+        return TraceabilityValidator.evaluar_trazabilidad(
+            LoteRepository.obtener_vista(lote_id, using=using),
+            ProcesoRepository.vistas_por_lote(lote_id, using=using),
+            TransporteRepository.vistas_por_lote(lote_id, using=using),
+            resumen_lote.aprobados if resumen_lote else 0,
+        )
+    
+    @staticmethod
+    def evaluar_trazabilidad(lote, procesos, transportes, controles_aprobados: int) -> Tuple[bool, str]:
+        """Evalúa la completitud sobre datos ya cargados (sin consultas adicionales)"""
         if not lote:
             return False, "Lote no encontrado"
         
-        procesos = ProcesoRepository.obtener_por_lote(lote_id)
+        motivos = TraceabilityValidator.motivos_incompleta(len(procesos), len(transportes), controles_aprobados)
+        if motivos:
+            return False, motivos[0]
+        return True, "Trazabilidad completa"
+    
+    @staticmethod
+    def motivos_incompleta(procesos: int, transportes: int, controles_aprobados: int) -> List[str]:
+        """Todo lo que le falta a un lote existente, a partir de simples conteos"""
+        motivos = []
         if not procesos:
-            return False, "Falta proceso de transformación"
-        
-        transportes = TransporteRepository.obtener_por_lote(lote_id)
+            motivos.append("Falta proceso de transformación")
         if not transportes:
-            return False, "Falta registro de transporte"
-        
+            motivos.append("Falta registro de transporte")
         # Verificar que haya al menos un control de calidad aprobado
-        for proceso in procesos:
-            if proceso.controles.filter(estado='A').exists():
-                return True, "Trazabilidad completa"
-        
-        return False, "Falta control de calidad aprobado"
\ No newline at end of file
+        if not controles_aprobados:
+            motivos.append("Falta control de calidad aprobado")
+        return motivos
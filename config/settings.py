@@ -22,12 +22,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'presentation.middleware.CompresionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'presentation.middleware.ActorAuditoriaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'presentation.middleware.LecturaPrimariaMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -55,10 +58,100 @@ DATABASES = {
     }
 }
 
+# Réplicas de lectura (copias SQLite sincronizadas con `manage.py sincronizar_replicas`).
+# Rutas separadas por comas, p. ej. STA_READ_REPLICAS=/var/lib/sta/replica1.sqlite3
+DATABASE_READ_REPLICAS = {
+    f'replica{i}': ruta.strip()
+    for i, ruta in enumerate(os.environ.get('STA_READ_REPLICAS', '').split(','), start=1)
+    if ruta.strip()
+}
+for _alias, _ruta in DATABASE_READ_REPLICAS.items():
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{_ruta}?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+# Segundos que un cliente lee de la primaria después de escribir
+REPLICA_STICKY_SECONDS = 5
+
+# Archivo de temporadas cerradas: un fichero SQLite por año de cosecha
+ARCHIVO_DIR = BASE_DIR / 'archivo'
+# Antigüedad mínima (días desde la cosecha) para archivar un lote
+ARCHIVO_DIAS_CORTE = 365
+
 LANGUAGE_CODE = 'es-es'
 TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_TZ = True
 
 STATIC_URL = 'static/'
+
+# Limitación de tasa y cola de admisión de los POST (ver presentation/throttling.py)
+INGESTA_LIMITES = {
+    'TASA': 20.0,
+    'RAFAGA': 40,
+    'BACKEND': 'memoria',
+    'MAX_ESCRITURAS': 1,
+    'MAX_COLA': 32,
+    'ESPERA_MAXIMA': 2.0,
+}
+
+# Escritura agrupada de altas de procesos y transportes (ver core/escritura_agrupada.py)
+ESCRITURA_AGRUPADA = {
+    'ACTIVA': False,
+    'MAX_FILAS': 200,
+    'ESPERA_MS': 2.0,
+    'ESPERA_RESULTADO': 30.0,
+}
+
+# Historial de cambios (ver core/auditoria.py)
+AUDITORIA = {
+    'ACTIVA': True,
+    'MAX_FILAS': 500,
+}
+AUDITORIA_MAX_HISTORIAL = 500
+
+# Contadores del panel (ver core/contadores.py)
+CONTADORES = {
+    'RECONCILIACION_SEGUNDOS': 60.0,
+}
+
+# Almacén de documentos de trazabilidad (ver core/almacen_trazas.py):
+# 'orm' (sin almacén), 'memoria' (un solo proceso) o 'cache' (caché compartida)
+ALMACEN_TRAZAS = {
+    'BACKEND': 'orm',
+    'MAX_DOCUMENTOS': 10000,
+    'TTL_SEGUNDOS': 300.0,
+    'CACHE': 'default',
+}
+
+# Tamaño máximo de una carga masiva de controles de calidad
+CONTROLES_MAX_POR_PETICION = 1000
+
+# Vigencia de los modelos de estimación de transporte por destino
+ESTIMACION_TTL_SEGUNDOS = 15 * 60
+
+# Saltos máximos al recorrer el grafo de genealogía (protege frente a ciclos)
+GENEALOGIA_PROFUNDIDAD_MAXIMA = 50
+
+# Flujo SSE de transportes (ver business/eventos.py); requiere servir config.asgi
+EVENTOS_TRANSPORTE = {
+    'MAX_SUSCRIPTORES': 1000,
+    'KEEPALIVE': 15.0,
+    'DURACION_MAXIMA': 300.0,
+}
+
+# Búsquedas espaciales de fincas y destinos
+GEO_MAX_RESULTADOS = 1000
+GEO_RADIO_INICIAL_KM = 25
+
+# Tamaño mínimo (bytes) para comprimir una respuesta
+COMPRESION_MINIMO_BYTES = 1024
+
+# Instantáneas estáticas de la trazabilidad pública (QR)
+SNAPSHOT_ROOT = BASE_DIR / 'snapshots'
+# Segundos que navegadores y CDN sirven una instantánea sin revalidarla (ETag)
+SNAPSHOT_MAX_AGE = 60
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""
+Perfil ligero para procesos de sólo API y workers (dispositivos de borde).
+
+Las vistas de la API son ``View`` de Django que sólo usan los serializadores
+de DRF, así que se prescinde del admin, la autenticación, las sesiones, los
+mensajes y los estáticos, junto con su middleware. Uso:
+
+    DJANGO_SETTINGS_MODULE=config.settings_api python manage.py runserver
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'core',
+    'business',
+    'presentation',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'presentation.middleware.CompresionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'presentation.middleware.ActorAuditoriaMiddleware',
+    'presentation.middleware.LecturaPrimariaMiddleware',
+]
+
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    'django.template.context_processors.debug',
+    'django.template.context_processors.request',
+]
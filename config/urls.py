@@ -1,23 +1,57 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path
 from presentation.views import (
     LoteCultivoView,
     ProcesoTransformacionView,
+    ControlCalidadView,
     TransporteView,
     EntregaView,
-    dashboard_view
+    LecturaTemperaturaView,
+    dashboard_view,
+    metricas_ingesta_view,
+    estimacion_transporte_view,
+    eventos_transporte_view,
+    metricas_eventos_view,
+    EnlaceGenealogiaView,
+    UbicacionView,
+    busqueda_geo_view,
+    historial_auditoria_view,
+    resumen_view,
+    reconstruccion_auditoria_view,
+    linaje_view,
+    consumidores_finca_view,
+    trazabilidad_publica_view
 )
 
 urlpatterns = [
     
-    path('admin/', admin.site.urls),
     path('', dashboard_view, name='dashboard'),
+    path('t/<str:codigo>/', trazabilidad_publica_view, name='trazabilidad-publica'),
     
     # API Endpoints
 
     path('api/lotes/', LoteCultivoView.as_view(), name='lotes-list'),
     path('api/lotes/<int:lote_id>/', LoteCultivoView.as_view(), name='lotes-detail'),
     path('api/procesos/', ProcesoTransformacionView.as_view(), name='procesos-create'),
+    path('api/controles/', ControlCalidadView.as_view(), name='controles-create'),
     path('api/transportes/', TransporteView.as_view(), name='transportes-create'),
+    path('api/transportes/estimacion/', estimacion_transporte_view, name='transportes-estimacion'),
+    path('api/transportes/eventos/', eventos_transporte_view, name='transportes-eventos'),
+    path('api/transportes/<int:transporte_id>/temperatura/', LecturaTemperaturaView.as_view(), name='transportes-temperatura'),
     path('api/entregas/<int:transporte_id>/', EntregaView.as_view(), name='entregas-create'),
-]
\ No newline at end of file
+    path('api/genealogia/enlaces/', EnlaceGenealogiaView.as_view(), name='genealogia-enlaces'),
+    path('api/genealogia/consumidores/', consumidores_finca_view, name='genealogia-consumidores'),
+    path('api/genealogia/<str:tipo>/<int:nodo_id>/', linaje_view, name='genealogia-linaje'),
+    path('api/geo/ubicaciones/', UbicacionView.as_view(), name='geo-ubicaciones'),
+    path('api/geo/<str:recurso>/', busqueda_geo_view, name='geo-busqueda'),
+    path('api/auditoria/lotes/<int:lote_id>/', historial_auditoria_view, name='auditoria-historial'),
+    path('api/auditoria/lotes/<int:lote_id>/traza/', reconstruccion_auditoria_view, name='auditoria-traza'),
+    path('api/resumen/', resumen_view, name='resumen'),
+    path('api/metricas/ingesta/', metricas_ingesta_view, name='metricas-ingesta'),
+    path('api/metricas/eventos/', metricas_eventos_view, name='metricas-eventos'),
+]
+
+# El perfil ligero (config.settings_api) no instala el admin
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -0,0 +1,438 @@
+"""
+Almacenes de documentos de trazabilidad.
+
+La trazabilidad de un lote se compone con cinco consultas (lote, procesos,
+controles, transportes y resúmenes de calidad). ``AlmacenTrazas`` es la
+interfaz del camino de lectura; cada despliegue elige su implementación con
+``ALMACEN_TRAZAS['BACKEND']``:
+
+- ``orm``: sin almacén, cada lectura se compone con el ORM (por defecto).
+- ``memoria``: documentos desnormalizados en el proceso, por ``lote_id`` y
+  con un índice por ``codigo_lote``. Adecuado con un solo proceso servidor.
+- ``cache``: los mismos documentos en una caché de Django compartida entre
+  procesos (Redis, Memcached...).
+
+Los servicios escriben a través del almacén tras cada alta o cambio, así que
+la siguiente lectura ya no consulta la base. Las señales de ``core`` invalidan
+además el documento ante cualquier escritura que no pase por los servicios, y
+``TTL_SEGUNDOS`` acota lo que tarda en verse lo escrito por otros procesos con
+el almacén en memoria.
+
+Los documentos se guardan serializados en JSON: cada lectura devuelve una
+copia que el llamador puede modificar sin afectar al almacén. Cada documento
+lleva la versión de su lote, guardada en el propio almacén (compartida entre
+procesos con el backend ``cache``), que cada invalidación incrementa.
+"""
+import json
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .routers import en_primaria
+
+CONFIGURACION_POR_DEFECTO = {
+    'BACKEND': 'orm',           # 'orm', 'memoria' o 'cache'
+    'MAX_DOCUMENTOS': 10000,    # documentos retenidos por el almacén en memoria
+    'TTL_SEGUNDOS': 300.0,      # vigencia máxima de un documento
+    'CACHE': 'default',         # alias de la caché para el backend 'cache'
+}
+
+Constructor = Callable[[int], Optional[Dict[str, Any]]]
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'ALMACEN_TRAZAS', {})}
+
+
+class AlmacenTrazas(ABC):
+    """Lectura de documentos de trazabilidad por lote y por código"""
+
+    NOMBRE = ''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.escrituras = 0
+        self.invalidaciones = 0
+
+    @abstractmethod
+    def obtener(self, lote_id: int, construir: Constructor) -> Optional[Dict[str, Any]]:
+        """Documento del lote; ``construir`` lo compone desde el ORM si hace falta"""
+
+    @abstractmethod
+    def obtener_por_codigo(self, codigo: str, construir: Constructor) -> Optional[Dict[str, Any]]:
+        """Documento del lote con ese código si el almacén lo conoce (None si no)"""
+
+    @abstractmethod
+    def escribir(self, lote_ids: Iterable[int], construir: Constructor, using=None) -> None:
+        """Recompone y guarda los documentos cuando se confirme la transacción en curso"""
+
+    @abstractmethod
+    def invalidar(self, lote_ids: Iterable[int]) -> None:
+        """Descarta los documentos de los lotes indicados"""
+
+    @abstractmethod
+    def vaciar(self) -> None:
+        """Descarta todos los documentos"""
+
+    def _contar(self, campo: str, cantidad: int = 1) -> None:
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + cantidad)
+
+    def metricas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': self.NOMBRE,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'escrituras': self.escrituras,
+                'invalidaciones': self.invalidaciones,
+            }
+
+
+class AlmacenORM(AlmacenTrazas):
+    """Sin almacén: cada lectura compone el documento con el ORM"""
+
+    NOMBRE = 'orm'
+
+    def obtener(self, lote_id, construir):
+        self._contar('fallos')
+        return construir(lote_id)
+
+    def obtener_por_codigo(self, codigo, construir):
+        return None
+
+    def escribir(self, lote_ids, construir, using=None):
+        pass
+
+    def invalidar(self, lote_ids):
+        pass
+
+    def vaciar(self):
+        pass
+
+
+def _version_inicial() -> int:
+    # Nunca repite una versión anterior aunque la clave se haya expulsado
+    return time.time_ns() // 1000
+
+
+class _AlmacenClaveValor(AlmacenTrazas):
+    """Documentos serializados por ``lote_id`` con un índice por ``codigo_lote``
+
+    Las subclases sólo implementan el acceso a las claves. Cada documento se
+    guarda con la versión que tenía su lote antes de componerlo, y sólo se
+    sirve mientras esa siga siendo la versión del lote: un documento leído
+    antes de una escritura que lo invalidó (en este proceso o en otro) no
+    llega a servirse.
+    """
+
+    @abstractmethod
+    def _leer_varias(self, claves: Iterable[str]) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def _guardar(self, claves: Dict[str, str]) -> None:
+        pass
+
+    @abstractmethod
+    def _borrar(self, claves: Iterable[str]) -> None:
+        pass
+
+    @abstractmethod
+    def _anadir(self, clave: str, valor: int) -> None:
+        """Guarda ``valor`` sin caducidad sólo si la clave no existe"""
+
+    @abstractmethod
+    def _incrementar(self, clave: str) -> None:
+        """Suma uno al valor de la clave, o le da uno nuevo si no existe"""
+
+    def _leer(self, clave: str) -> Optional[str]:
+        return self._leer_varias([clave]).get(clave)
+
+    def _version(self, lote_id: int) -> int:
+        clave = f'version:{lote_id}'
+        self._anadir(clave, _version_inicial())
+        return self._leer(clave)
+
+    def obtener(self, lote_id, construir):
+        claves = self._leer_varias([f'lote:{lote_id}', f'version:{lote_id}'])
+        serializado, version = claves.get(f'lote:{lote_id}'), claves.get(f'version:{lote_id}')
+        if serializado is not None and version is not None:
+            guardada, _, documento = serializado.partition(':')
+            if guardada == str(version):
+                self._contar('aciertos')
+                return json.loads(documento)
+        self._contar('fallos')
+        if version is None:
+            version = self._version(lote_id)
+        documento = self._componer(lote_id, construir)
+        if documento is not None:
+            self._almacenar(lote_id, documento, version)
+        return documento
+
+    def obtener_por_codigo(self, codigo, construir):
+        lote_id = self._leer(f'codigo:{codigo}')
+        if lote_id is None:
+            return None
+        documento = self.obtener(int(lote_id), construir)
+        # El índice puede apuntar a un lote cuyo código cambió después
+        if documento is None or documento['lote']['codigo'] != codigo:
+            return None
+        return documento
+
+    def _componer(self, lote_id, construir):
+        # Nunca desde una réplica atrasada: el documento se sirve hasta su invalidación
+        with en_primaria():
+            return construir(lote_id)
+
+    def _almacenar(self, lote_id, documento, version) -> None:
+        claves = {f'lote:{lote_id}': f"{version}:{json.dumps(documento, separators=(',', ':'))}"}
+        codigo = documento['lote']['codigo']
+        if codigo:
+            claves[f'codigo:{codigo}'] = str(lote_id)
+        self._guardar(claves)
+        self._contar('escrituras')
+
+    def escribir(self, lote_ids, construir, using=None):
+        lote_ids = set(lote_ids)
+        if lote_ids:
+            transaction.on_commit(lambda: self._escribir(lote_ids, construir), using=using)
+
+    def _escribir(self, lote_ids, construir):
+        for lote_id in lote_ids:
+            # La versión se lee antes de componer, como en ``obtener``
+            version = self._version(lote_id)
+            documento = self._componer(lote_id, construir)
+            if documento is None:
+                self.invalidar([lote_id])
+            else:
+                self._almacenar(lote_id, documento, version)
+
+    def invalidar(self, lote_ids):
+        lote_ids = list(lote_ids)
+        if not lote_ids:
+            return
+        for lote_id in lote_ids:
+            self._incrementar(f'version:{lote_id}')
+        self._contar('invalidaciones', len(lote_ids))
+        # El índice por código se conserva: ``obtener_por_codigo`` comprueba
+        # el código del documento recompuesto
+        self._borrar([f'lote:{lote_id}' for lote_id in lote_ids])
+
+
+class AlmacenMemoria(_AlmacenClaveValor):
+    """Documentos en el proceso con expulsión LRU y vigencia máxima"""
+
+    NOMBRE = 'memoria'
+
+    def __init__(self):
+        super().__init__()
+        self._datos: 'OrderedDict[str, tuple]' = OrderedDict()
+
+    def _leer_varias(self, claves):
+        ahora = time.monotonic()
+        valores = {}
+        with self._lock:
+            for clave in claves:
+                entrada = self._datos.get(clave)
+                if entrada is None:
+                    continue
+                valor, caduca = entrada
+                if caduca <= ahora:
+                    del self._datos[clave]
+                    continue
+                self._datos.move_to_end(clave)
+                valores[clave] = valor
+        return valores
+
+    def _guardar(self, claves):
+        caduca = time.monotonic() + configuracion()['TTL_SEGUNDOS']
+        with self._lock:
+            for clave, valor in claves.items():
+                self._datos[clave] = (valor, caduca)
+                self._datos.move_to_end(clave)
+            self._expulsar()
+
+    def _expulsar(self):
+        # Cada documento ocupa tres claves (lote, código y versión)
+        while len(self._datos) > 3 * configuracion()['MAX_DOCUMENTOS']:
+            self._datos.popitem(last=False)
+
+    def _anadir(self, clave, valor):
+        with self._lock:
+            if clave not in self._datos:
+                self._datos[clave] = (valor, math.inf)
+                self._expulsar()
+
+    def _incrementar(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            self._datos[clave] = (entrada[0] + 1 if entrada else _version_inicial(), math.inf)
+            self._datos.move_to_end(clave)
+            self._expulsar()
+
+    def _borrar(self, claves):
+        with self._lock:
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def vaciar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def metricas(self):
+        metricas = super().metricas()
+        with self._lock:
+            metricas['claves'] = len(self._datos)
+        return metricas
+
+
+class AlmacenCache(_AlmacenClaveValor):
+    """Documentos en una caché de Django compartida entre procesos"""
+
+    NOMBRE = 'cache'
+
+    PREFIJO = 'trazas:'
+
+    def _cache(self):
+        return caches[configuracion()['CACHE']]
+
+    def _leer_varias(self, claves):
+        valores = self._cache().get_many([self.PREFIJO + clave for clave in claves])
+        return {clave[len(self.PREFIJO):]: valor for clave, valor in valores.items()}
+
+    def _guardar(self, claves):
+        self._cache().set_many(
+            {self.PREFIJO + clave: valor for clave, valor in claves.items()},
+            timeout=configuracion()['TTL_SEGUNDOS']
+        )
+
+    def _borrar(self, claves):
+        self._cache().delete_many([self.PREFIJO + clave for clave in claves])
+
+    def _anadir(self, clave, valor):
+        self._cache().add(self.PREFIJO + clave, valor, timeout=None)
+
+    def _incrementar(self, clave):
+        cache = self._cache()
+        try:
+            cache.incr(self.PREFIJO + clave)
+        except ValueError:
+            # Sin versión (expulsada o nunca leída): cualquier documento guardado deja de valer
+            if not cache.add(self.PREFIJO + clave, _version_inicial(), timeout=None):
+                cache.incr(self.PREFIJO + clave)
+
+    def vaciar(self):
+        # Sólo las claves propias si el backend lo permite (django-redis);
+        # si no, se vacía el alias entero: conviene uno dedicado
+        cache = self._cache()
+        if hasattr(cache, 'delete_pattern'):
+            cache.delete_pattern(f'{self.PREFIJO}*')
+        else:
+            cache.clear()
+
+
+BACKENDS = {
+    'orm': AlmacenORM,
+    'memoria': AlmacenMemoria,
+    'cache': AlmacenCache,
+}
+
+_almacenes: Dict[str, AlmacenTrazas] = {}
+_almacenes_lock = threading.Lock()
+
+
+def almacen_trazas() -> AlmacenTrazas:
+    """Almacén del backend configurado (una instancia por backend y proceso)"""
+    backend = configuracion()['BACKEND']
+    almacen = _almacenes.get(backend)
+    if almacen is None:
+        if backend not in BACKENDS:
+            raise ValueError(f"ALMACEN_TRAZAS['BACKEND'] desconocido: {backend}")
+        with _almacenes_lock:
+            almacen = _almacenes.setdefault(backend, BACKENDS[backend]())
+    return almacen
+
+
+def reiniciar() -> None:
+    """Descarta los almacenes creados y sus documentos (pruebas)"""
+    with _almacenes_lock:
+        for almacen in _almacenes.values():
+            almacen.vaciar()
+        _almacenes.clear()
+
+
+# --- Invalidación por señales -------------------------------------------------
+
+def _invalidar(lote_ids, using=None) -> None:
+    lote_ids = {lote_id for lote_id in lote_ids if lote_id is not None}
+    if lote_ids:
+        almacen = almacen_trazas()
+        transaction.on_commit(lambda: almacen.invalidar(lote_ids), using=using)
+
+
+def _activo() -> bool:
+    return configuracion()['BACKEND'] != 'orm'
+
+
+def _al_cambiar_lote(sender, instance, using=None, **kwargs):
+    if _activo():
+        _invalidar([instance.pk], using)
+
+
+def _al_cambiar_dependiente(sender, instance, using=None, **kwargs):
+    if _activo():
+        _invalidar([instance.lote_id], using)
+
+
+def _al_cambiar_control(sender, instance, using=None, **kwargs):
+    from .models import ProcesoTransformacion
+    if not _activo():
+        return
+    proceso = instance._state.fields_cache.get('proceso')
+    if proceso is not None:
+        lote_id = proceso.lote_id
+    else:
+        lote_id = (
+            ProcesoTransformacion.objects.db_manager(using)
+            .filter(id=instance.proceso_id).values_list('lote_id', flat=True).first()
+        )
+    _invalidar([lote_id], using)
+
+
+def _al_crear_controles(sender, lote_ids, using=None, **kwargs):
+    if _activo():
+        _invalidar(lote_ids, using)
+
+
+def _al_actualizar_en_bloque(sender, filas, using=None, **kwargs):
+    if _activo():
+        _invalidar([lote_id for _, lote_id in filas], using)
+
+
+def _al_archivar(sender, lotes, using=None, **kwargs):
+    if _activo():
+        _invalidar(lotes, using)
+
+
+def conectar_senales():
+    from django.db.models.signals import post_delete, post_save
+    from .models import ControlCalidad, LoteCultivo, ProcesoTransformacion, Transporte
+    from .signals import actualizacion_en_bloque, controles_creados, lotes_archivados
+    for evento, senal in (('save', post_save), ('delete', post_delete)):
+        senal.connect(_al_cambiar_lote, sender=LoteCultivo, dispatch_uid=f'trazas_lote_{evento}')
+        senal.connect(_al_cambiar_dependiente, sender=ProcesoTransformacion, dispatch_uid=f'trazas_proceso_{evento}')
+        senal.connect(_al_cambiar_dependiente, sender=Transporte, dispatch_uid=f'trazas_transporte_{evento}')
+        senal.connect(_al_cambiar_control, sender=ControlCalidad, dispatch_uid=f'trazas_control_{evento}')
+    controles_creados.connect(_al_crear_controles, dispatch_uid='trazas_controles_creados')
+    actualizacion_en_bloque.connect(_al_actualizar_en_bloque, dispatch_uid='trazas_actualizacion_en_bloque')
+    lotes_archivados.connect(_al_archivar, dispatch_uid='trazas_lotes_archivados')
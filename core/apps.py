@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from . import almacen_trazas, auditoria, contadores, routers, signals
+        from . import indices_geo  # noqa: F401  registra la comprobación core.E001
+        routers.conectar_senales()
+        signals.conectar_senales()
+        auditoria.conectar_senales()
+        contadores.conectar_senales()
+        almacen_trazas.conectar_senales()
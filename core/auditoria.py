@@ -0,0 +1,361 @@
+"""
+Historial de cambios (auditoría) de lotes, procesos, controles y transportes.
+
+Al guardar una instancia existente (``pre_save``) se leen de la base los
+valores anteriores de sus campos cargados, con una consulta por clave; tras
+guardarla (``post_save``) sólo se registran los que cambiaron y, al borrarla,
+una entrada de eliminación. Cargar instancias sólo para leerlas no cuesta
+nada. Las inserciones masivas avisan con las
+señales de ``core.signals``. Las entradas de una transacción se reúnen por
+conexión y se escriben con un único INSERT de varias filas justo antes de
+confirmarla: se confirman o se deshacen con el cambio, y las de un savepoint
+revertido se descartan. Fuera de una transacción se insertan en el acto. El
+autor se interna en ``ActorAuditoria`` y los cambios se guardan en JSON
+compacto.
+
+``RegistroAuditoria`` sólo admite inserciones (un trigger rechaza los UPDATE)
+y tiene un único índice, por lote y fecha, así que escribir sigue costando lo
+mismo aunque la tabla crezca a decenas de millones de filas.
+"""
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+CONFIGURACION_POR_DEFECTO = {
+    'ACTIVA': True,
+    'MAX_FILAS': 500,  # filas por INSERT
+}
+
+ACTOR_SISTEMA = 'sistema'
+
+# Autor de los cambios de la petición (o tarea) en curso
+_actor: ContextVar[str] = ContextVar('actor_auditoria', default=ACTOR_SISTEMA)
+
+
+class _Codificador(DjangoJSONEncoder):
+    """Como el de Django, pero sin recortar las fechas a milisegundos"""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'AUDITORIA', {})}
+
+
+def activa() -> bool:
+    return bool(configuracion()['ACTIVA'])
+
+
+@contextmanager
+def contexto_actor(nombre: str):
+    """Atribuye a ``nombre`` los cambios hechos dentro del bloque"""
+    token = _actor.set(nombre or ACTOR_SISTEMA)
+    try:
+        yield
+    finally:
+        _actor.reset(token)
+
+
+@lru_cache(maxsize=None)
+def _entidades():
+    from .models import ControlCalidad, LoteCultivo, ProcesoTransformacion, RegistroAuditoria, Transporte
+    return {
+        LoteCultivo: RegistroAuditoria.LOTE,
+        ProcesoTransformacion: RegistroAuditoria.PROCESO,
+        ControlCalidad: RegistroAuditoria.CONTROL,
+        Transporte: RegistroAuditoria.TRANSPORTE,
+    }
+
+
+@lru_cache(maxsize=None)
+def campos(model):
+    """(attname, campo) auditados: todos menos la clave y ``modificado``"""
+    return tuple(
+        (f.attname, f) for f in model._meta.concrete_fields
+        if not f.primary_key and f.attname != 'modificado'
+    )
+
+
+def valores(instance):
+    """Valores cargados de la instancia (los campos diferidos se omiten)"""
+    datos = instance.__dict__
+    return {nombre: datos[nombre] for nombre, _ in campos(type(instance)) if nombre in datos}
+
+
+def _normalizar(campo, valor):
+    try:
+        return campo.to_python(valor)
+    except Exception:
+        return valor
+
+
+def foto(instance):
+    """Campos con valor de la instancia, tal como se guardan en un alta"""
+    datos = instance.__dict__
+    return {
+        nombre: valor for nombre, campo in campos(type(instance))
+        if nombre in datos and (valor := _normalizar(campo, datos[nombre])) is not None
+    }
+
+
+class Auditor:
+    """Entradas pendientes de cada transacción y su escritura en bloque"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Descarta la caché de actores y las métricas (pruebas)"""
+        with self._lock:
+            self._actores = {}
+            self.entradas = 0
+            self.inserciones = 0
+
+    def entrada(self, model, objeto_id, lote_id, operacion, cambios):
+        """Tupla lista para registrar; el autor y la fecha son los del momento del cambio"""
+        return (timezone.now(), _entidades()[model], objeto_id, lote_id, operacion, _actor.get(), cambios)
+
+    def registrar(self, entradas, using=None):
+        """Guarda las entradas para el INSERT previo a la confirmación de la transacción en curso
+
+        Fuera de una transacción (autocommit) el cambio ya está confirmado y
+        las entradas se insertan en el acto.
+        """
+        if not entradas:
+            return
+        from .models import RegistroAuditoria
+        alias = using or router.db_for_write(RegistroAuditoria)
+        conexion = connections[alias]
+        if not _transaccion_propia(conexion):
+            with transaction.atomic(using=alias):
+                nuevos = self._insertar(entradas, alias)
+            if conexion.in_atomic_block:
+                # Dentro de un TestCase: la transacción de la prueba se deshará
+                transaction.on_commit(lambda: self._actores.update(nuevos), using=alias)
+            else:
+                self._actores.update(nuevos)
+            return
+        # La marca son los savepoints abiertos: si se revierte uno, sus entradas sobran
+        _enganchar(conexion).append((tuple(conexion.savepoint_ids), entradas))
+
+    def _vaciar(self, conexion) -> dict:
+        """Inserta lo pendiente de la conexión; devuelve los actores nuevos"""
+        pendientes = conexion._auditoria_pendientes
+        if not pendientes:
+            return {}
+        bloque = [e for _, entradas in pendientes for e in entradas]
+        pendientes.clear()
+        return self._insertar(bloque, conexion.alias)
+
+    def _insertar(self, bloque, alias) -> dict:
+        from .models import ActorAuditoria, RegistroAuditoria
+        nuevos = {}
+        faltan = {e[5] for e in bloque} - self._actores.keys()
+        if faltan:
+            ActorAuditoria.objects.using(alias).bulk_create(
+                [ActorAuditoria(nombre=nombre) for nombre in faltan], ignore_conflicts=True
+            )
+            nuevos = dict(
+                ActorAuditoria.objects.using(alias).filter(nombre__in=faltan).values_list('nombre', 'id')
+            )
+        actores = {**self._actores, **nuevos}
+        RegistroAuditoria.objects.using(alias).bulk_create([
+            RegistroAuditoria(
+                fecha=fecha, entidad=entidad, objeto_id=objeto_id, lote_id=lote_id,
+                operacion=operacion, actor_id=actores[actor],
+                cambios=json.dumps(cambios, cls=_Codificador, ensure_ascii=False, separators=(',', ':'))
+            )
+            for fecha, entidad, objeto_id, lote_id, operacion, actor, cambios in bloque
+        ], batch_size=configuracion()['MAX_FILAS'])
+        with self._lock:
+            self.entradas += len(bloque)
+            self.inserciones += 1
+        # Quien llama los pasa a la caché tras confirmar: un id de actor
+        # revertido no debe quedar en ella
+        return nuevos
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'activa': activa(),
+                'entradas': self.entradas,
+                'inserciones': self.inserciones,
+            }
+
+
+auditor = Auditor()
+
+
+def _transaccion_propia(conexion) -> bool:
+    """Si hay una transacción abierta por la aplicación cuyo cierre se observa
+
+    Fuera de las pruebas, cualquier bloque ``atomic``. Dentro de un
+    ``TestCase`` sus bloques envolventes no cuentan: el cierre de un bloque
+    de la aplicación con savepoint hace las veces de confirmación.
+    """
+    bloques = conexion.atomic_blocks
+    if not conexion.in_atomic_block or not bloques:
+        return False
+    if not bloques[0]._from_testcase:
+        return True
+    return any(
+        sid is not None and not bloque._from_testcase
+        for bloque, sid in zip(bloques[1:], conexion.savepoint_ids)
+    )
+
+
+def _enganchar(conexion) -> list:
+    """Envuelve los cierres de transacción de la conexión (una vez por conexión)
+
+    Django no ofrece un aviso previo a la confirmación: ``commit`` inserta
+    antes lo pendiente y los ``rollback`` lo descartan.
+    """
+    if '_auditoria_pendientes' in conexion.__dict__:
+        return conexion._auditoria_pendientes
+    pendientes = conexion._auditoria_pendientes = []
+    commit, rollback = conexion.commit, conexion.rollback
+    savepoint_commit, savepoint_rollback = conexion.savepoint_commit, conexion.savepoint_rollback
+
+    def confirmar():
+        nuevos = auditor._vaciar(conexion)
+        commit()
+        auditor._actores.update(nuevos)
+
+    def deshacer():
+        pendientes.clear()
+        rollback()
+
+    def liberar_savepoint(sid):
+        savepoint_commit(sid)
+        if pendientes and not _transaccion_propia(conexion):
+            nuevos = auditor._vaciar(conexion)
+            transaction.on_commit(lambda: auditor._actores.update(nuevos), using=conexion.alias)
+
+    def revertir_savepoint(sid):
+        savepoint_rollback(sid)
+        pendientes[:] = [(marca, entradas) for marca, entradas in pendientes if sid not in marca]
+
+    conexion.commit = confirmar
+    conexion.rollback = deshacer
+    conexion.savepoint_commit = liberar_savepoint
+    conexion.savepoint_rollback = revertir_savepoint
+    return pendientes
+
+
+# --- Receptores -------------------------------------------------------------
+
+def _lote_de(instance, using):
+    from .models import ControlCalidad, LoteCultivo, ProcesoTransformacion
+    if isinstance(instance, LoteCultivo):
+        return instance.id
+    if isinstance(instance, ControlCalidad):
+        proceso = instance._state.fields_cache.get('proceso')
+        if proceso is not None:
+            return proceso.lote_id
+        return (
+            ProcesoTransformacion.objects.db_manager(using)
+            .filter(id=instance.proceso_id).values_list('lote_id', flat=True).first()
+        )
+    return instance.lote_id
+
+
+def _al_preparar(sender, instance, raw=False, using=None, **kwargs):
+    if raw or instance._state.adding or not activa():
+        return
+    instance._auditoria = (
+        sender._base_manager.db_manager(using).filter(pk=instance.pk)
+        .values(*valores(instance)).first() or {}
+    )
+
+
+def _al_guardar(sender, instance, created, raw=False, using=None, **kwargs):
+    from .models import RegistroAuditoria
+    if raw or not activa():
+        return
+    actuales = valores(instance)
+    if created:
+        # En el alta basta con los campos con valor: los ausentes son nulos
+        operacion, cambios = RegistroAuditoria.CREACION, foto(instance)
+    else:
+        operacion, cambios = RegistroAuditoria.MODIFICACION, {}
+        previos = instance.__dict__.pop('_auditoria', {})
+        for nombre, campo in campos(sender):
+            if nombre not in actuales:
+                continue
+            valor = _normalizar(campo, actuales[nombre])
+            if nombre not in previos or _normalizar(campo, previos[nombre]) != valor:
+                cambios[nombre] = valor
+        if not cambios:
+            return
+    auditor.registrar(
+        [auditor.entrada(sender, instance.pk, _lote_de(instance, using), operacion, cambios)], using=using
+    )
+
+
+def _al_borrar(sender, instance, using=None, **kwargs):
+    from .models import RegistroAuditoria
+    if not activa():
+        return
+    auditor.registrar(
+        [auditor.entrada(sender, instance.pk, _lote_de(instance, using), RegistroAuditoria.ELIMINACION, {})],
+        using=using
+    )
+
+
+def _al_crear_controles(sender, controles, lote_por_proceso, using=None, **kwargs):
+    from .models import ControlCalidad, RegistroAuditoria
+    if not activa():
+        return
+    auditor.registrar([
+        auditor.entrada(
+            ControlCalidad, control.pk, lote_por_proceso[control.proceso_id], RegistroAuditoria.CREACION,
+            foto(control)
+        )
+        for control in controles
+    ], using=using)
+
+
+def _al_actualizar_en_bloque(sender, filas, cambios, using=None, **kwargs):
+    from .models import RegistroAuditoria
+    if not activa():
+        return
+    auditor.registrar([
+        auditor.entrada(sender, objeto_id, lote_id, RegistroAuditoria.MODIFICACION, cambios)
+        for objeto_id, lote_id in filas
+    ], using=using)
+
+
+def _al_archivar(sender, lotes, temporada, using=None, **kwargs):
+    from .models import LoteCultivo, RegistroAuditoria
+    if not activa():
+        return
+    # Una entrada por lote: sus procesos, controles y transportes se archivan con él
+    auditor.registrar([
+        auditor.entrada(LoteCultivo, lote_id, lote_id, RegistroAuditoria.ARCHIVADO, {'temporada': temporada})
+        for lote_id in lotes
+    ], using=using)
+
+
+def conectar_senales():
+    from django.db.models.signals import post_delete, post_save, pre_save
+    from .signals import actualizacion_en_bloque, controles_creados, lotes_archivados
+    for model in _entidades():
+        nombre = model._meta.model_name
+        pre_save.connect(_al_preparar, sender=model, dispatch_uid=f'auditoria_{nombre}_pre_save')
+        post_save.connect(_al_guardar, sender=model, dispatch_uid=f'auditoria_{nombre}_save')
+        post_delete.connect(_al_borrar, sender=model, dispatch_uid=f'auditoria_{nombre}_delete')
+    controles_creados.connect(_al_crear_controles, dispatch_uid='auditoria_controles_creados')
+    actualizacion_en_bloque.connect(_al_actualizar_en_bloque, dispatch_uid='auditoria_actualizacion_en_bloque')
+    lotes_archivados.connect(_al_archivar, dispatch_uid='auditoria_lotes_archivados')
@@ -0,0 +1,306 @@
+"""
+Contadores en memoria para las cifras del panel (lotes, lotes en tránsito,
+controles pendientes y entregas de hoy).
+
+Las señales de lotes, controles y transportes (los procesos no intervienen en
+ninguna cifra) aplican cada alta, cambio o borrado como un incremento al
+confirmarse la transacción, así que servir el resumen no consulta la base.
+Para un cambio, el estado anterior de la fila se lee al guardarla
+(``pre_save``), no al cargar cada instancia.
+Cada ``RECONCILIACION_SEGUNDOS`` un hilo vuelve a contar contra la primaria:
+corrige lo que escriben otros procesos (workers, comandos como
+``archivar_temporadas``) y lo que no pasa por las señales.
+
+Los cuatro recuentos se leen en una sola transacción, y los incrementos que
+llegan desde que se fija su instantánea se vuelven a aplicar encima. Queda un
+hueco: si una transacción confirmó antes de la instantánea pero su
+``on_commit`` aún no había corrido, su incremento se cuenta dos veces. El
+hueco dura lo que tarda un hilo en pasar de COMMIT a sus callbacks, y la
+siguiente reconciliación lo corrige (cuenta como desviación).
+
+La memoria no crece con las tablas: cuatro enteros y, para los lotes en
+tránsito, un contador por lote con transportes sin entregar.
+"""
+import threading
+import time
+from datetime import date
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+CONFIGURACION_POR_DEFECTO = {
+    'RECONCILIACION_SEGUNDOS': 60.0,   # 0 desactiva el hilo de reconciliación
+}
+
+CIFRAS = ('total_lotes', 'lotes_en_transito', 'controles_pendientes', 'entregas_hoy')
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'CONTADORES', {})}
+
+
+def _dia(valor) -> Optional[date]:
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+    if valor is None:
+        return None
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return timezone.localdate(valor)
+
+
+class RegistroContadores:
+    """Cifras del panel mantenidas por incrementos y reconciliadas periódicamente"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reconciliando = threading.Lock()
+        self._hilo = None
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida las cifras: la próxima lectura reconcilia (pruebas)"""
+        with self._lock:
+            self._listo = False
+            self._diario = None
+            self.total_lotes = 0
+            self.controles_pendientes = 0
+            self.entregas_hoy = 0
+            self._dia = timezone.localdate()
+            self._en_transito: Dict[int, int] = {}
+            self.reconciliaciones = 0
+            self.desviaciones = 0
+            self.errores = 0
+            self.ultima_reconciliacion = None
+
+    # --- Incrementos ----------------------------------------------------
+
+    def aplicar(self, lotes=0, pendientes=0, transito=None, entregas=None):
+        """Aplica un incremento; ``transito`` es {lote_id: delta}, ``entregas`` {dia: delta}"""
+        with self._lock:
+            self._aplicar(lotes, pendientes, transito or {}, entregas or {})
+            if self._diario is not None:
+                # Reconciliación en curso: repetir tras el recuento
+                self._diario.append((lotes, pendientes, transito or {}, entregas or {}))
+
+    def _aplicar(self, lotes, pendientes, transito, entregas):
+        self._avanzar_dia()
+        self.total_lotes += lotes
+        self.controles_pendientes += pendientes
+        for lote_id, delta in transito.items():
+            restantes = self._en_transito.get(lote_id, 0) + delta
+            if restantes > 0:
+                self._en_transito[lote_id] = restantes
+            else:
+                self._en_transito.pop(lote_id, None)
+        self.entregas_hoy += entregas.get(self._dia, 0)
+
+    def _avanzar_dia(self):
+        hoy = timezone.localdate()
+        if hoy != self._dia:
+            self._dia = hoy
+            self.entregas_hoy = 0
+
+    def programar(self, using=None, **delta):
+        """Aplica el incremento cuando se confirme la transacción en curso"""
+        if any(delta.values()):
+            transaction.on_commit(lambda: self.aplicar(**delta), using=using)
+
+    # --- Lectura y reconciliación ---------------------------------------
+
+    def valores(self) -> Dict[str, int]:
+        """Cifras actuales; la primera lectura del proceso las cuenta en la base"""
+        if not self._listo:
+            self.reconciliar()
+        self._arrancar()
+        with self._lock:
+            self._avanzar_dia()
+            return self._cifras()
+
+    def _cifras(self) -> Dict[str, int]:
+        return {
+            'total_lotes': self.total_lotes,
+            'lotes_en_transito': len(self._en_transito),
+            'controles_pendientes': self.controles_pendientes,
+            'entregas_hoy': self.entregas_hoy,
+        }
+
+    def reconciliar(self) -> Dict[str, int]:
+        """Recuenta en la primaria; devuelve la desviación corregida por cifra
+
+        Los incrementos que llegan desde que se fija la instantánea se vuelven
+        a aplicar sobre el recuento: sus transacciones casi siempre confirmaron
+        después y no están incluidas en ella (ver el docstring del módulo).
+        """
+        with self._reconciliando:
+            return self._reconciliar()
+
+    def _reconciliar(self) -> Dict[str, int]:
+        from .repositories import ResumenRepository
+
+        def abrir_diario():
+            with self._lock:
+                self._diario = []
+
+        try:
+            hoy = timezone.localdate()
+            conteos = ResumenRepository.conteos(hoy, antes_de_leer=abrir_diario)
+        except Exception:
+            with self._lock:
+                self._diario = None
+                self.errores += 1
+            raise
+        with self._lock:
+            self._avanzar_dia()
+            antes = self._cifras()
+            self.total_lotes = conteos['total_lotes']
+            self.controles_pendientes = conteos['controles_pendientes']
+            self._en_transito = conteos['en_transito']
+            self._dia, self.entregas_hoy = hoy, conteos['entregas_hoy']
+            for delta in self._diario:
+                self._aplicar(*delta)
+            self._diario = None
+            self._listo = True
+            self.reconciliaciones += 1
+            self.ultima_reconciliacion = timezone.now()
+            despues = self._cifras()
+            desviacion = {cifra: despues[cifra] - antes[cifra] for cifra in CIFRAS}
+            if self.reconciliaciones > 1 and any(desviacion.values()):
+                self.desviaciones += 1
+        return desviacion
+
+    def _arrancar(self):
+        if configuracion()['RECONCILIACION_SEGUNDOS'] <= 0:
+            return
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name='contadores', daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            intervalo = configuracion()['RECONCILIACION_SEGUNDOS']
+            if intervalo <= 0:
+                return
+            time.sleep(intervalo)
+            try:
+                self.reconciliar()
+            except Exception:
+                # Se reintenta en la próxima vuelta; las cifras siguen con los incrementos
+                pass
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'reconciliaciones': self.reconciliaciones,
+                'desviaciones': self.desviaciones,
+                'errores': self.errores,
+                'ultima_reconciliacion': (
+                    self.ultima_reconciliacion.isoformat() if self.ultima_reconciliacion else None
+                ),
+            }
+
+
+contadores = RegistroContadores()
+
+
+# --- Receptores -------------------------------------------------------------
+
+def _estado_transporte(valores):
+    """(lote_id en tránsito o None, día de entrega o None)"""
+    fecha_entrega = valores.get('fecha_entrega')
+    return (valores.get('lote_id') if fecha_entrega is None else None), _dia(fecha_entrega)
+
+
+def _delta_transporte(antes, despues, using):
+    transito, entregas = {}, {}
+    for (lote_id, dia), signo in ((antes, -1), (despues, 1)):
+        if lote_id is not None:
+            transito[lote_id] = transito.get(lote_id, 0) + signo
+        if dia is not None:
+            entregas[dia] = entregas.get(dia, 0) + signo
+    contadores.programar(
+        using=using,
+        transito={k: v for k, v in transito.items() if v},
+        entregas={k: v for k, v in entregas.items() if v},
+    )
+
+
+def _al_preparar_transporte(sender, instance, raw=False, using=None, **kwargs):
+    # El estado anterior se lee al guardar, no al cargar cada instancia
+    if raw or instance._state.adding:
+        return
+    instance._contadores = _estado_transporte(
+        sender._base_manager.db_manager(using).filter(pk=instance.pk)
+        .values('lote_id', 'fecha_entrega').first() or {}
+    )
+
+
+def _al_guardar_transporte(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    antes = (None, None) if created else instance.__dict__.pop('_contadores', (None, None))
+    despues = _estado_transporte(instance.__dict__)
+    if antes != despues:
+        _delta_transporte(antes, despues, using)
+
+
+def _al_borrar_transporte(sender, instance, using=None, **kwargs):
+    _delta_transporte(_estado_transporte(instance.__dict__), (None, None), using)
+
+
+def _pendiente(instance) -> bool:
+    from .models import ControlCalidad
+    return instance.__dict__.get('estado') == ControlCalidad.PENDIENTE
+
+
+def _al_preparar_control(sender, instance, raw=False, using=None, **kwargs):
+    from .models import ControlCalidad
+    if raw or instance._state.adding:
+        return
+    instance._contadores = (
+        sender._base_manager.db_manager(using).filter(pk=instance.pk, estado=ControlCalidad.PENDIENTE).exists()
+    )
+
+
+def _al_guardar_control(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    antes = False if created else instance.__dict__.pop('_contadores', False)
+    despues = _pendiente(instance)
+    contadores.programar(using=using, pendientes=int(despues) - int(antes))
+
+
+def _al_borrar_control(sender, instance, using=None, **kwargs):
+    contadores.programar(using=using, pendientes=-int(_pendiente(instance)))
+
+
+def _al_crear_controles(sender, controles, using=None, **kwargs):
+    contadores.programar(using=using, pendientes=sum(_pendiente(control) for control in controles))
+
+
+def _al_guardar_lote(sender, instance, created, raw=False, using=None, **kwargs):
+    if created and not raw:
+        contadores.programar(using=using, lotes=1)
+
+
+def _al_borrar_lote(sender, instance, using=None, **kwargs):
+    contadores.programar(using=using, lotes=-1)
+
+
+def conectar_senales():
+    from django.db.models.signals import post_delete, post_save, pre_save
+    from .models import ControlCalidad, LoteCultivo, Transporte
+    from .signals import controles_creados
+    post_save.connect(_al_guardar_lote, sender=LoteCultivo, dispatch_uid='contadores_lote_save')
+    post_delete.connect(_al_borrar_lote, sender=LoteCultivo, dispatch_uid='contadores_lote_delete')
+    pre_save.connect(_al_preparar_control, sender=ControlCalidad, dispatch_uid='contadores_control_pre_save')
+    post_save.connect(_al_guardar_control, sender=ControlCalidad, dispatch_uid='contadores_control_save')
+    post_delete.connect(_al_borrar_control, sender=ControlCalidad, dispatch_uid='contadores_control_delete')
+    controles_creados.connect(_al_crear_controles, dispatch_uid='contadores_controles_creados')
+    pre_save.connect(_al_preparar_transporte, sender=Transporte, dispatch_uid='contadores_transporte_pre_save')
+    post_save.connect(_al_guardar_transporte, sender=Transporte, dispatch_uid='contadores_transporte_save')
+    post_delete.connect(_al_borrar_transporte, sender=Transporte, dispatch_uid='contadores_transporte_delete')
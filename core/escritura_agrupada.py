@@ -0,0 +1,179 @@
+"""
+Escritura agrupada (group commit) para altas de una sola fila.
+
+Los dispositivos antiguos envían un POST por proceso o transporte y cada uno
+confirma su propia transacción SQLite (un fsync por fila). Con
+``ESCRITURA_AGRUPADA['ACTIVA']`` los repositorios encolan la fila ya validada
+y un único hilo escritor inserta lo acumulado durante unos milisegundos (o
+hasta ``MAX_FILAS``) con ``bulk_create`` en una sola transacción; cada
+petición espera su fila con el id asignado.
+
+``bulk_create`` no emite ``post_save``: el escritor lo envía por cada fila
+dentro de la transacción, así que los receptores (instantáneas, etc.) se
+comportan igual que con ``save()``, y en el contexto de la petición que
+encoló la fila (autor de auditoría, etc.). Si el lote falla, se reintenta
+fila a fila para que un registro inválido no arrastre a los demás.
+
+El escritor confirma en su propia conexión: si quien inserta ya está dentro
+de una transacción, la fila se guarda en ella con ``save()`` para que se
+confirme o se deshaga con el resto.
+"""
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models.signals import post_save
+
+CONFIGURACION_POR_DEFECTO = {
+    'ACTIVA': False,
+    'MAX_FILAS': 200,    # filas por transacción
+    'ESPERA_MS': 2.0,    # espera máxima para reunir más filas tras la primera
+    'ESPERA_RESULTADO': 30.0,  # segundos que una petición espera a que se confirme su fila
+}
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'ESCRITURA_AGRUPADA', {})}
+
+
+def activa() -> bool:
+    return bool(configuracion()['ACTIVA'])
+
+
+class EscritorAgrupado:
+    """Cola de filas pendientes y el hilo que las confirma por lotes"""
+
+    def __init__(self):
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.transacciones = 0
+            self.filas = 0
+            self.max_filas_observadas = 0
+            self.reintentos_fila_a_fila = 0
+            self.en_transaccion = 0
+            self.expiradas = 0
+
+    def insertar(self, model, data):
+        """Encola una fila y espera a que el escritor la confirme; devuelve la instancia
+
+        Si el escritor no la toma en ``ESPERA_RESULTADO`` segundos se retira de
+        la cola y se lanza ``TimeoutError``: la fila no se escribe. Si ya la
+        está insertando, se espera su resultado otro plazo igual.
+        """
+        if connections[router.db_for_write(model)].in_atomic_block:
+            with self._lock:
+                self.en_transaccion += 1
+            return model.objects.create(**data)
+        espera = configuracion()['ESPERA_RESULTADO']
+        futuro = Future()
+        self._arrancar()
+        self._cola.put((model(**data), futuro, contextvars.copy_context()))
+        try:
+            return futuro.result(timeout=espera)
+        except TimeoutError:
+            if not futuro.cancel():
+                return futuro.result(timeout=espera)
+            with self._lock:
+                self.expiradas += 1
+            raise TimeoutError(f"El escritor agrupado no confirmó la fila en {espera} s") from None
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name='escritor-agrupado', daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            pendientes = [self._cola.get()]
+            config = configuracion()
+            limite = time.monotonic() + config['ESPERA_MS'] / 1000
+            while len(pendientes) < config['MAX_FILAS']:
+                restante = limite - time.monotonic()
+                try:
+                    # Lo ya encolado se toma sin esperar; después, hasta el límite
+                    pendientes.append(self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._escribir(pendientes)
+            except Exception as e:
+                # El hilo no debe morir: las peticiones en espera reciben el error
+                for _, futuro, _ in pendientes:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+
+    def _escribir(self, pendientes):
+        pendientes = [
+            (obj, futuro, contexto) for obj, futuro, contexto in pendientes
+            if futuro.set_running_or_notify_cancel()
+        ]
+        if not pendientes:
+            return
+        alias = router.db_for_write(type(pendientes[0][0]))
+        por_modelo = {}
+        for obj, _, contexto in pendientes:
+            por_modelo.setdefault(type(obj), []).append((obj, contexto))
+
+        try:
+            with transaction.atomic(using=alias):
+                for model, filas in por_modelo.items():
+                    model.objects.using(alias).bulk_create([obj for obj, _ in filas])
+                    for obj, contexto in filas:
+                        contexto.run(
+                            post_save.send,
+                            sender=model, instance=obj, created=True, update_fields=None, raw=False, using=alias
+                        )
+        except Exception:
+            self._escribir_fila_a_fila(pendientes, alias)
+        else:
+            for obj, futuro, _ in pendientes:
+                futuro.set_result(obj)
+            self._contar(len(pendientes))
+
+    def _escribir_fila_a_fila(self, pendientes, alias):
+        with self._lock:
+            self.reintentos_fila_a_fila += 1
+        for obj, futuro, contexto in pendientes:
+            # Las claves asignadas por el lote fallido se revirtieron
+            obj.pk = None
+            obj._state.adding = True
+            try:
+                with transaction.atomic(using=alias):
+                    contexto.run(obj.save, force_insert=True, using=alias)
+            except Exception as e:
+                futuro.set_exception(e)
+            else:
+                futuro.set_result(obj)
+                self._contar(1)
+
+    def _contar(self, filas):
+        with self._lock:
+            self.transacciones += 1
+            self.filas += filas
+            self.max_filas_observadas = max(self.max_filas_observadas, filas)
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'activa': activa(),
+                'pendientes': self._cola.qsize(),
+                'transacciones': self.transacciones,
+                'filas': self.filas,
+                'max_filas_observadas': self.max_filas_observadas,
+                'reintentos_fila_a_fila': self.reintentos_fila_a_fila,
+                'en_transaccion': self.en_transaccion,
+                'expiradas': self.expiradas,
+            }
+
+
+escritor_agrupado = EscritorAgrupado()
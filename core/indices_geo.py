@@ -0,0 +1,86 @@
+"""
+Índices espaciales R*Tree de fincas y destinos (módulo estándar de SQLite,
+sin SpatiaLite), mantenidos por triggers: cualquier escritura, incluidas
+``bulk_create`` y el archivado, los deja sincronizados.
+
+Si una migración obliga a SQLite a reconstruir una tabla indexada (p. ej. un
+``AlterField``), sus triggers se pierden sin aviso. Esa migración debe
+terminar con ``recrear_indices()``; la comprobación del sistema
+``core.E001`` (``manage.py check --database default``, que también ejecuta
+``migrate``) avisa si falta alguno.
+"""
+from django.core.checks import Error, Tags, register
+from django.db import connections, migrations
+
+INDICES = [
+    ('core_lote_rtree', 'core_lotecultivo', 'latitud', 'longitud'),
+    ('core_transporte_rtree', 'core_transporte', 'destino_latitud', 'destino_longitud'),
+]
+
+SUFIJOS_TRIGGERS = ('ai', 'au', 'ad')
+
+# Migración que crea los índices: antes de aplicarla no hay nada que comprobar
+MIGRACION = ('core', '0006_coordenadas')
+
+
+def crear_indice(rtree, tabla, lat, lon):
+    con_coordenadas = f'NEW.{lat} IS NOT NULL AND NEW.{lon} IS NOT NULL'
+    fila = f'NEW.id, NEW.{lat}, NEW.{lat}, NEW.{lon}, NEW.{lon}'
+    return [
+        f'CREATE VIRTUAL TABLE {rtree} USING rtree(id, min_lat, max_lat, min_lon, max_lon)',
+        f'INSERT INTO {rtree} SELECT id, {lat}, {lat}, {lon}, {lon} FROM {tabla} '
+        f'WHERE {lat} IS NOT NULL AND {lon} IS NOT NULL',
+        f'CREATE TRIGGER {rtree}_ai AFTER INSERT ON {tabla} WHEN {con_coordenadas} '
+        f'BEGIN INSERT INTO {rtree} VALUES ({fila}); END',
+        f'CREATE TRIGGER {rtree}_au AFTER UPDATE OF {lat}, {lon} ON {tabla} '
+        f'BEGIN DELETE FROM {rtree} WHERE id = OLD.id; '
+        f'INSERT INTO {rtree} SELECT {fila} WHERE {con_coordenadas}; END',
+        f'CREATE TRIGGER {rtree}_ad AFTER DELETE ON {tabla} '
+        f'BEGIN DELETE FROM {rtree} WHERE id = OLD.id; END',
+    ]
+
+
+def borrar_indice(rtree, tabla, lat, lon):
+    return [f'DROP TRIGGER IF EXISTS {rtree}_{sufijo}' for sufijo in SUFIJOS_TRIGGERS] + [
+        f'DROP TABLE IF EXISTS {rtree}'
+    ]
+
+
+def recrear_indices():
+    """Operación de migración que reconstruye los índices y sus triggers desde las tablas"""
+    sql = []
+    for indice in INDICES:
+        sql += borrar_indice(*indice) + crear_indice(*indice)
+    return migrations.RunSQL(sql, reverse_sql=migrations.RunSQL.noop)
+
+
+def faltantes(alias: str = 'default'):
+    """Tablas R*Tree y triggers que deberían existir en la base y no están"""
+    esperados = set()
+    for rtree, *_ in INDICES:
+        esperados.add(('table', rtree))
+        esperados.update(('trigger', f'{rtree}_{sufijo}') for sufijo in SUFIJOS_TRIGGERS)
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        return sorted(esperados - set(cursor.fetchall()))
+
+
+@register(Tags.database)
+def comprobar_indices(app_configs=None, databases=None, **kwargs):
+    from django.db.migrations.recorder import MigrationRecorder
+    errores = []
+    for alias in databases or ():
+        conexion = connections[alias]
+        if conexion.vendor != 'sqlite':
+            continue
+        recorder = MigrationRecorder(conexion)
+        if not recorder.has_table() or MIGRACION not in recorder.applied_migrations():
+            continue
+        for tipo, nombre in faltantes(alias):
+            errores.append(Error(
+                f"Falta {'la tabla R*Tree' if tipo == 'table' else 'el trigger'} {nombre} en '{alias}'",
+                hint="Añada core.indices_geo.recrear_indices() al final de la migración que "
+                     "reconstruyó la tabla indexada.",
+                id='core.E001',
+            ))
+    return errores
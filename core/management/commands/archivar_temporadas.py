@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from business.services import ArchivoService
+
+
+class Command(BaseCommand):
+    help = "Archiva por temporada los lotes cosechados antes de la fecha de corte"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--antes-de', type=date.fromisoformat, default=None,
+            help="Fecha de corte YYYY-MM-DD (por defecto hoy - ARCHIVO_DIAS_CORTE)"
+        )
+
+    def handle(self, *args, **options):
+        resultado, mensaje = ArchivoService.archivar(options['antes_de'])
+        if not resultado:
+            raise CommandError(mensaje)
+        for temporada, total in resultado['temporadas'].items():
+            self.stdout.write(f"Temporada {temporada}: {total} lotes archivados")
+        self.stdout.write(self.style.SUCCESS(
+            f"{mensaje}: {resultado['total']} lotes anteriores a {resultado['fecha_corte']}"
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from business.services import AuditoriaService
+
+
+class Command(BaseCommand):
+    help = "Registra en el historial de auditoría el estado actual de los lotes que aún no lo tienen"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamano', type=int, default=200,
+            help="Lotes por bloque de lectura (por defecto 200)"
+        )
+
+    def handle(self, *args, **options):
+        resultado, mensaje = AuditoriaService.registrar_linea_base(max(1, options['tamano']))
+        if not resultado:
+            raise CommandError(mensaje)
+        self.stdout.write(self.style.SUCCESS(
+            f"{mensaje}: {resultado['lotes']} lotes, {resultado['entradas']} entradas"
+        ))
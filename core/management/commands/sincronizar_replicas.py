@@ -0,0 +1,42 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Copia la base de datos primaria sobre las réplicas de lectura SQLite"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo', type=int, default=0,
+            help="Segundos entre sincronizaciones; 0 sincroniza una sola vez"
+        )
+
+    def handle(self, *args, **options):
+        replicas = getattr(settings, 'DATABASE_READ_REPLICAS', {})
+        if not replicas:
+            raise CommandError("No hay réplicas configuradas (STA_READ_REPLICAS)")
+
+        while True:
+            self.sincronizar(replicas)
+            if options['intervalo'] <= 0:
+                break
+            time.sleep(options['intervalo'])
+
+    def sincronizar(self, replicas):
+        origen = sqlite3.connect(str(connections['default'].settings_dict['NAME']))
+        try:
+            for alias, ruta in replicas.items():
+                # Copia consistente aunque la primaria reciba escrituras
+                destino = sqlite3.connect(ruta)
+                try:
+                    origen.backup(destino)
+                finally:
+                    destino.close()
+                connections[alias].close()
+                self.stdout.write(self.style.SUCCESS(f"Réplica {alias} sincronizada ({ruta})"))
+        finally:
+            origen.close()
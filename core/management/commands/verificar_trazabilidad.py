@@ -0,0 +1,71 @@
+import csv
+import os
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from business.services import VerificacionService
+
+
+class Command(BaseCommand):
+    help = "Verifica en paralelo la trazabilidad completa de los lotes y lista los incompletos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--temporada', type=int, default=None,
+            help="Año de cosecha a verificar (por defecto todos los lotes)"
+        )
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count() or 1,
+            help="Procesos del pool (por defecto uno por núcleo)"
+        )
+        parser.add_argument(
+            '--particiones', type=int, default=None,
+            help="Rangos de ids en que se reparte el trabajo (por defecto 4 por proceso)"
+        )
+        parser.add_argument(
+            '--base', type=Path, default=None,
+            help="Copia SQLite a verificar, p. ej. una réplica; por defecto una instantánea temporal de la primaria"
+        )
+        parser.add_argument(
+            '--salida', default='-',
+            help="Fichero CSV del informe de lotes incompletos ('-' para la salida estándar)"
+        )
+
+    def handle(self, *args, **options):
+        if options['base'] is not None and not options['base'].exists():
+            raise CommandError(f"No existe la base {options['base']}")
+
+        resultado, mensaje = VerificacionService.verificar(
+            ruta=options['base'],
+            temporada=options['temporada'],
+            procesos=max(1, options['procesos']),
+            particiones=options['particiones'],
+        )
+        if not resultado:
+            raise CommandError(mensaje)
+
+        if options['salida'] == '-':
+            self.escribir_informe(sys.stdout, resultado['incompletos'])
+            resumen = self.stderr
+        else:
+            with open(options['salida'], 'w', newline='', encoding='utf-8') as fichero:
+                self.escribir_informe(fichero, resultado['incompletos'])
+            resumen = self.stdout
+
+        estilo = self.style.SUCCESS if not resultado['incompletos'] else self.style.WARNING
+        resumen.write(estilo(
+            f"{mensaje}: {resultado['verificados']} lotes verificados, "
+            f"{len(resultado['incompletos'])} incompletos "
+            f"({resultado['particiones']} particiones, {resultado['procesos']} procesos)"
+        ))
+
+    def escribir_informe(self, destino, incompletos):
+        escritor = csv.writer(destino)
+        escritor.writerow(['lote_id', 'codigo_lote', 'finca', 'fecha_cosecha', 'motivos'])
+        for lote in incompletos:
+            escritor.writerow([
+                lote['lote_id'], lote['codigo_lote'], lote['finca'], lote['fecha_cosecha'],
+                '; '.join(lote['motivos'])
+            ])
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-19 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lote_id', models.BigIntegerField(unique=True)),
+                ('codigo_lote', models.CharField(max_length=50, unique=True)),
+                ('temporada', models.IntegerField(db_index=True)),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Lote Archivado',
+                'verbose_name_plural': 'Lotes Archivados',
+            },
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 4.2 on 2026-10-19 12:57
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+import django.db.models.deletion
+
+
+def calcular_resumenes(apps, schema_editor):
+    """Rellena los agregados a partir de los controles existentes"""
+    ControlCalidad = apps.get_model('core', 'ControlCalidad')
+    ResumenCalidadProceso = apps.get_model('core', 'ResumenCalidadProceso')
+    ResumenCalidadLote = apps.get_model('core', 'ResumenCalidadLote')
+    db = schema_editor.connection.alias
+    agregados = dict(
+        total_controles=Count('id'),
+        aprobados=Count('id', filter=Q(estado='A')),
+        brix_conteo=Count('brix'),
+        brix_suma=Sum('brix'),
+        brix_min=Min('brix'),
+        brix_max=Max('brix'),
+        ph_conteo=Count('ph'),
+        ph_suma=Sum('ph'),
+        ph_min=Min('ph'),
+        ph_max=Max('ph'),
+    )
+    for modelo, clave, campo in (
+        (ResumenCalidadProceso, 'proceso_id', 'proceso_id'),
+        (ResumenCalidadLote, 'proceso__lote_id', 'lote_id'),
+    ):
+        filas = ControlCalidad.objects.using(db).values(clave).annotate(**agregados).order_by()
+        modelo.objects.using(db).bulk_create([
+            modelo(**{
+                campo: fila.pop(clave),
+                **fila,
+                'brix_suma': fila['brix_suma'] or 0,
+                'ph_suma': fila['ph_suma'] or 0,
+            })
+            for fila in filas
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_lotearchivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCalidadLote',
+            fields=[
+                ('total_controles', models.IntegerField(default=0)),
+                ('aprobados', models.IntegerField(default=0)),
+                ('brix_conteo', models.IntegerField(default=0)),
+                ('brix_suma', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('brix_min', models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True)),
+                ('brix_max', models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True)),
+                ('ph_conteo', models.IntegerField(default=0)),
+                ('ph_suma', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('ph_min', models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True)),
+                ('ph_max', models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True)),
+                ('lote', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_calidad', serialize=False, to='core.lotecultivo')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Calidad por Lote',
+                'verbose_name_plural': 'Resúmenes de Calidad por Lote',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenCalidadProceso',
+            fields=[
+                ('total_controles', models.IntegerField(default=0)),
+                ('aprobados', models.IntegerField(default=0)),
+                ('brix_conteo', models.IntegerField(default=0)),
+                ('brix_suma', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('brix_min', models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True)),
+                ('brix_max', models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True)),
+                ('ph_conteo', models.IntegerField(default=0)),
+                ('ph_suma', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('ph_min', models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True)),
+                ('ph_max', models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True)),
+                ('proceso', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_calidad', serialize=False, to='core.procesotransformacion')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Calidad por Proceso',
+                'verbose_name_plural': 'Resúmenes de Calidad por Proceso',
+            },
+        ),
+        migrations.RunPython(calcular_resumenes, migrations.RunPython.noop),
+    ]
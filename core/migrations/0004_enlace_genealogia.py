@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_resumen_calidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnlaceGenealogia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origen_tipo', models.CharField(choices=[('L', 'Lote de cultivo'), ('P', 'Proceso de transformación'), ('T', 'Transporte')], max_length=1)),
+                ('origen_id', models.BigIntegerField()),
+                ('destino_tipo', models.CharField(choices=[('L', 'Lote de cultivo'), ('P', 'Proceso de transformación'), ('T', 'Transporte')], max_length=1)),
+                ('destino_id', models.BigIntegerField()),
+                ('cantidad', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('unidad_medida', models.CharField(blank=True, max_length=50)),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Enlace de Genealogía',
+                'verbose_name_plural': 'Enlaces de Genealogía',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='enlacegenealogia',
+            index=models.Index(fields=['destino_tipo', 'destino_id'], name='enlace_genealogia_destino'),
+        ),
+        migrations.AddConstraint(
+            model_name='enlacegenealogia',
+            constraint=models.UniqueConstraint(fields=('origen_tipo', 'origen_id', 'destino_tipo', 'destino_id'), name='enlace_genealogia_unico'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-19 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_enlace_genealogia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='controlcalidad',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='lotecultivo',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='procesotransformacion',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='transporte',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
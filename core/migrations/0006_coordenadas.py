@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+# Índices espaciales R*Tree mantenidos por triggers. El SQL vive en
+# core/indices_geo.py, que también lo recrea si una migración futura
+# reconstruye las tablas indexadas y comprueba que los triggers existan.
+from core.indices_geo import INDICES, borrar_indice, crear_indice
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_modificado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lotecultivo',
+            name='latitud',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='lotecultivo',
+            name='longitud',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='transporte',
+            name='destino_latitud',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='transporte',
+            name='destino_longitud',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+    ] + [
+        migrations.RunSQL(crear_indice(*indice), reverse_sql=borrar_indice(*indice))
+        for indice in INDICES
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-19 13:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# El historial sólo admite inserciones: SQLite rechaza cualquier UPDATE.
+# Los DELETE se permiten para purgar por retención.
+INMUTABLE = (
+    "CREATE TRIGGER core_registroauditoria_inmutable BEFORE UPDATE ON core_registroauditoria "
+    "BEGIN SELECT RAISE(ABORT, 'El registro de auditoría no admite modificaciones'); END"
+)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_coordenadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActorAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=200, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Actor de Auditoría',
+                'verbose_name_plural': 'Actores de Auditoría',
+            },
+        ),
+        migrations.CreateModel(
+            name='RegistroAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('entidad', models.CharField(choices=[('L', 'Lote de cultivo'), ('P', 'Proceso de transformación'), ('C', 'Control de calidad'), ('T', 'Transporte')], max_length=1)),
+                ('objeto_id', models.BigIntegerField()),
+                ('lote_id', models.BigIntegerField()),
+                ('operacion', models.CharField(choices=[('C', 'Creación'), ('M', 'Modificación'), ('E', 'Eliminación'), ('B', 'Línea base')], max_length=1)),
+                ('cambios', models.TextField(default='{}')),
+                ('actor', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.actorauditoria')),
+            ],
+            options={
+                'verbose_name': 'Registro de Auditoría',
+                'verbose_name_plural': 'Registros de Auditoría',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='registroauditoria',
+            index=models.Index(fields=['lote_id', 'fecha'], name='auditoria_lote_fecha'),
+        ),
+        migrations.RunSQL(INMUTABLE, 'DROP TRIGGER IF EXISTS core_registroauditoria_inmutable'),
+    ]
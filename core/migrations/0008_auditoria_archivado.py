@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_auditoria'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registroauditoria',
+            name='operacion',
+            field=models.CharField(choices=[('C', 'Creación'), ('M', 'Modificación'), ('E', 'Eliminación'), ('B', 'Línea base'), ('A', 'Archivado')], max_length=1),
+        ),
+    ]
@@ -11,6 +11,10 @@ class LoteCultivo(models.Model):
     fecha_cosecha = models.DateField()
     responsable = models.CharField(max_length=200)
     certificacion_organica = models.BooleanField(default=True)
+    # Ubicación de la finca (opcional); indexada en la tabla R*Tree core_lote_rtree
+    latitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    modificado = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = "Lote de Cultivo"
@@ -30,6 +34,7 @@ class ProcesoTransformacion(models.Model):
     tipo_empaque = models.CharField(max_length=100)
     cantidad_empaquetada = models.IntegerField(validators=[MinValueValidator(1)])
     unidad_medida = models.CharField(max_length=50)
+    modificado = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Proceso de Transformación"
@@ -59,6 +64,7 @@ class ControlCalidad(models.Model):
     brix = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
     defectos = models.TextField(blank=True)
     observaciones = models.TextField(blank=True)
+    modificado = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Control de Calidad"
@@ -68,6 +74,45 @@ class ControlCalidad(models.Model):
         return f"Control {self.id} - {self.get_estado_display()}"
 
 
+class ResumenCalidad(models.Model):
+    """Agregados de calidad mantenidos de forma incremental al insertar controles"""
+    total_controles = models.IntegerField(default=0)
+    aprobados = models.IntegerField(default=0)
+    brix_conteo = models.IntegerField(default=0)
+    brix_suma = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    brix_min = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    brix_max = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    ph_conteo = models.IntegerField(default=0)
+    ph_suma = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    ph_min = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
+    ph_max = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
+    
+    class Meta:
+        abstract = True
+
+
+class ResumenCalidadProceso(ResumenCalidad):
+    """Agregados de calidad de un proceso de transformación"""
+    proceso = models.OneToOneField(
+        ProcesoTransformacion, on_delete=models.CASCADE, primary_key=True, related_name='resumen_calidad'
+    )
+    
+    class Meta:
+        verbose_name = "Resumen de Calidad por Proceso"
+        verbose_name_plural = "Resúmenes de Calidad por Proceso"
+
+
+class ResumenCalidadLote(ResumenCalidad):
+    """Agregados de calidad de todos los procesos de un lote"""
+    lote = models.OneToOneField(
+        LoteCultivo, on_delete=models.CASCADE, primary_key=True, related_name='resumen_calidad'
+    )
+    
+    class Meta:
+        verbose_name = "Resumen de Calidad por Lote"
+        verbose_name_plural = "Resúmenes de Calidad por Lote"
+
+
 class Transporte(models.Model):
     """Modelo para representar la logística: transporte y entrega"""
     lote = models.ForeignKey(LoteCultivo, on_delete=models.CASCADE, related_name='transportes')
@@ -82,10 +127,135 @@ class Transporte(models.Model):
     temperatura_promedio = models.DecimalField(max_digits=4, decimal_places=1)
     recibido_por = models.CharField(max_length=200, blank=True)
     estado_entrega = models.CharField(max_length=50, blank=True)
+    # Ubicación del destino (opcional); indexada en la tabla R*Tree core_transporte_rtree
+    destino_latitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    destino_longitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    modificado = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Transporte"
         verbose_name_plural = "Transportes"
     
     def __str__(self):
-        return f"Transporte Lote {self.lote.codigo_lote} a {self.destino}"
\ No newline at end of file
+        return f"Transporte Lote {self.lote.codigo_lote} a {self.destino}"
+
+
+class LoteArchivado(models.Model):
+    """Índice de lotes movidos a los archivos SQLite por temporada"""
+    lote_id = models.BigIntegerField(unique=True)
+    codigo_lote = models.CharField(max_length=50, unique=True)
+    temporada = models.IntegerField(db_index=True)
+    fecha_archivo = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Lote Archivado"
+        verbose_name_plural = "Lotes Archivados"
+    
+    def __str__(self):
+        return f"Lote {self.codigo_lote} - temporada {self.temporada}"
+
+
+class EnlaceGenealogia(models.Model):
+    """Arista del grafo de linaje: reparto o mezcla de fruta entre lotes, procesos y transportes
+
+    Las relaciones implícitas (proceso -> lote, transporte -> proceso) ya forman
+    parte del grafo; aquí sólo se registran las adicionales, p. ej. un lote
+    repartido entre varios empaques o varios lotes mezclados en un envío.
+    """
+    LOTE = 'L'
+    PROCESO = 'P'
+    TRANSPORTE = 'T'
+    TIPO_CHOICES = [
+        (LOTE, 'Lote de cultivo'),
+        (PROCESO, 'Proceso de transformación'),
+        (TRANSPORTE, 'Transporte'),
+    ]
+    
+    origen_tipo = models.CharField(max_length=1, choices=TIPO_CHOICES)
+    origen_id = models.BigIntegerField()
+    destino_tipo = models.CharField(max_length=1, choices=TIPO_CHOICES)
+    destino_id = models.BigIntegerField()
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    unidad_medida = models.CharField(max_length=50, blank=True)
+    fecha_registro = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Enlace de Genealogía"
+        verbose_name_plural = "Enlaces de Genealogía"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['origen_tipo', 'origen_id', 'destino_tipo', 'destino_id'],
+                name='enlace_genealogia_unico'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['destino_tipo', 'destino_id'], name='enlace_genealogia_destino'),
+        ]
+    
+    def __str__(self):
+        return f"{self.origen_tipo}{self.origen_id} -> {self.destino_tipo}{self.destino_id}"
+
+
+class ActorAuditoria(models.Model):
+    """Autor de cambios auditados, guardado una sola vez y referenciado por id"""
+    nombre = models.CharField(max_length=200, unique=True)
+    
+    class Meta:
+        verbose_name = "Actor de Auditoría"
+        verbose_name_plural = "Actores de Auditoría"
+    
+    def __str__(self):
+        return self.nombre
+
+
+class RegistroAuditoria(models.Model):
+    """Entrada del historial de cambios; la tabla sólo admite inserciones
+
+    ``cambios`` guarda en JSON compacto los campos que cambiaron (en el alta,
+    los que tienen valor). ``lote_id`` permite reconstruir la trazabilidad de
+    un lote en cualquier fecha con un solo recorrido del índice.
+    """
+    LOTE = 'L'
+    PROCESO = 'P'
+    CONTROL = 'C'
+    TRANSPORTE = 'T'
+    ENTIDAD_CHOICES = [
+        (LOTE, 'Lote de cultivo'),
+        (PROCESO, 'Proceso de transformación'),
+        (CONTROL, 'Control de calidad'),
+        (TRANSPORTE, 'Transporte'),
+    ]
+    
+    CREACION = 'C'
+    MODIFICACION = 'M'
+    ELIMINACION = 'E'
+    LINEA_BASE = 'B'
+    ARCHIVADO = 'A'
+    OPERACION_CHOICES = [
+        (CREACION, 'Creación'),
+        (MODIFICACION, 'Modificación'),
+        (ELIMINACION, 'Eliminación'),
+        (LINEA_BASE, 'Línea base'),
+        (ARCHIVADO, 'Archivado'),
+    ]
+    
+    fecha = models.DateTimeField()
+    entidad = models.CharField(max_length=1, choices=ENTIDAD_CHOICES)
+    objeto_id = models.BigIntegerField()
+    lote_id = models.BigIntegerField()
+    operacion = models.CharField(max_length=1, choices=OPERACION_CHOICES)
+    # Sin índice ni restricción propios: cada índice extra encarece las inserciones
+    actor = models.ForeignKey(
+        ActorAuditoria, on_delete=models.DO_NOTHING, related_name='+', db_index=False, db_constraint=False
+    )
+    cambios = models.TextField(default='{}')
+    
+    class Meta:
+        verbose_name = "Registro de Auditoría"
+        verbose_name_plural = "Registros de Auditoría"
+        indexes = [
+            models.Index(fields=['lote_id', 'fecha'], name='auditoria_lote_fecha'),
+        ]
+    
+    def __str__(self):
+        return f"{self.entidad}{self.objeto_id} {self.operacion} {self.fecha:%Y-%m-%d %H:%M}"
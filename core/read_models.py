@@ -0,0 +1,82 @@
+"""
+Modelos de lectura: objetos inmutables y ligeros para las rutas de consulta.
+
+Se construyen directamente desde filas de ``values_list()`` (en el orden de
+``CAMPOS``), sin instanciar modelos de Django, por lo que no pagan el coste
+de ``Model.__init__`` ni de las señales ``pre_init``/``post_init``.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import ClassVar, Optional, Tuple
+
+from .models import ControlCalidad
+
+_ESTADOS_CONTROL = dict(ControlCalidad.ESTADO_CHOICES)
+
+
+@dataclass(frozen=True, slots=True)
+class LoteView:
+    id: int
+    codigo_lote: str
+    finca: str
+    variedad: str
+    fecha_siembra: date
+    fecha_cosecha: date
+    responsable: str
+
+    CAMPOS: ClassVar[Tuple[str, ...]] = (
+        'id', 'codigo_lote', 'finca', 'variedad', 'fecha_siembra', 'fecha_cosecha', 'responsable'
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class ProcesoView:
+    id: int
+    lote_id: int
+    fecha_lavado: datetime
+    fecha_empaquetado: datetime
+    tipo_empaque: str
+    cantidad_empaquetada: int
+
+    CAMPOS: ClassVar[Tuple[str, ...]] = (
+        'id', 'lote_id', 'fecha_lavado', 'fecha_empaquetado', 'tipo_empaque', 'cantidad_empaquetada'
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class ControlView:
+    id: int
+    proceso_id: int
+    fecha_control: datetime
+    inspector: str
+    estado: str
+    ph: Optional[Decimal]
+    brix: Optional[Decimal]
+
+    CAMPOS: ClassVar[Tuple[str, ...]] = (
+        'id', 'proceso_id', 'fecha_control', 'inspector', 'estado', 'ph', 'brix'
+    )
+
+    @property
+    def estado_display(self) -> str:
+        return _ESTADOS_CONTROL.get(self.estado, self.estado)
+
+
+@dataclass(frozen=True, slots=True)
+class TransporteView:
+    id: int
+    lote_id: int
+    proceso_id: int
+    fecha_salida: datetime
+    fecha_entrega: Optional[datetime]
+    destino: str
+    temperatura_minima: Decimal
+    temperatura_maxima: Decimal
+    temperatura_promedio: Decimal
+    estado_entrega: str
+
+    CAMPOS: ClassVar[Tuple[str, ...]] = (
+        'id', 'lote_id', 'proceso_id', 'fecha_salida', 'fecha_entrega', 'destino',
+        'temperatura_minima', 'temperatura_maxima', 'temperatura_promedio', 'estado_entrega'
+    )
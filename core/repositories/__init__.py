@@ -0,0 +1,562 @@
+from django.core.exceptions import ObjectDoesNotExist
+import sqlite3
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db import connections, router, transaction
+from django.db.models import Count, Max, Min
+from ..models import (
+    LoteCultivo, ProcesoTransformacion, ControlCalidad, Transporte,
+    ResumenCalidadProceso, ResumenCalidadLote
+)
+from ..routers import en_primaria
+from ..signals import controles_creados
+from .. import contadores, escritura_agrupada
+from ..read_models import LoteView, ProcesoView, ControlView, TransporteView
+from typing import Callable, List, Optional, Dict, Any, Tuple
+from .comun import _primaria, _alias_escritura
+# Repositorios con módulo propio, importables también desde aquí
+from .archivo import ArchivoRepository
+from .auditoria import AuditoriaRepository
+from .genealogia import GenealogiaRepository
+from .geo import GeoRepository
+
+
+class LoteRepository:
+    """Repositorio para operaciones CRUD de Lotes de Cultivo"""
+    
+    @staticmethod
+    def obtener_por_id(lote_id: int, using: Optional[str] = None) -> Optional[LoteCultivo]:
+        try:
+            return LoteCultivo.objects.db_manager(using).get(id=lote_id)
+        except ObjectDoesNotExist:
+            return None
+    
+    @staticmethod
+    def obtener_por_codigo(codigo: str) -> Optional[LoteCultivo]:
+        try:
+            return LoteCultivo.objects.get(codigo_lote=codigo)
+        except ObjectDoesNotExist:
+            return None
+    
+    @staticmethod
+    def obtener_todos() -> List[LoteCultivo]:
+        return list(LoteCultivo.objects.all().order_by('-fecha_cosecha'))
+    
+    @staticmethod
+    def obtener_vista(lote_id: int, using: Optional[str] = None) -> Optional[LoteView]:
+        fila = LoteCultivo.objects.db_manager(using).filter(id=lote_id).values_list(*LoteView.CAMPOS).first()
+        return LoteView(*fila) if fila else None
+    
+    @staticmethod
+    def listar_vistas(limite: Optional[int] = None) -> List[LoteView]:
+        filas = LoteCultivo.objects.order_by('-fecha_cosecha').values_list(*LoteView.CAMPOS)
+        if limite is not None:
+            filas = filas[:limite]
+        return [LoteView(*fila) for fila in filas]
+    
+    @staticmethod
+    def version_listado():
+        """(última modificación, nº de lotes) del listado en una sola consulta agregada"""
+        version = LoteCultivo.objects.aggregate(ultima=Max('modificado'), total=Count('id'))
+        return version['ultima'], version['total']
+    
+    @staticmethod
+    def version_trazabilidad(lote_id: int):
+        """(última modificación, nº de filas) del lote y sus filas relacionadas en una consulta
+
+        El recuento detecta borrados, que no dejan marca de tiempo.
+        """
+        sql = (
+            "SELECT MAX(m), SUM(n), SUM(es_lote) FROM ("
+            "SELECT MAX(modificado) AS m, COUNT(*) AS n, COUNT(*) AS es_lote FROM core_lotecultivo WHERE id = %(id)s "
+            "UNION ALL SELECT MAX(modificado), COUNT(*), 0 FROM core_procesotransformacion WHERE lote_id = %(id)s "
+            "UNION ALL SELECT MAX(c.modificado), COUNT(*), 0 FROM core_controlcalidad c "
+            "JOIN core_procesotransformacion p ON p.id = c.proceso_id WHERE p.lote_id = %(id)s "
+            "UNION ALL SELECT MAX(modificado), COUNT(*), 0 FROM core_transporte WHERE lote_id = %(id)s"
+            ")"
+        )
+        with connections[router.db_for_read(LoteCultivo)].cursor() as cursor:
+            cursor.execute(sql, {'id': lote_id})
+            ultima, total, existe = cursor.fetchone()
+        if not existe:
+            return None, 0
+        if isinstance(ultima, str):
+            ultima = parse_datetime(ultima)
+        if ultima is not None and timezone.is_naive(ultima):
+            ultima = timezone.make_aware(ultima, timezone.utc)
+        return ultima, total
+    
+    @staticmethod
+    def crear(data: Dict[str, Any]) -> LoteCultivo:
+        return LoteCultivo.objects.create(**data)
+    
+    @staticmethod
+    def actualizar(lote_id: int, data: Dict[str, Any]) -> Optional[LoteCultivo]:
+        try:
+            lote = _primaria(LoteCultivo).get(id=lote_id)
+            for key, value in data.items():
+                setattr(lote, key, value)
+            lote.save()
+            return lote
+        except ObjectDoesNotExist:
+            return None
+    
+    @staticmethod
+    def eliminar(lote_id: int) -> bool:
+        try:
+            lote = _primaria(LoteCultivo).get(id=lote_id)
+            lote.delete()
+            return True
+        except ObjectDoesNotExist:
+            return False
+
+
+class ProcesoRepository:
+    """Repositorio para operaciones CRUD de Procesos de Transformación"""
+    
+    @staticmethod
+    def obtener_por_lote(lote_id: int, using: Optional[str] = None) -> List[ProcesoTransformacion]:
+        return list(ProcesoTransformacion.objects.db_manager(using).filter(lote_id=lote_id).order_by('-fecha_lavado'))
+    
+    @staticmethod
+    def vistas_por_lote(lote_id: int, using: Optional[str] = None) -> List[ProcesoView]:
+        filas = (
+            ProcesoTransformacion.objects.db_manager(using)
+            .filter(lote_id=lote_id).order_by('-fecha_lavado')
+            .values_list(*ProcesoView.CAMPOS)
+        )
+        return [ProcesoView(*fila) for fila in filas]
+    
+    @staticmethod
+    def crear_proceso(data: Dict[str, Any]) -> ProcesoTransformacion:
+        if escritura_agrupada.activa():
+            return escritura_agrupada.escritor_agrupado.insertar(ProcesoTransformacion, data)
+        return ProcesoTransformacion.objects.create(**data)
+
+
+class ControlCalidadRepository:
+    """Repositorio para operaciones CRUD de Controles de Calidad"""
+    
+    @staticmethod
+    def vistas_por_lote(lote_id: int, using: Optional[str] = None) -> Dict[int, List[ControlView]]:
+        """Controles de todos los procesos del lote en una sola consulta, agrupados por proceso"""
+        filas = (
+            ControlCalidad.objects.db_manager(using)
+            .filter(proceso__lote_id=lote_id).order_by('id')
+            .values_list(*ControlView.CAMPOS)
+        )
+        por_proceso: Dict[int, List[ControlView]] = {}
+        for fila in filas:
+            control = ControlView(*fila)
+            por_proceso.setdefault(control.proceso_id, []).append(control)
+        return por_proceso
+    
+    @staticmethod
+    def crear_varios(datos: List[Dict[str, Any]]) -> Tuple[List[ControlCalidad], set]:
+        """Inserta controles en bloque y actualiza los agregados en la misma transacción
+
+        Devuelve los controles y los ids de los lotes afectados.
+        """
+        alias = _alias_escritura(ControlCalidad)
+        with transaction.atomic(using=alias):
+            proceso_ids = {d['proceso_id'] for d in datos}
+            lote_por_proceso = dict(
+                _primaria(ProcesoTransformacion).filter(id__in=proceso_ids).values_list('id', 'lote_id')
+            )
+            faltantes = proceso_ids - lote_por_proceso.keys()
+            if faltantes:
+                raise ObjectDoesNotExist(f"Procesos inexistentes: {sorted(faltantes)}")
+            
+            # bulk_create no emite post_save: los agregados se actualizan aquí
+            controles = ControlCalidad.objects.using(alias).bulk_create(
+                [ControlCalidad(**d) for d in datos]
+            )
+            lote_ids = ControlCalidadRepository.acumular(controles, lote_por_proceso)
+        
+        controles_creados.send(
+            sender=ControlCalidad, controles=controles, lote_ids=lote_ids,
+            lote_por_proceso=lote_por_proceso, using=alias
+        )
+        return controles, lote_ids
+    
+    @staticmethod
+    def acumular(controles: List[ControlCalidad], lote_por_proceso: Optional[Dict[int, int]] = None) -> set:
+        """Suma controles recién insertados a los resúmenes de su proceso y su lote"""
+        alias = _alias_escritura(ControlCalidad)
+        if lote_por_proceso is None:
+            lote_por_proceso = dict(
+                _primaria(ProcesoTransformacion)
+                .filter(id__in={c.proceso_id for c in controles}).values_list('id', 'lote_id')
+            )
+        por_proceso: Dict[int, _DeltaCalidad] = {}
+        por_lote: Dict[int, _DeltaCalidad] = {}
+        for control in controles:
+            por_proceso.setdefault(control.proceso_id, _DeltaCalidad()).sumar(control)
+            por_lote.setdefault(lote_por_proceso[control.proceso_id], _DeltaCalidad()).sumar(control)
+        with transaction.atomic(using=alias):
+            _DeltaCalidad.aplicar(ResumenCalidadProceso, alias, por_proceso)
+            _DeltaCalidad.aplicar(ResumenCalidadLote, alias, por_lote)
+        return set(por_lote)
+    
+    @staticmethod
+    def recalcular_resumenes(proceso_id: int, hechos: Optional[set] = None) -> None:
+        """Recalcula desde los controles los resúmenes del proceso y de su lote
+
+        Sólo se usa cuando un control se modifica o se borra; las inserciones
+        se acumulan de forma incremental. ``hechos`` guarda los resúmenes ya
+        recalculados en la misma operación (un borrado en cascada, un cambio de
+        proceso), que no se repiten.
+        """
+        if hechos is not None and (ResumenCalidadProceso, proceso_id) in hechos:
+            return
+        lote_id = _primaria(ProcesoTransformacion).filter(id=proceso_id).values_list('lote_id', flat=True).first()
+        resumenes = [(ResumenCalidadProceso, proceso_id, {'proceso_id': proceso_id})]
+        if lote_id is not None:
+            resumenes.append((ResumenCalidadLote, lote_id, {'proceso__lote_id': lote_id}))
+        ControlCalidadRepository._recalcular(resumenes, hechos)
+    
+    @staticmethod
+    def recalcular_resumen_lote(lote_id: int, hechos: Optional[set] = None) -> None:
+        """Recalcula el resumen del lote tras borrar uno de sus procesos"""
+        ControlCalidadRepository._recalcular(
+            [(ResumenCalidadLote, lote_id, {'proceso__lote_id': lote_id})], hechos
+        )
+    
+    @staticmethod
+    def _recalcular(resumenes: list, hechos: Optional[set]) -> None:
+        if hechos is not None:
+            resumenes = [r for r in resumenes if (r[0], r[1]) not in hechos]
+            hechos.update((model, clave) for model, clave, _ in resumenes)
+        if not resumenes:
+            return
+        alias = _alias_escritura(ControlCalidad)
+        with transaction.atomic(using=alias):
+            for model, clave, filtro in resumenes:
+                model.objects.using(alias).filter(pk=clave).delete()
+                delta = _DeltaCalidad()
+                for control in _primaria(ControlCalidad).filter(**filtro).only('estado', 'brix', 'ph'):
+                    delta.sumar(control)
+                if delta.total:
+                    _DeltaCalidad.aplicar(model, alias, {clave: delta})
+    
+    @staticmethod
+    def resumenes_por_lote(lote_id: int, using: Optional[str] = None):
+        """Agregados del lote y de cada uno de sus procesos (sin leer controles)"""
+        resumen_lote = ResumenCalidadLote.objects.db_manager(using).filter(lote_id=lote_id).first()
+        por_proceso = {
+            r.proceso_id: r
+            for r in ResumenCalidadProceso.objects.db_manager(using).filter(proceso__lote_id=lote_id)
+        }
+        return resumen_lote, por_proceso
+
+
+class _DeltaCalidad:
+    """Acumula el efecto de varios controles sobre un resumen de calidad"""
+    
+    def __init__(self):
+        self.total = 0
+        self.aprobados = 0
+        self.medidas = {'brix': [], 'ph': []}
+    
+    def sumar(self, control: ControlCalidad) -> None:
+        self.total += 1
+        self.aprobados += control.estado == ControlCalidad.APROBADO
+        for campo, valores in self.medidas.items():
+            valor = getattr(control, campo)
+            if valor is not None:
+                valores.append(valor)
+    
+    def valores(self) -> list:
+        fila = [self.total, self.aprobados]
+        for valores in self.medidas.values():
+            if valores:
+                fila += [len(valores), sum(valores), min(valores), max(valores)]
+            else:
+                fila += [0, 0, None, None]
+        return fila
+    
+    # Filas por sentencia: 11 parámetros cada una, lejos del límite de SQLite
+    LOTE_UPSERT = 500
+    
+    @staticmethod
+    def aplicar(model, alias: str, deltas: Dict[int, '_DeltaCalidad']) -> None:
+        """Suma los deltas a sus resúmenes con un único INSERT ... ON CONFLICT
+
+        Una sentencia por cada LOTE_UPSERT resúmenes, no una por resumen: el
+        coste en consultas de una ingesta no crece con los procesos que toca.
+        """
+        clave = model._meta.pk.column
+        columnas = [clave, 'total_controles', 'aprobados']
+        asignaciones = [
+            'total_controles = total_controles + excluded.total_controles',
+            'aprobados = aprobados + excluded.aprobados',
+        ]
+        for campo in ('brix', 'ph'):
+            columnas += [f'{campo}_conteo', f'{campo}_suma', f'{campo}_min', f'{campo}_max']
+            asignaciones += [
+                f'{campo}_conteo = {campo}_conteo + excluded.{campo}_conteo',
+                f'{campo}_suma = {campo}_suma + excluded.{campo}_suma',
+            ]
+            for extremo, funcion in (('min', 'MIN'), ('max', 'MAX')):
+                columna = f'{campo}_{extremo}'
+                asignaciones.append(
+                    f'{columna} = {funcion}(COALESCE({columna}, excluded.{columna}), '
+                    f'COALESCE(excluded.{columna}, {columna}))'
+                )
+        fila_sql = '(' + ', '.join(['%s'] * len(columnas)) + ')'
+        filas = [[id_] + delta.valores() for id_, delta in deltas.items()]
+        with connections[alias].cursor() as cursor:
+            for inicio in range(0, len(filas), _DeltaCalidad.LOTE_UPSERT):
+                bloque = filas[inicio:inicio + _DeltaCalidad.LOTE_UPSERT]
+                cursor.execute(
+                    f'INSERT INTO {model._meta.db_table} ({", ".join(columnas)}) '
+                    f'VALUES {", ".join([fila_sql] * len(bloque))} '
+                    f'ON CONFLICT ({clave}) DO UPDATE SET {", ".join(asignaciones)}',
+                    [valor for fila in bloque for valor in fila]
+                )
+
+
+class TransporteRepository:
+    """Repositorio para operaciones CRUD de Transportes"""
+    
+    @staticmethod
+    def obtener_por_lote(lote_id: int, using: Optional[str] = None) -> List[Transporte]:
+        return list(Transporte.objects.db_manager(using).filter(lote_id=lote_id).order_by('-fecha_salida'))
+    
+    @staticmethod
+    def vistas_por_lote(lote_id: int, using: Optional[str] = None) -> List[TransporteView]:
+        filas = (
+            Transporte.objects.db_manager(using)
+            .filter(lote_id=lote_id).order_by('-fecha_salida')
+            .values_list(*TransporteView.CAMPOS)
+        )
+        return [TransporteView(*fila) for fila in filas]
+    
+    @staticmethod
+    def muestras_entregas(temperatura_minima, temperatura_maxima) -> List[tuple]:
+        """(destino, entregas, excursiones, posición, horas) de las entregas de cada destino
+
+        SQLite calcula la duración, ordena cada destino con funciones de
+        ventana y devuelve sólo las posiciones (desde 0, por duración) que
+        usan los deciles 'inclusive' p10, p50 y p90 (``j`` y ``j + 1`` con
+        ``j = i * (n - 1) / 10``) y el máximo: a lo sumo siete filas por
+        destino. Las entregas anteriores a su salida se descartan.
+        """
+        sql = f"""
+            WITH entregas AS (
+                SELECT destino,
+                       (julianday(fecha_entrega) - julianday(fecha_salida)) * 24 AS horas,
+                       (temperatura_minima < %s OR temperatura_maxima > %s) AS excursion
+                FROM {Transporte._meta.db_table} WHERE fecha_entrega IS NOT NULL
+            ), ordenadas AS (
+                SELECT destino, horas,
+                       ROW_NUMBER() OVER (PARTITION BY destino ORDER BY horas) - 1 AS posicion,
+                       COUNT(*) OVER (PARTITION BY destino) AS n,
+                       SUM(excursion) OVER (PARTITION BY destino) AS excursiones
+                FROM entregas WHERE horas >= 0
+            )
+            SELECT destino, n, excursiones, posicion, horas FROM ordenadas
+            WHERE posicion IN ((n - 1) / 10, (n - 1) / 10 + 1, 5 * (n - 1) / 10, 5 * (n - 1) / 10 + 1,
+                               9 * (n - 1) / 10, 9 * (n - 1) / 10 + 1, n - 1)
+        """
+        with connections[router.db_for_read(Transporte)].cursor() as cursor:
+            cursor.execute(sql, [float(temperatura_minima), float(temperatura_maxima)])
+            return cursor.fetchall()
+    
+    @staticmethod
+    def horas_entregas(destinos: List[str]) -> List[float]:
+        """Duraciones ordenadas de las entregas de varios destinos juntos"""
+        sql = f"""
+            SELECT horas FROM (
+                SELECT (julianday(fecha_entrega) - julianday(fecha_salida)) * 24 AS horas
+                FROM {Transporte._meta.db_table}
+                WHERE fecha_entrega IS NOT NULL AND destino IN ({', '.join(['%s'] * len(destinos))})
+            ) WHERE horas >= 0 ORDER BY horas
+        """
+        with connections[router.db_for_read(Transporte)].cursor() as cursor:
+            cursor.execute(sql, destinos)
+            return [horas for horas, in cursor.fetchall()]
+    
+    @staticmethod
+    def crear(data: Dict[str, Any]) -> Transporte:
+        if escritura_agrupada.activa():
+            return escritura_agrupada.escritor_agrupado.insertar(Transporte, data)
+        return Transporte.objects.create(**data)
+    
+    @staticmethod
+    def registrar_entrega(transporte_id: int, data: Dict[str, Any]) -> Optional[Transporte]:
+        try:
+            transporte = _primaria(Transporte).get(id=transporte_id)
+            for key, value in data.items():
+                setattr(transporte, key, value)
+            transporte.save()
+            return transporte
+        except ObjectDoesNotExist:
+            return None
+    
+    @staticmethod
+    def registrar_temperatura(transporte_id: int, temperatura: float) -> Optional[Transporte]:
+        try:
+            transporte = _primaria(Transporte).get(id=transporte_id)
+            # Actualizar temperaturas (esto podría expandirse para un registro histórico)
+            if temperatura < transporte.temperatura_minima:
+                transporte.temperatura_minima = temperatura
+            if temperatura > transporte.temperatura_maxima:
+                transporte.temperatura_maxima = temperatura
+            transporte.save()
+            return transporte
+        except ObjectDoesNotExist:
+            return None
+
+
+class ResumenRepository:
+    """Cifras del panel: contadores en memoria y los recuentos que los reconcilian"""
+    
+    @staticmethod
+    def cifras() -> Dict[str, int]:
+        return contadores.contadores.valores()
+    
+    @staticmethod
+    def estado_reconciliacion() -> Dict[str, Any]:
+        return contadores.contadores.metricas()
+    
+    @staticmethod
+    def reconciliar() -> Dict[str, int]:
+        """Recuenta ya las cifras, tras escrituras que no pasan por las señales"""
+        return contadores.contadores.reconciliar()
+    
+    @staticmethod
+    def conteos(hoy: date, antes_de_leer: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Los cuatro recuentos sobre una misma instantánea de la primaria
+
+        ``antes_de_leer`` se llama ya dentro de la transacción de lectura y
+        justo antes de la primera consulta, que es la que fija la instantánea
+        en SQLite (``BEGIN`` diferido).
+        """
+        inicio = timezone.make_aware(datetime.combine(hoy, time.min))
+        # Contra la primaria, como los incrementos que se aplican encima
+        with en_primaria(), transaction.atomic(using=router.db_for_write(LoteCultivo)):
+            if antes_de_leer is not None:
+                antes_de_leer()
+            en_transito = (
+                Transporte.objects.filter(fecha_entrega__isnull=True)
+                .values_list('lote_id').annotate(n=Count('id')).order_by()
+            )
+            return {
+                'total_lotes': LoteCultivo.objects.count(),
+                'controles_pendientes': ControlCalidad.objects.filter(estado=ControlCalidad.PENDIENTE).count(),
+                'entregas_hoy': Transporte.objects.filter(
+                    fecha_entrega__gte=inicio, fecha_entrega__lt=inicio + timedelta(days=1)
+                ).count(),
+                'en_transito': dict(en_transito),
+            }
+
+
+class VerificacionRepository:
+    """Consultas por conjuntos para verificar la trazabilidad de rangos de lotes
+
+    Se ejecutan sobre una instantánea SQLite de solo lectura registrada como
+    alias propio, de modo que varios procesos la lean en paralelo sin competir
+    con las escrituras de la primaria.
+    """
+    
+    ALIAS = 'verificacion'
+    
+    @staticmethod
+    def crear_instantanea(destino: Path) -> None:
+        """Copia consistente de la primaria aunque esté recibiendo escrituras"""
+        alias = router.db_for_write(LoteCultivo)
+        origen = sqlite3.connect(str(connections[alias].settings_dict['NAME']))
+        try:
+            copia = sqlite3.connect(str(destino))
+            try:
+                origen.backup(copia)
+            finally:
+                copia.close()
+        finally:
+            origen.close()
+    
+    @staticmethod
+    def alias_instantanea(ruta: Path) -> str:
+        """Registra (una vez por proceso) la instantánea como base de datos de solo lectura"""
+        alias = VerificacionRepository.ALIAS
+        nombre = f'file:{ruta}?mode=ro'
+        if connections.settings.get(alias, {}).get('NAME') != nombre:
+            VerificacionRepository.liberar()
+            config = dict(connections.settings['default'])
+            config['NAME'] = nombre
+            connections.settings[alias] = config
+        return alias
+    
+    @staticmethod
+    def liberar() -> None:
+        """Cierra y olvida la conexión a la instantánea (antes de borrarla)"""
+        alias = VerificacionRepository.ALIAS
+        if alias in connections.settings:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+    
+    @staticmethod
+    def _filtro_temporada(temporada: Optional[int]) -> Dict[str, Any]:
+        if temporada is None:
+            return {}
+        return {'fecha_cosecha__range': (date(temporada, 1, 1), date(temporada, 12, 31))}
+    
+    @staticmethod
+    def rango_ids(alias: str, temporada: Optional[int] = None) -> Tuple[Optional[int], Optional[int]]:
+        rango = (
+            LoteCultivo.objects.using(alias)
+            .filter(**VerificacionRepository._filtro_temporada(temporada))
+            .aggregate(desde=Min('id'), hasta=Max('id'))
+        )
+        return rango['desde'], rango['hasta']
+    
+    @staticmethod
+    def lotes_incompletos(alias: str, desde: int, hasta: int,
+                          temporada: Optional[int] = None) -> Tuple[int, List[tuple]]:
+        """Lotes verificados en el rango y, de los incompletos, sus conteos
+
+        Dos consultas por rango sea cual sea su tamaño: procesos y transportes
+        se agregan con GROUP BY y la cuenta de aprobados sale del resumen de
+        calidad del lote, sin leer controles.
+        """
+        lotes = LoteCultivo.objects.using(alias).filter(
+            id__range=(desde, hasta), **VerificacionRepository._filtro_temporada(temporada)
+        )
+        verificados = lotes.count()
+        
+        tablas = {
+            'lote': LoteCultivo._meta.db_table,
+            'proceso': ProcesoTransformacion._meta.db_table,
+            'transporte': Transporte._meta.db_table,
+            'resumen': ResumenCalidadLote._meta.db_table,
+        }
+        parametros = {'desde': desde, 'hasta': hasta}
+        filtro = ''
+        if temporada is not None:
+            filtro = 'AND l.fecha_cosecha BETWEEN %(inicio)s AND %(fin)s'
+            parametros.update(inicio=date(temporada, 1, 1), fin=date(temporada, 12, 31))
+        sql = f"""
+            SELECT l.id, l.codigo_lote, l.finca, l.fecha_cosecha,
+                   COALESCE(p.total, 0), COALESCE(t.total, 0), COALESCE(r.aprobados, 0)
+            FROM {tablas['lote']} l
+            LEFT JOIN (
+                SELECT lote_id, COUNT(*) AS total FROM {tablas['proceso']}
+                WHERE lote_id BETWEEN %(desde)s AND %(hasta)s GROUP BY lote_id
+            ) p ON p.lote_id = l.id
+            LEFT JOIN (
+                SELECT lote_id, COUNT(*) AS total FROM {tablas['transporte']}
+                WHERE lote_id BETWEEN %(desde)s AND %(hasta)s GROUP BY lote_id
+            ) t ON t.lote_id = l.id
+            LEFT JOIN {tablas['resumen']} r ON r.lote_id = l.id
+            WHERE l.id BETWEEN %(desde)s AND %(hasta)s {filtro}
+              AND (p.total IS NULL OR t.total IS NULL OR COALESCE(r.aprobados, 0) = 0)
+            ORDER BY l.id
+        """
+        with connections[alias].cursor() as cursor:
+            cursor.execute(sql, parametros)
+            incompletos = cursor.fetchall()
+        return verificados, incompletos
@@ -0,0 +1,225 @@
+"""
+Repositorio de temporadas archivadas en ficheros SQLite.
+"""
+import sqlite3
+from datetime import date
+from pathlib import Path
+from django.conf import settings
+from django.db import connections, router, transaction
+from ..models import (
+    LoteCultivo, ProcesoTransformacion, ControlCalidad, Transporte, LoteArchivado,
+    ResumenCalidadProceso, ResumenCalidadLote
+)
+from ..signals import lotes_archivados
+from typing import List, Optional, Dict
+from .comun import _alias_escritura, _primaria
+
+
+class ArchivoRepository:
+    """Repositorio de lotes de temporadas cerradas, archivados en SQLite por temporada
+
+    Cada temporada (año de cosecha) vive en su propio fichero con el mismo
+    esquema que las tablas de ``core``; ``LoteArchivado`` indica en qué
+    fichero está cada lote.
+
+    Las aristas de ``EnlaceGenealogia`` se quedan en la primaria: el linaje
+    cruza temporadas (un lote archivado pudo mezclarse en un envío que sigue
+    abierto) y los ids de los nodos archivados no se reutilizan.
+    """
+    
+    # Orden de inserción: padres antes que hijos (el borrado es el inverso)
+    TABLAS = [
+        (LoteCultivo, 'id IN (SELECT id FROM temp.lotes_archivo)'),
+        (ProcesoTransformacion, 'lote_id IN (SELECT id FROM temp.lotes_archivo)'),
+        (ControlCalidad, 'proceso_id IN (SELECT id FROM main.core_procesotransformacion '
+                         'WHERE lote_id IN (SELECT id FROM temp.lotes_archivo))'),
+        (Transporte, 'lote_id IN (SELECT id FROM temp.lotes_archivo)'),
+        (ResumenCalidadProceso, 'proceso_id IN (SELECT id FROM main.core_procesotransformacion '
+                                'WHERE lote_id IN (SELECT id FROM temp.lotes_archivo))'),
+        (ResumenCalidadLote, 'lote_id IN (SELECT id FROM temp.lotes_archivo)'),
+    ]
+    
+    @staticmethod
+    def ruta_temporada(temporada: int) -> Path:
+        return Path(settings.ARCHIVO_DIR) / f'temporada_{temporada}.sqlite3'
+    
+    @staticmethod
+    def alias_temporada(temporada: int) -> str:
+        """Registra (una vez) el fichero de la temporada como base de datos de solo lectura"""
+        alias = f'archivo_{temporada}'
+        if alias not in connections.settings:
+            ruta = ArchivoRepository.ruta_temporada(temporada)
+            ArchivoRepository._completar_archivo(ruta)
+            config = dict(connections.settings['default'])
+            config['NAME'] = f'file:{ruta}?mode=ro'
+            connections.settings[alias] = config
+        return alias
+    
+    @staticmethod
+    def base_de_lote(lote_id: int) -> Optional[str]:
+        """Alias de la base de datos de archivo que contiene el lote, si está archivado"""
+        temporada = LoteArchivado.objects.filter(lote_id=lote_id).values_list('temporada', flat=True).first()
+        if temporada is None:
+            return None
+        return ArchivoRepository.alias_temporada(temporada)
+    
+    @staticmethod
+    def lote_id_por_codigo(codigo: str) -> Optional[int]:
+        return LoteArchivado.objects.filter(codigo_lote=codigo).values_list('lote_id', flat=True).first()
+    
+    @staticmethod
+    def existe_codigo(codigo: str) -> bool:
+        return LoteArchivado.objects.filter(codigo_lote=codigo).exists()
+    
+    @staticmethod
+    def candidatos(fecha_corte: date) -> Dict[int, List[int]]:
+        """Lotes cosechados antes del corte y sin transportes pendientes, por temporada"""
+        lotes = (
+            _primaria(LoteCultivo)
+            .filter(fecha_cosecha__lt=fecha_corte)
+            .exclude(transportes__fecha_entrega__isnull=True)
+            .values_list('id', 'fecha_cosecha')
+            .distinct()
+        )
+        por_temporada: Dict[int, List[int]] = {}
+        for lote_id, fecha_cosecha in lotes:
+            por_temporada.setdefault(fecha_cosecha.year, []).append(lote_id)
+        return por_temporada
+    
+    @staticmethod
+    def archivar_temporada(temporada: int, lote_ids: List[int]) -> int:
+        """Mueve los lotes indicados (con sus procesos, controles y transportes) al archivo"""
+        if not lote_ids:
+            return 0
+        ruta = ArchivoRepository.ruta_temporada(temporada)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        alias = _alias_escritura(LoteCultivo)
+        conexion = connections[alias]
+        
+        with conexion.cursor() as cursor:
+            # ATTACH no está permitido dentro de una transacción
+            cursor.execute("ATTACH DATABASE %s AS archivo", [str(ruta)])
+            try:
+                with transaction.atomic(using=alias):
+                    for model, _ in ArchivoRepository.TABLAS:
+                        ArchivoRepository._preparar_tabla(cursor, model._meta.db_table)
+                    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS lotes_archivo (id INTEGER PRIMARY KEY)")
+                    cursor.execute("DELETE FROM temp.lotes_archivo")
+                    cursor.executemany(
+                        "INSERT INTO temp.lotes_archivo (id) VALUES (%s)", [(i,) for i in lote_ids]
+                    )
+                    
+                    for model, filtro in ArchivoRepository.TABLAS:
+                        tabla = model._meta.db_table
+                        columnas = ', '.join(
+                            f'"{c}"' for c in ArchivoRepository._columnas(cursor, 'main', tabla)
+                        )
+                        cursor.execute(
+                            f'INSERT OR REPLACE INTO archivo."{tabla}" ({columnas}) '
+                            f'SELECT {columnas} FROM main."{tabla}" WHERE {filtro}'
+                        )
+                    for model, filtro in reversed(ArchivoRepository.TABLAS):
+                        cursor.execute(f'DELETE FROM main."{model._meta.db_table}" WHERE {filtro}')
+                    ArchivoRepository._rellenar_resumenes(cursor, 'archivo')
+                    
+                    cursor.execute(
+                        'SELECT id, codigo_lote FROM archivo."core_lotecultivo" '
+                        'WHERE id IN (SELECT id FROM temp.lotes_archivo)'
+                    )
+                    archivados = dict(cursor.fetchall())
+                    LoteArchivado.objects.using(alias).bulk_create([
+                        LoteArchivado(lote_id=lote_id, codigo_lote=codigo, temporada=temporada)
+                        for lote_id, codigo in archivados.items()
+                    ], ignore_conflicts=True)
+                    cursor.execute("DELETE FROM temp.lotes_archivo")
+                    # Sin post_delete: auditoría, instantáneas y almacén se enteran por aquí
+                    lotes_archivados.send(
+                        sender=LoteCultivo, lotes=archivados, temporada=temporada, using=alias
+                    )
+            finally:
+                cursor.execute("DETACH DATABASE archivo")
+        return len(lote_ids)
+    
+    @staticmethod
+    def _completar_archivo(ruta: Path) -> None:
+        """Crea en un archivo antiguo las tablas que le falten y rellena sus resúmenes
+
+        Los ficheros archivados antes de existir los resúmenes de calidad no
+        tienen sus tablas, y el alias de la temporada es de solo lectura: se
+        completan una vez, con una conexión propia, antes de registrarlo.
+        """
+        if not ruta.exists():
+            return
+        archivo = sqlite3.connect(str(ruta))
+        try:
+            existentes = {
+                nombre for (nombre,) in archivo.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            }
+            faltantes = [
+                model._meta.db_table for model, _ in ArchivoRepository.TABLAS
+                if model._meta.db_table not in existentes
+            ]
+            if not faltantes:
+                return
+            with connections[router.db_for_write(LoteCultivo)].cursor() as cursor:
+                cursor.execute(
+                    "SELECT sql FROM sqlite_master WHERE type IN ('table', 'index') AND sql IS NOT NULL "
+                    f"AND tbl_name IN ({', '.join(['%s'] * len(faltantes))}) ORDER BY type = 'index'",
+                    faltantes
+                )
+                esquema = [sql for (sql,) in cursor.fetchall()]
+            with archivo:
+                for sql in esquema:
+                    archivo.execute(sql)
+                ArchivoRepository._rellenar_resumenes(archivo, 'main')
+        finally:
+            archivo.close()
+    
+    @staticmethod
+    def _rellenar_resumenes(cursor, esquema: str) -> None:
+        """Calcula en el archivo los resúmenes de calidad que falten a partir de sus controles"""
+        controles = f'{esquema}."{ControlCalidad._meta.db_table}"'
+        procesos = f'{esquema}."{ProcesoTransformacion._meta.db_table}"'
+        agregados = (
+            f"COUNT(*), SUM(c.estado = '{ControlCalidad.APROBADO}'), "
+            "COUNT(c.brix), COALESCE(SUM(c.brix), 0), MIN(c.brix), MAX(c.brix), "
+            "COUNT(c.ph), COALESCE(SUM(c.ph), 0), MIN(c.ph), MAX(c.ph)"
+        )
+        columnas = (
+            'total_controles, aprobados, brix_conteo, brix_suma, brix_min, brix_max, '
+            'ph_conteo, ph_suma, ph_min, ph_max'
+        )
+        for model, clave, origen in (
+            (ResumenCalidadProceso, 'c.proceso_id', controles + ' c'),
+            (ResumenCalidadLote, 'p.lote_id', f'{controles} c JOIN {procesos} p ON p.id = c.proceso_id'),
+        ):
+            tabla = f'{esquema}."{model._meta.db_table}"'
+            columna = model._meta.pk.column
+            cursor.execute(
+                f'INSERT INTO {tabla} ({columna}, {columnas}) SELECT {clave}, {agregados} FROM {origen} '
+                f'WHERE {clave} NOT IN (SELECT {columna} FROM {tabla}) GROUP BY {clave}'
+            )
+    
+    @staticmethod
+    def _columnas(cursor, esquema: str, tabla: str) -> List[str]:
+        cursor.execute(f'PRAGMA {esquema}.table_info("{tabla}")')
+        return [fila[1] for fila in cursor.fetchall()]
+    
+    @staticmethod
+    def _preparar_tabla(cursor, tabla: str) -> None:
+        """Crea la tabla en el archivo o le añade las columnas nuevas del esquema actual"""
+        existentes = ArchivoRepository._columnas(cursor, 'archivo', tabla)
+        if not existentes:
+            cursor.execute(
+                "SELECT sql FROM main.sqlite_master WHERE type IN ('table', 'index') "
+                "AND tbl_name = %s AND sql IS NOT NULL", [tabla]
+            )
+            for (sql,) in cursor.fetchall():
+                # CREATE [UNIQUE] INDEX "x" ON ... / CREATE TABLE "x" (...) -> esquema archivo
+                cabecera, _, resto = sql.partition(' "')
+                cursor.execute(f'{cabecera} archivo."{resto}')
+            return
+        cursor.execute(f'PRAGMA main.table_info("{tabla}")')
+        for _, columna, tipo, *_ in cursor.fetchall():
+            if columna not in existentes:
+                cursor.execute(f'ALTER TABLE archivo."{tabla}" ADD COLUMN "{columna}" {tipo}')
@@ -0,0 +1,61 @@
+"""
+Repositorio de lecturas del historial de cambios.
+"""
+from django.db.models import Exists, OuterRef
+from ..models import (
+    LoteCultivo, ProcesoTransformacion, ControlCalidad, Transporte, RegistroAuditoria
+)
+from .. import auditoria
+from typing import List, Dict, Any
+from .comun import _primaria
+
+
+class AuditoriaRepository:
+    """Lecturas del historial de cambios (se escribe desde ``core.auditoria``)"""
+    
+    CAMPOS = ('id', 'fecha', 'entidad', 'objeto_id', 'operacion', 'actor__nombre', 'cambios')
+    
+    @staticmethod
+    def historial(lote_id: int, limite: int) -> List[Dict[str, Any]]:
+        """Últimas entradas del lote y de sus procesos, controles y transportes"""
+        return list(
+            RegistroAuditoria.objects.filter(lote_id=lote_id)
+            .order_by('-fecha', '-id').values(*AuditoriaRepository.CAMPOS)[:limite]
+        )
+    
+    @staticmethod
+    def entradas_hasta(lote_id: int, fecha) -> List[tuple]:
+        """(entidad, objeto_id, operacion, cambios) hasta ``fecha``, en orden de aplicación"""
+        return list(
+            RegistroAuditoria.objects.filter(lote_id=lote_id, fecha__lte=fecha)
+            .order_by('fecha', 'id').values_list('entidad', 'objeto_id', 'operacion', 'cambios')
+        )
+    
+    @staticmethod
+    def lotes_sin_historial() -> List[int]:
+        con_historial = RegistroAuditoria.objects.filter(lote_id=OuterRef('id'))
+        return list(
+            _primaria(LoteCultivo).filter(~Exists(con_historial)).order_by('id').values_list('id', flat=True)
+        )
+    
+    @staticmethod
+    def registrar_linea_base(lote_ids: List[int]) -> int:
+        """Estado actual de lotes sin historial, como punto de partida de su reconstrucción"""
+        base = _primaria(ProcesoTransformacion)
+        lote_por_proceso = dict(base.filter(lote_id__in=lote_ids).values_list('id', 'lote_id'))
+        grupos = (
+            (_primaria(LoteCultivo).filter(id__in=lote_ids), lambda obj: obj.id),
+            (base.filter(lote_id__in=lote_ids), lambda obj: obj.lote_id),
+            (_primaria(ControlCalidad).filter(proceso__lote_id__in=lote_ids),
+             lambda obj: lote_por_proceso[obj.proceso_id]),
+            (_primaria(Transporte).filter(lote_id__in=lote_ids), lambda obj: obj.lote_id),
+        )
+        entradas = [
+            auditoria.auditor.entrada(
+                queryset.model, obj.pk, lote_de(obj), RegistroAuditoria.LINEA_BASE, auditoria.foto(obj)
+            )
+            for queryset, lote_de in grupos
+            for obj in queryset.iterator()
+        ]
+        auditoria.auditor.registrar(entradas, using=base.db)
+        return len(entradas)
@@ -0,0 +1,17 @@
+"""
+Utilidades compartidas por los repositorios.
+"""
+from django.db import router
+
+from ..routers import marcar_escritura
+
+
+def _primaria(model):
+    """Manager ligado a la base de escritura: lecturas previas a un save()"""
+    return model.objects.db_manager(router.db_for_write(model))
+
+
+def _alias_escritura(model) -> str:
+    """Base de escritura para ``bulk_create``, ``update()`` o SQL directo, que no emiten ``pre_save``"""
+    marcar_escritura()
+    return router.db_for_write(model)
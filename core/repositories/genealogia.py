@@ -0,0 +1,162 @@
+"""
+Repositorio del linaje de lotes (grafo de ``EnlaceGenealogia``).
+"""
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db import connections, router
+from ..models import LoteCultivo, ProcesoTransformacion, Transporte, LoteArchivado, EnlaceGenealogia
+from typing import List, Optional, Dict, Any
+
+
+class GenealogiaRepository:
+    """Consultas de linaje sobre el grafo lotes -> procesos -> transportes
+
+    El grafo combina las aristas implícitas de las claves foráneas con las de
+    ``EnlaceGenealogia`` y se recorre con un CTE recursivo, de modo que una
+    trazabilidad de muchos saltos se resuelve en una sola consulta.
+    """
+    
+    # Pasos hacia adelante (origen -> destino) y hacia atrás (destino -> origen).
+    # Cada paso es un SELECT del término recursivo; %(max)s limita la profundidad
+    # y evita recorridos infinitos si alguien registra un ciclo. Las tablas se
+    # sustituyen desde ``_meta.db_table`` (ver ``TABLAS``).
+    PASOS = {
+        'adelante': [
+            "SELECT e.destino_tipo, e.destino_id, r.profundidad + 1 FROM alcanzados r "
+            "JOIN {enlaces} e ON e.origen_tipo = r.tipo AND e.origen_id = r.id "
+            "WHERE r.profundidad < %(max)s",
+            "SELECT 'P', p.id, r.profundidad + 1 FROM alcanzados r "
+            "JOIN {procesos} p ON r.tipo = 'L' AND p.lote_id = r.id "
+            "WHERE r.profundidad < %(max)s",
+            "SELECT 'T', t.id, r.profundidad + 1 FROM alcanzados r "
+            "JOIN {transportes} t ON r.tipo = 'P' AND t.proceso_id = r.id "
+            "WHERE r.profundidad < %(max)s",
+        ],
+        'atras': [
+            "SELECT e.origen_tipo, e.origen_id, r.profundidad + 1 FROM alcanzados r "
+            "JOIN {enlaces} e ON e.destino_tipo = r.tipo AND e.destino_id = r.id "
+            "WHERE r.profundidad < %(max)s",
+            "SELECT 'L', p.lote_id, r.profundidad + 1 FROM alcanzados r "
+            "JOIN {procesos} p ON r.tipo = 'P' AND p.id = r.id "
+            "WHERE r.profundidad < %(max)s",
+            "SELECT 'P', t.proceso_id, r.profundidad + 1 FROM alcanzados r "
+            "JOIN {transportes} t ON r.tipo = 'T' AND t.id = r.id "
+            "WHERE r.profundidad < %(max)s",
+        ],
+    }
+    
+    TABLAS = {
+        'enlaces': EnlaceGenealogia._meta.db_table,
+        'lotes': LoteCultivo._meta.db_table,
+        'procesos': ProcesoTransformacion._meta.db_table,
+        'transportes': Transporte._meta.db_table,
+    }
+    
+    TABLAS_NODO = {
+        EnlaceGenealogia.LOTE: LoteCultivo,
+        EnlaceGenealogia.PROCESO: ProcesoTransformacion,
+        EnlaceGenealogia.TRANSPORTE: Transporte,
+    }
+    
+    @staticmethod
+    def crear_enlace(data: Dict[str, Any]) -> EnlaceGenealogia:
+        return EnlaceGenealogia.objects.create(**data)
+    
+    @staticmethod
+    def alias_lectura() -> str:
+        """Base de lectura para todas las consultas de un mismo linaje
+
+        El router ya fija una réplica por petición; fuera de una petición, o
+        si algo la fuerza a la primaria a mitad de camino, comprobar el nodo,
+        recorrer el grafo y describirlo contra el mismo alias evita mezclar
+        bases con distinto retraso.
+        """
+        return router.db_for_read(EnlaceGenealogia)
+    
+    @staticmethod
+    def existe_nodo(tipo: str, nodo_id: int, using: Optional[str] = None) -> bool:
+        model = GenealogiaRepository.TABLAS_NODO.get(tipo)
+        return model is not None and model.objects.db_manager(using).filter(id=nodo_id).exists()
+    
+    @staticmethod
+    def _cte(direccion: str, inicio: str) -> str:
+        pasos = '\nUNION\n'.join(GenealogiaRepository.PASOS[direccion])
+        return (
+            "WITH RECURSIVE alcanzados(tipo, id, profundidad) AS (\n"
+            f"{inicio}\nUNION\n{pasos}\n)\n"
+        )
+    
+    @staticmethod
+    def trazar(tipo: str, nodo_id: int, direccion: str, profundidad_max: int,
+               using: Optional[str] = None) -> List[tuple]:
+        """Nodos alcanzables desde (tipo, id): lista de (tipo, id, profundidad mínima)"""
+        sql = GenealogiaRepository._cte(direccion, "SELECT %(tipo)s, %(id)s, 0") + (
+            "SELECT tipo, id, MIN(profundidad) FROM alcanzados "
+            "WHERE NOT (tipo = %(tipo)s AND id = %(id)s) "
+            "GROUP BY tipo, id ORDER BY MIN(profundidad), tipo, id"
+        )
+        sql = sql.format(**GenealogiaRepository.TABLAS)
+        with connections[using or router.db_for_read(EnlaceGenealogia)].cursor() as cursor:
+            cursor.execute(sql, {'tipo': tipo, 'id': nodo_id, 'max': profundidad_max})
+            return cursor.fetchall()
+    
+    @staticmethod
+    def consumidores_por_finca(finca: str, profundidad_max: int) -> List[Dict[str, Any]]:
+        """Transportes (y receptores) que recibieron fruta de cualquier lote de la finca"""
+        sql = GenealogiaRepository._cte(
+            'adelante', "SELECT 'L', id, 0 FROM {lotes} WHERE finca = %(finca)s"
+        ) + (
+            "SELECT t.id, t.destino, t.recibido_por, t.fecha_entrega, t.estado_entrega, "
+            "l.codigo_lote, MIN(r.profundidad) "
+            "FROM alcanzados r "
+            "JOIN {transportes} t ON r.tipo = 'T' AND t.id = r.id "
+            "JOIN {lotes} l ON l.id = t.lote_id "
+            "GROUP BY t.id ORDER BY t.destino, t.id"
+        )
+        sql = sql.format(**GenealogiaRepository.TABLAS)
+        columnas = ['transporte_id', 'destino', 'recibido_por', 'fecha_entrega',
+                    'estado_entrega', 'codigo_lote', 'saltos']
+        with connections[router.db_for_read(EnlaceGenealogia)].cursor() as cursor:
+            cursor.execute(sql, {'finca': finca, 'max': profundidad_max})
+            envios = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+        for envio in envios:
+            # SQL en crudo: las fechas llegan sin zona horaria (UTC)
+            fecha = envio['fecha_entrega']
+            if isinstance(fecha, str):
+                fecha = parse_datetime(fecha)
+            if fecha is not None and timezone.is_naive(fecha):
+                fecha = timezone.make_aware(fecha, timezone.utc)
+            envio['fecha_entrega'] = fecha
+        return envios
+    
+    @staticmethod
+    def describir_nodos(nodos: List[tuple], using: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Datos básicos de los nodos alcanzados: una consulta por tipo de nodo"""
+        ids_por_tipo: Dict[str, Dict[int, int]] = {}
+        for tipo, nodo_id, profundidad in nodos:
+            ids_por_tipo.setdefault(tipo, {})[nodo_id] = profundidad
+        campos = {
+            EnlaceGenealogia.LOTE: ('id', 'codigo_lote', 'finca', 'fecha_cosecha'),
+            EnlaceGenealogia.PROCESO: ('id', 'lote_id', 'tipo_empaque', 'fecha_empaquetado'),
+            EnlaceGenealogia.TRANSPORTE: ('id', 'lote_id', 'destino', 'fecha_entrega', 'recibido_por'),
+        }
+        descripcion = {}
+        for tipo, profundidades in ids_por_tipo.items():
+            model = GenealogiaRepository.TABLAS_NODO[tipo]
+            filas = model.objects.db_manager(using).filter(id__in=profundidades).values(*campos[tipo]).order_by('id')
+            descripcion[tipo] = [{**fila, 'saltos': profundidades[fila['id']]} for fila in filas]
+        # Las aristas hacia lotes archivados se quedan en la primaria (ver ``ArchivoRepository``)
+        faltan = ids_por_tipo.get(EnlaceGenealogia.LOTE, {}).keys() - {
+            fila['id'] for fila in descripcion.get(EnlaceGenealogia.LOTE, [])
+        }
+        if faltan:
+            archivados = (
+                LoteArchivado.objects.db_manager(using).filter(lote_id__in=faltan)
+                .values_list('lote_id', 'codigo_lote', 'temporada').order_by('lote_id')
+            )
+            descripcion[EnlaceGenealogia.LOTE] += [
+                {'id': lote_id, 'codigo_lote': codigo, 'temporada_archivada': temporada,
+                 'saltos': ids_por_tipo[EnlaceGenealogia.LOTE][lote_id]}
+                for lote_id, codigo, temporada in archivados
+            ]
+        return descripcion
@@ -0,0 +1,79 @@
+"""
+Repositorio de búsquedas por ubicación sobre el índice R*Tree.
+"""
+from django.utils import timezone
+from django.db import transaction
+from django.db.models.expressions import RawSQL
+from ..models import LoteCultivo, Transporte
+from ..routers import marcar_escritura
+from ..signals import actualizacion_en_bloque
+from typing import List, Optional, Dict, Any, Tuple
+from .comun import _primaria
+
+
+class GeoRepository:
+    """Búsquedas espaciales sobre los índices R*Tree de fincas y destinos
+
+    Las tablas virtuales ``core_lote_rtree`` y ``core_transporte_rtree``
+    (``core/indices_geo.py``, mantenidas por triggers) guardan un punto por fila. La
+    consulta sólo visita los nodos que solapan la caja pedida y después se
+    filtra por las coordenadas exactas, porque R*Tree redondea a float32.
+    """
+    
+    INDICES = {
+        'lotes': (
+            LoteCultivo, 'core_lote_rtree', 'latitud', 'longitud',
+            ('id', 'codigo_lote', 'finca', 'variedad', 'fecha_cosecha', 'latitud', 'longitud'),
+        ),
+        'transportes': (
+            Transporte, 'core_transporte_rtree', 'destino_latitud', 'destino_longitud',
+            ('id', 'lote_id', 'lote__codigo_lote', 'lote__finca', 'destino', 'fecha_salida',
+             'fecha_entrega', 'estado_entrega', 'destino_latitud', 'destino_longitud'),
+        ),
+    }
+    
+    @staticmethod
+    def en_caja(recurso: str, min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+                limite: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Filas del recurso cuyas coordenadas caen dentro de la caja"""
+        model, rtree, lat, lon, campos = GeoRepository.INDICES[recurso]
+        ids = RawSQL(
+            f'SELECT id FROM {rtree} WHERE max_lat >= %s AND min_lat <= %s AND max_lon >= %s AND min_lon <= %s',
+            (float(min_lat), float(max_lat), float(min_lon), float(max_lon))
+        )
+        filas = model.objects.filter(
+            id__in=ids,
+            **{f'{lat}__range': (min_lat, max_lat), f'{lon}__range': (min_lon, max_lon)}
+        ).values(*campos).order_by('id')
+        return list(filas[:limite] if limite else filas)
+    
+    @staticmethod
+    def coordenadas(fila: Dict[str, Any], recurso: str) -> Tuple[float, float]:
+        _, _, lat, lon, _ = GeoRepository.INDICES[recurso]
+        return float(fila[lat]), float(fila[lon])
+    
+    @staticmethod
+    def _actualizar(queryset, lote: str, cambios: Dict[str, Any]) -> int:
+        """``update()`` en bloque que avisa a los suscriptores de ``actualizacion_en_bloque``"""
+        alias = queryset.db
+        marcar_escritura()
+        with transaction.atomic(using=alias):
+            filas = list(queryset.values_list('id', lote))
+            actualizados = queryset.update(**cambios, modificado=timezone.now())
+            actualizacion_en_bloque.send(sender=queryset.model, filas=filas, cambios=cambios, using=alias)
+        return actualizados
+    
+    @staticmethod
+    def ubicar_finca(finca: str, latitud, longitud) -> int:
+        """Asigna coordenadas a todos los lotes de una finca (los triggers reindexan)"""
+        return GeoRepository._actualizar(
+            _primaria(LoteCultivo).filter(finca=finca), 'id', {'latitud': latitud, 'longitud': longitud}
+        )
+    
+    @staticmethod
+    def ubicar_destino(destino: str, latitud, longitud) -> int:
+        """Asigna coordenadas a todos los transportes con ese destino"""
+        return GeoRepository._actualizar(
+            _primaria(Transporte).filter(destino__iexact=destino), 'lote_id',
+            {'destino_latitud': latitud, 'destino_longitud': longitud}
+        )
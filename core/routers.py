@@ -0,0 +1,120 @@
+"""
+Enrutamiento de base de datos: escrituras a la primaria, lecturas a réplicas.
+
+Las lecturas de los modelos de ``core`` se reparten entre las bases de datos
+declaradas en ``settings.DATABASE_READ_REPLICAS``. En cuanto una petición
+escribe (o el cliente escribió hace poco, ver ``LecturaPrimariaMiddleware``),
+las lecturas vuelven a la primaria para garantizar "leer lo propio".
+
+La réplica se elige una vez por petición (o tarea) y todas sus lecturas usan
+la misma: réplicas con distinto retraso darían, p. ej., un lote de una y sus
+procesos de otra, y la trazabilidad compuesta no sería coherente.
+
+``db_for_write`` no tiene efectos: también se usa para leer de la primaria
+antes de un ``save()``. La escritura se anota con ``marcar_escritura``, que
+llaman las señales ``pre_save``/``pre_delete`` de ``core`` y los repositorios
+que escriben en bloque (``bulk_create``, ``update()`` o SQL directo).
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+APPS_ENRUTADAS = {'core'}
+
+# Fuerza la lectura desde la primaria (cliente "pegado" tras un POST)
+_leer_de_primaria: ContextVar[bool] = ContextVar('leer_de_primaria', default=False)
+# Se activa cuando la petición en curso escribe en la primaria
+_hubo_escritura: ContextVar[bool] = ContextVar('hubo_escritura', default=False)
+# Réplica elegida para las lecturas de la petición en curso (en la primera lectura)
+_replica: ContextVar[Optional[str]] = ContextVar('replica', default=None)
+
+
+def replicas_de_lectura():
+    """Alias de las réplicas de lectura configuradas"""
+    return list(getattr(settings, 'DATABASE_READ_REPLICAS', {}))
+
+
+def hubo_escritura() -> bool:
+    return _hubo_escritura.get()
+
+
+def marcar_escritura() -> None:
+    """Anota que la petición (o tarea) en curso escribió en la primaria"""
+    _hubo_escritura.set(True)
+
+
+@contextmanager
+def contexto_peticion(pegado_a_primaria: bool = False):
+    """Aísla el estado de enrutamiento de una petición (o tarea)"""
+    token_lectura = _leer_de_primaria.set(pegado_a_primaria)
+    token_escritura = _hubo_escritura.set(False)
+    token_replica = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token_replica)
+        _hubo_escritura.reset(token_escritura)
+        _leer_de_primaria.reset(token_lectura)
+
+
+@contextmanager
+def en_primaria():
+    """Fuerza que las lecturas dentro del bloque se hagan contra la primaria"""
+    token = _leer_de_primaria.set(True)
+    try:
+        yield
+    finally:
+        _leer_de_primaria.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Router primaria/réplicas con lectura pegajosa tras escribir"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in APPS_ENRUTADAS:
+            return None
+        # Las relaciones se leen de la misma base que el objeto de origen
+        # (réplica, primaria o archivo de temporada)
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db:
+            return instancia._state.db
+        replicas = replicas_de_lectura()
+        if not replicas or _leer_de_primaria.get() or _hubo_escritura.get():
+            return DEFAULT_DB_ALIAS
+        replica = _replica.get()
+        if replica not in replicas:
+            replica = random.choice(replicas)
+            _replica.set(replica)
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in APPS_ENRUTADAS:
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {DEFAULT_DB_ALIAS, *replicas_de_lectura()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas son copias de la primaria: nunca se migran directamente
+        if db in replicas_de_lectura():
+            return False
+        return None
+
+
+def _al_escribir(sender, **kwargs):
+    if sender._meta.app_label in APPS_ENRUTADAS:
+        marcar_escritura()
+
+
+def conectar_senales():
+    from django.db.models.signals import pre_delete, pre_save
+    pre_save.connect(_al_escribir, dispatch_uid='routers_pre_save')
+    pre_delete.connect(_al_escribir, dispatch_uid='routers_pre_delete')
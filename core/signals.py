@@ -0,0 +1,94 @@
+"""
+Señales propias de ``core``.
+
+Las inserciones masivas (``bulk_create``) y las actualizaciones con
+``QuerySet.update()`` no emiten ``post_save``; los repositorios envían estas
+señales para que los suscriptores (instantáneas, auditoría...) reaccionen una
+sola vez por lote de filas.
+"""
+from typing import Optional
+
+from django.dispatch import Signal
+
+# Argumentos: controles (lista de ControlCalidad creados), lote_ids (set de lotes afectados),
+# lote_por_proceso (dict proceso_id -> lote_id), using (alias de la base)
+controles_creados = Signal()
+
+# ``QuerySet.update()`` tampoco emite ``post_save``.
+# Argumentos: filas (lista de (id, lote_id) actualizados), cambios (dict campo -> valor), using
+actualizacion_en_bloque = Signal()
+
+# El archivado de temporadas mueve las filas con SQL directo, sin ``post_delete``.
+# Argumentos: lotes (dict lote_id -> codigo_lote archivados), temporada, using
+lotes_archivados = Signal()
+
+
+def _en_cascada(origin, *modelos) -> bool:
+    """Si el borrado parte de una instancia o un QuerySet de alguno de los modelos"""
+    from django.db.models import QuerySet
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in modelos
+
+
+def _recalculados(origin) -> Optional[set]:
+    """Resúmenes ya recalculados durante el borrado de ``origin``
+
+    ``post_delete`` se emite una vez por fila, después del DELETE de todas las
+    filas del modelo; el conjunto vive en el objeto que se está borrando para
+    recalcular cada resumen una sola vez.
+    """
+    if origin is None:
+        return None
+    return origin.__dict__.setdefault('_resumenes_recalculados', set())
+
+
+def _control_por_guardar(sender, instance, raw=False, update_fields=None, **kwargs):
+    from .repositories import _primaria
+    instance._proceso_anterior = None
+    if raw or instance._state.adding or (update_fields is not None and 'proceso' not in update_fields):
+        return
+    instance._proceso_anterior = (
+        _primaria(sender).filter(pk=instance.pk).values_list('proceso_id', flat=True).first()
+    )
+
+
+def _control_guardado(sender, instance, created, raw=False, **kwargs):
+    from .repositories import ControlCalidadRepository
+    if raw:
+        return
+    if created:
+        ControlCalidadRepository.acumular([instance])
+        return
+    hechos = set()
+    ControlCalidadRepository.recalcular_resumenes(instance.proceso_id, hechos)
+    anterior = getattr(instance, '_proceso_anterior', None)
+    if anterior is not None and anterior != instance.proceso_id:
+        ControlCalidadRepository.recalcular_resumenes(anterior, hechos)
+
+
+def _control_borrado(sender, instance, origin=None, **kwargs):
+    from .models import LoteCultivo, ProcesoTransformacion
+    from .repositories import ControlCalidadRepository
+    # Al borrar el proceso o el lote, sus resúmenes caen en cascada
+    if origin is not None and _en_cascada(origin, ProcesoTransformacion, LoteCultivo):
+        return
+    ControlCalidadRepository.recalcular_resumenes(instance.proceso_id, _recalculados(origin))
+
+
+def _proceso_borrado(sender, instance, origin=None, **kwargs):
+    from .models import LoteCultivo
+    from .repositories import ControlCalidadRepository
+    if origin is not None and _en_cascada(origin, LoteCultivo):
+        return
+    ControlCalidadRepository.recalcular_resumen_lote(instance.lote_id, _recalculados(origin))
+
+
+def conectar_senales():
+    from django.db.models.signals import post_delete, post_save, pre_save
+    from .models import ControlCalidad, ProcesoTransformacion
+    pre_save.connect(_control_por_guardar, sender=ControlCalidad, dispatch_uid='resumen_calidad_pre_save')
+    post_save.connect(_control_guardado, sender=ControlCalidad, dispatch_uid='resumen_calidad_save')
+    post_delete.connect(_control_borrado, sender=ControlCalidad, dispatch_uid='resumen_calidad_delete')
+    post_delete.connect(
+        _proceso_borrado, sender=ProcesoTransformacion, dispatch_uid='resumen_calidad_proceso_delete'
+    )
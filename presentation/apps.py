@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class PresentationConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'presentation'
+
+    def ready(self):
+        from . import snapshots
+        snapshots.conectar_senales()
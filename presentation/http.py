@@ -0,0 +1,73 @@
+"""
+GET condicional para la API JSON y negociación de ``Accept-Encoding``.
+
+La versión de un recurso (última modificación y recuento de filas) se obtiene
+con una única consulta agregada *antes* de construir la respuesta; si el
+cliente ya la tiene se responde 304 sin tocar el resto de la base de datos.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def codificaciones_aceptadas(cabecera: str, disponibles) -> set:
+    """Codificaciones de ``disponibles`` que admite ``Accept-Encoding``
+
+    ``gzip;q=0`` rechaza gzip y ``*`` vale para las que no se nombran; un
+    peso ilegible cuenta como 0.
+    """
+    pesos = {}
+    for parte in cabecera.split(','):
+        codificacion, *parametros = (t.strip() for t in parte.split(';'))
+        if not codificacion:
+            continue
+        peso = 1.0
+        for parametro in parametros:
+            nombre, _, valor = parametro.partition('=')
+            if nombre.strip().lower() == 'q':
+                try:
+                    peso = float(valor)
+                except ValueError:
+                    peso = 0.0
+        pesos[codificacion.lower()] = peso
+    comodin = pesos.get('*', 0.0)
+    return {c for c in disponibles if pesos.get(c, comodin) > 0}
+
+
+def _etag(ultima, total) -> str:
+    huella = hashlib.sha1(f'{ultima.isoformat() if ultima else ""}|{total}'.encode()).hexdigest()[:20]
+    # Débil: la misma versión se sirve con distintas codificaciones (gzip, br)
+    return f'W/"{huella}"'
+
+
+def condicional(obtener_version):
+    """Decorador: ``obtener_version(request, *args, **kwargs)`` -> (datetime | None, int) o None"""
+
+    def decorador(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            version = obtener_version(request, *args, **kwargs)
+            if version is None:
+                return view_func(request, *args, **kwargs)
+
+            ultima, total = version
+            etag = _etag(ultima, total)
+            ultima_ts = int(ultima.timestamp()) if ultima else None
+            response = get_conditional_response(request, etag=etag, last_modified=ultima_ts)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                if ultima_ts is not None:
+                    response.headers.setdefault('Last-Modified', http_date(ultima_ts))
+                response.headers.setdefault('Cache-Control', 'no-cache')
+            return response
+
+        return _wrapped_view
+
+    return decorador
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.models import LoteArchivado, LoteCultivo
+from presentation import snapshots
+
+
+class Command(BaseCommand):
+    help = "Genera las instantáneas estáticas de trazabilidad de los lotes publicables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('codigos', nargs='*', help="Códigos de lote (por defecto, todos)")
+
+    def handle(self, *args, **options):
+        codigos = options['codigos'] or [
+            *LoteCultivo.objects.values_list('codigo_lote', flat=True).iterator(),
+            *LoteArchivado.objects.values_list('codigo_lote', flat=True).iterator(),
+        ]
+        publicados = sum(1 for codigo in codigos if snapshots.generar(codigo)[0])
+        self.stdout.write(self.style.SUCCESS(
+            f"{publicados} de {len(codigos)} lotes con instantánea publicada"
+        ))
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from core.auditoria import contexto_actor
+from core.routers import contexto_peticion, hubo_escritura
+from .http import codificaciones_aceptadas
+
+try:
+    import brotli
+except ImportError:  # Dependencia opcional
+    brotli = None
+
+COOKIE_PRIMARIA = 'sta_primaria'
+METODOS_SEGUROS = {'GET', 'HEAD', 'OPTIONS', 'TRACE'}
+
+
+class LecturaPrimariaMiddleware:
+    """Mantiene las lecturas en la primaria durante unos segundos tras un POST
+
+    Las réplicas se sincronizan de forma periódica; sin esta cookie un cliente
+    podría no ver el lote que acaba de crear.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Las peticiones de escritura leen siempre de la primaria
+        pegado = COOKIE_PRIMARIA in request.COOKIES or request.method not in METODOS_SEGUROS
+        with contexto_peticion(pegado_a_primaria=pegado):
+            response = self.get_response(request)
+            if hubo_escritura() or request.method not in METODOS_SEGUROS:
+                response.set_cookie(
+                    COOKIE_PRIMARIA, '1',
+                    max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 5),
+                    httponly=True, samesite='Lax'
+                )
+        return response
+
+
+class ActorAuditoriaMiddleware:
+    """Atribuye los cambios de la petición al usuario autenticado o, en su
+    defecto, a la dirección remota
+
+    La cabecera ``X-Actor`` la pone el cliente y nadie la verifica: se guarda
+    sólo como dispositivo declarado junto a esa identidad, nunca en su lugar.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        usuario = getattr(request, 'user', None)
+        if usuario is not None and usuario.is_authenticated:
+            actor = f'usuario:{usuario.get_username()}'
+        else:
+            actor = f"ip:{request.META.get('REMOTE_ADDR') or 'desconocida'}"
+        dispositivo = request.headers.get('X-Actor', '').strip()
+        if dispositivo:
+            actor = f'{actor} dispositivo:{dispositivo}'
+        actor = actor[:200]
+        with contexto_actor(actor):
+            return self.get_response(request)
+
+
+class CompresionMiddleware:
+    """Comprime con brotli o gzip las respuestas de texto/JSON por encima de un umbral
+
+    Las respuestas pequeñas no compensan el coste de CPU; las que ya llevan
+    Content-Encoding (instantáneas precomprimidas) y las de streaming
+    (eventos SSE) se dejan intactas.
+    """
+
+    TIPOS_COMPRIMIBLES = ('application/json', 'text/')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(self.TIPOS_COMPRIMIBLES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < getattr(settings, 'COMPRESION_MINIMO_BYTES', 1024):
+            return response
+
+        aceptadas = codificaciones_aceptadas(request.headers.get('Accept-Encoding', ''), ('br', 'gzip'))
+        if 'br' in aceptadas and brotli is not None:
+            contenido, codificacion = brotli.compress(response.content, quality=5), 'br'
+        elif 'gzip' in aceptadas:
+            contenido, codificacion = compress_string(response.content), 'gzip'
+        else:
+            return response
+        if len(contenido) >= len(response.content):
+            return response
+
+        response.content = contenido
+        response['Content-Length'] = str(len(contenido))
+        response['Content-Encoding'] = codificacion
+        # La representación comprimida ya no es idéntica byte a byte
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
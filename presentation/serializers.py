@@ -11,6 +11,8 @@ class LoteCultivoSerializer(serializers.Serializer):
     fecha_cosecha = serializers.DateField()
     responsable = serializers.CharField(max_length=200)
     certificacion_organica = serializers.BooleanField(default=True)
+    latitud = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-90, max_value=90, required=False, allow_null=True)
+    longitud = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-180, max_value=180, required=False, allow_null=True)
     
     # SOLUCIÓN: Usar validate() en lugar de validate_fecha_cosecha
     def validate(self, data):
@@ -61,6 +63,17 @@ class ProcesoTransformacionSerializer(serializers.Serializer):
         return data
 
 
+class ControlCalidadSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    proceso_id = serializers.IntegerField()
+    inspector = serializers.CharField(max_length=200)
+    estado = serializers.ChoiceField(choices=['A', 'R', 'P'], default='P')
+    ph = serializers.DecimalField(max_digits=3, decimal_places=1, min_value=0, max_value=14, required=False, allow_null=True)
+    brix = serializers.DecimalField(max_digits=4, decimal_places=1, min_value=0, max_value=40, required=False, allow_null=True)
+    defectos = serializers.CharField(required=False, allow_blank=True, default='')
+    observaciones = serializers.CharField(required=False, allow_blank=True, default='')
+
+
 class TransporteSerializer(serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     lote_id = serializers.IntegerField()
@@ -72,6 +85,8 @@ class TransporteSerializer(serializers.Serializer):
     temperatura_minima = serializers.DecimalField(max_digits=4, decimal_places=1, min_value=-20)
     temperatura_maxima = serializers.DecimalField(max_digits=4, decimal_places=1, max_value=30)
     temperatura_promedio = serializers.DecimalField(max_digits=4, decimal_places=1)
+    destino_latitud = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-90, max_value=90, required=False, allow_null=True)
+    destino_longitud = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-180, max_value=180, required=False, allow_null=True)
     
     def validate_temperatura_promedio(self, value):
         # Aquí 'value' es Decimal, así que la comparación numérica funciona bien
@@ -82,6 +97,27 @@ class TransporteSerializer(serializers.Serializer):
         return value
 
 
+class LecturaTemperaturaSerializer(serializers.Serializer):
+    temperatura = serializers.DecimalField(max_digits=4, decimal_places=1, min_value=-20, max_value=30)
+
+
+class UbicacionSerializer(serializers.Serializer):
+    tipo = serializers.ChoiceField(choices=['finca', 'destino'])
+    nombre = serializers.CharField(max_length=200)
+    latitud = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-90, max_value=90)
+    longitud = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-180, max_value=180)
+
+
+class EnlaceGenealogiaSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    origen_tipo = serializers.ChoiceField(choices=['L', 'P', 'T'])
+    origen_id = serializers.IntegerField(min_value=1)
+    destino_tipo = serializers.ChoiceField(choices=['L', 'P', 'T'])
+    destino_id = serializers.IntegerField(min_value=1)
+    cantidad = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False, allow_null=True)
+    unidad_medida = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+
+
 class EntregaSerializer(serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     fecha_entrega = serializers.DateTimeField(default=datetime.now)
@@ -0,0 +1,189 @@
+"""
+Instantáneas estáticas de la trazabilidad pública (páginas de destino de los QR).
+
+Los lotes con trazabilidad completa y todos sus transportes entregados ya no
+cambian, así que su trazabilidad se renderiza una sola vez a HTML y JSON,
+precomprimidos con gzip (y brotli si está instalado), y se sirven desde disco
+sin pasar por el ORM. Cualquier escritura sobre el lote o sus filas
+relacionadas borra la instantánea; la siguiente visita la regenera.
+"""
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_delete, post_save
+from django.template.loader import render_to_string
+
+from core.models import ControlCalidad, LoteCultivo, ProcesoTransformacion, Transporte
+from core.signals import controles_creados, lotes_archivados
+from .http import codificaciones_aceptadas
+
+try:
+    import brotli
+except ImportError:  # Dependencia opcional
+    brotli = None
+
+FORMATOS = {
+    'html': 'text/html; charset=utf-8',
+    'json': 'application/json',
+}
+# Extensión en disco y valor de Content-Encoding, por orden de preferencia
+CODIFICACIONES = [('br', 'br'), ('gz', 'gzip')]
+# Un código más largo no puede existir (y desbordaría el nombre de fichero)
+LONGITUD_MAXIMA_CODIGO = LoteCultivo._meta.get_field('codigo_lote').max_length
+
+
+def directorio() -> Path:
+    return Path(settings.SNAPSHOT_ROOT) / 'lotes'
+
+
+def nombre_fichero(codigo: str) -> Optional[str]:
+    """Nombre seguro en disco para un código de lote (None si no es válido)"""
+    if len(codigo) > LONGITUD_MAXIMA_CODIGO:
+        return None
+    nombre = quote(codigo, safe='')
+    if not nombre or nombre in ('.', '..'):
+        return None
+    return nombre
+
+
+def ruta(codigo: str, formato: str, codificacion: str = '') -> Optional[Path]:
+    nombre = nombre_fichero(codigo)
+    if nombre is None:
+        return None
+    sufijo = f'.{formato}' + (f'.{codificacion}' if codificacion else '')
+    return directorio() / f'{nombre}{sufijo}'
+
+
+def es_publicable(traza: dict) -> bool:
+    """Sólo se congelan trazas completas con todas las entregas registradas"""
+    transportes = traza.get('transportes') or []
+    return bool(
+        traza.get('trazabilidad_completa')
+        and transportes
+        and all(t.get('estado_entrega') for t in transportes)
+    )
+
+
+def _escribir(destino: Path, contenido: bytes) -> None:
+    """Escritura atómica: los lectores nunca ven un fichero a medias"""
+    temporal = destino.with_name(destino.name + '.tmp')
+    temporal.write_bytes(contenido)
+    os.replace(temporal, destino)
+
+
+def generar(codigo: str) -> Tuple[bool, Optional[dict], str]:
+    """Genera (o confirma) la instantánea de un lote
+
+    Devuelve si quedó publicada junto con la traza compuesta y el mensaje
+    del servicio, para que quien la pidió no tenga que volver a componerla.
+    """
+    from business.services import LoteService
+
+    traza, mensaje = LoteService.obtener_trazabilidad_por_codigo(codigo)
+    if not traza or not es_publicable(traza):
+        ruta_huella = ruta(codigo, 'sha256')
+        if ruta_huella is not None and ruta_huella.exists():
+            # Había instantánea publicada: el lote cambió desde entonces
+            invalidar(codigo)
+        return False, traza, mensaje
+
+    cuerpo_json = json.dumps(traza, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    huella = hashlib.sha256(cuerpo_json).hexdigest()
+    ruta_huella = ruta(codigo, 'sha256')
+    if ruta_huella is None:
+        return False, traza, mensaje
+    if ruta_huella.exists() and ruta_huella.read_text() == huella and ruta(codigo, 'html').exists():
+        # Sin cambios en las filas: no se reescribe nada (mtime y ETag estables)
+        return True, traza, mensaje
+
+    directorio().mkdir(parents=True, exist_ok=True)
+    contenidos = {
+        'json': cuerpo_json,
+        'html': render_to_string('presentation/trazabilidad_publica.html', {'traza': traza}).encode(),
+    }
+    for formato, contenido in contenidos.items():
+        _escribir(ruta(codigo, formato), contenido)
+        _escribir(ruta(codigo, formato, 'gz'), gzip.compress(contenido, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _escribir(ruta(codigo, formato, 'br'), brotli.compress(contenido))
+    _escribir(ruta_huella, huella.encode())
+    return True, traza, mensaje
+
+
+def invalidar(codigo: str) -> None:
+    for formato in FORMATOS:
+        for extension in ['', *(ext for ext, _ in CODIFICACIONES)]:
+            fichero = ruta(codigo, formato, extension)
+            if fichero is not None:
+                fichero.unlink(missing_ok=True)
+    fichero = ruta(codigo, 'sha256')
+    if fichero is not None:
+        fichero.unlink(missing_ok=True)
+
+
+def seleccionar(codigo: str, formato: str, accept_encoding: str):
+    """Fichero a servir y su Content-Encoding según lo que acepte el cliente"""
+    aceptadas = codificaciones_aceptadas(accept_encoding, [codificacion for _, codificacion in CODIFICACIONES])
+    for extension, codificacion in CODIFICACIONES:
+        if codificacion in aceptadas:
+            fichero = ruta(codigo, formato, extension)
+            if fichero is not None and fichero.exists():
+                return fichero, codificacion
+    fichero = ruta(codigo, formato)
+    if fichero is not None and fichero.exists():
+        return fichero, None
+    return None, None
+
+
+# --- Invalidación por señales ---------------------------------------------
+
+def _invalidar_lote(lote_id) -> None:
+    codigo = LoteCultivo.objects.filter(id=lote_id).values_list('codigo_lote', flat=True).first()
+    if codigo:
+        invalidar(codigo)
+
+
+def _al_cambiar_lote(sender, instance, **kwargs):
+    invalidar(instance.codigo_lote)
+
+
+def _al_cambiar_dependiente(sender, instance, **kwargs):
+    _invalidar_lote(instance.lote_id)
+
+
+def _al_cambiar_control(sender, instance, **kwargs):
+    lote_id = (
+        ProcesoTransformacion.objects.filter(id=instance.proceso_id)
+        .values_list('lote_id', flat=True).first()
+    )
+    if lote_id:
+        _invalidar_lote(lote_id)
+
+
+def _al_crear_controles(sender, lote_ids, **kwargs):
+    codigos = LoteCultivo.objects.filter(id__in=lote_ids).values_list('codigo_lote', flat=True)
+    for codigo in codigos:
+        invalidar(codigo)
+
+
+def _al_archivar(sender, lotes, **kwargs):
+    # La próxima visita la compone desde el archivo de la temporada
+    for codigo in lotes.values():
+        invalidar(codigo)
+
+
+def conectar_senales():
+    controles_creados.connect(_al_crear_controles, dispatch_uid='snapshot_controles_creados')
+    lotes_archivados.connect(_al_archivar, dispatch_uid='snapshot_lotes_archivados')
+    for evento, senal in (('save', post_save), ('delete', post_delete)):
+        senal.connect(_al_cambiar_lote, sender=LoteCultivo, dispatch_uid=f'snapshot_lote_{evento}')
+        senal.connect(_al_cambiar_dependiente, sender=ProcesoTransformacion, dispatch_uid=f'snapshot_proceso_{evento}')
+        senal.connect(_al_cambiar_dependiente, sender=Transporte, dispatch_uid=f'snapshot_transporte_{evento}')
+        senal.connect(_al_cambiar_control, sender=ControlCalidad, dispatch_uid=f'snapshot_control_{evento}')
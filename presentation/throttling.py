@@ -0,0 +1,219 @@
+"""
+Limitación de tasa y control de admisión para los endpoints de ingesta (POST).
+
+Dos barreras, en este orden:
+
+1. Cubeta de fichas por cliente (usuario autenticado o IP): limita la tasa
+   sostenida y la ráfaga de cada casa empacadora.
+2. Cola de admisión acotada: como SQLite sólo admite un escritor, como mucho
+   ``MAX_ESCRITURAS`` peticiones escriben a la vez y ``MAX_COLA`` esperan. El
+   resto se rechaza de inmediato para que las lecturas no compitan con una
+   avalancha de escrituras. Las altas de una sola fila (``agrupable``) no
+   escriben con la escritura agrupada activa: encolan su fila para el hilo
+   escritor, y se admiten hasta ``MAX_FILAS`` a la vez para que éste pueda
+   reunirlas en una transacción.
+
+Ambas responden 429 con ``Retry-After``.
+"""
+import math
+import threading
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from core import escritura_agrupada
+
+CONFIGURACION_POR_DEFECTO = {
+    'TASA': 20.0,               # fichas por segundo y cliente
+    'RAFAGA': 40,               # capacidad de la cubeta
+    'BACKEND': 'memoria',       # 'memoria' o 'cache' (caché compartida de Django)
+    'CACHE': 'default',
+    'MAX_ESCRITURAS': 1,        # escrituras simultáneas admitidas
+    'MAX_COLA': 32,             # peticiones esperando turno
+    'ESPERA_MAXIMA': 2.0,       # segundos que una petición puede esperar en cola
+    'MAX_CLIENTES': 10000,      # cubetas retenidas en memoria
+}
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'INGESTA_LIMITES', {})}
+
+
+class CubetaMemoria:
+    """Cubetas de fichas en el proceso, protegidas por un lock"""
+
+    def __init__(self):
+        self._cubetas = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, cliente, tasa, rafaga, max_clientes):
+        """Devuelve 0 si hay ficha disponible, o los segundos hasta la siguiente"""
+        ahora = time.monotonic()
+        with self._lock:
+            fichas, ultimo = self._cubetas.get(cliente, (rafaga, ahora))
+            fichas = min(rafaga, fichas + (ahora - ultimo) * tasa)
+            if fichas >= 1:
+                self._cubetas[cliente] = (fichas - 1, ahora)
+                espera = 0.0
+            else:
+                self._cubetas[cliente] = (fichas, ahora)
+                espera = (1 - fichas) / tasa
+            if len(self._cubetas) > max_clientes:
+                self._purgar(ahora, tasa, rafaga)
+        return espera
+
+    def _purgar(self, ahora, tasa, rafaga):
+        # Una cubeta llena equivale a no tener cubeta
+        llenas = [c for c, (f, u) in self._cubetas.items() if f + (ahora - u) * tasa >= rafaga]
+        for cliente in llenas:
+            del self._cubetas[cliente]
+
+    def reiniciar(self):
+        with self._lock:
+            self._cubetas.clear()
+
+
+class CubetaCache:
+    """Cubetas de fichas en la caché de Django, compartidas entre procesos
+
+    La lectura-modificación-escritura no es atómica: bajo concurrencia alta
+    entre procesos el límite es aproximado, lo cual basta para repartir carga.
+    """
+
+    def consumir(self, cliente, tasa, rafaga, max_clientes):
+        cache = caches[configuracion()['CACHE']]
+        clave = f'ingesta:cubeta:{cliente}'
+        ahora = time.time()
+        fichas, ultimo = cache.get(clave, (rafaga, ahora))
+        fichas = min(rafaga, fichas + (ahora - ultimo) * tasa)
+        espera = 0.0
+        if fichas >= 1:
+            fichas -= 1
+        else:
+            espera = (1 - fichas) / tasa
+        cache.set(clave, (fichas, ahora), timeout=math.ceil(rafaga / tasa) + 1)
+        return espera
+
+    def reiniciar(self):
+        pass
+
+
+class AdmisionEscrituras:
+    """Cola de admisión acotada con métricas de profundidad y carga rechazada"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turno = threading.Condition(self._lock)
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.en_curso = 0
+            self.en_cola = 0
+            self.max_cola_observada = 0
+            self.admitidas = 0
+            self.rechazadas_tasa = 0
+            self.rechazadas_cola = 0
+            self.rechazadas_espera = 0
+
+    def entrar(self, max_escrituras, max_cola, espera_maxima) -> bool:
+        with self._lock:
+            if self.en_curso >= max_escrituras and self.en_cola >= max_cola:
+                self.rechazadas_cola += 1
+                return False
+            self.en_cola += 1
+            self.max_cola_observada = max(self.max_cola_observada, self.en_cola)
+            limite = time.monotonic() + espera_maxima
+            try:
+                while self.en_curso >= max_escrituras:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self.rechazadas_espera += 1
+                        return False
+                    self._turno.wait(restante)
+            finally:
+                self.en_cola -= 1
+            self.en_curso += 1
+            self.admitidas += 1
+            return True
+
+    def salir(self):
+        with self._lock:
+            self.en_curso -= 1
+            # Con límites distintos por vista, el primero en despertar puede no caber
+            self._turno.notify_all()
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'en_curso': self.en_curso,
+                'en_cola': self.en_cola,
+                'max_cola_observada': self.max_cola_observada,
+                'admitidas': self.admitidas,
+                'rechazadas_tasa': self.rechazadas_tasa,
+                'rechazadas_cola': self.rechazadas_cola,
+                'rechazadas_espera': self.rechazadas_espera,
+            }
+
+    def registrar_rechazo_tasa(self):
+        with self._lock:
+            self.rechazadas_tasa += 1
+
+
+cubeta_memoria = CubetaMemoria()
+cubeta_cache = CubetaCache()
+admision = AdmisionEscrituras()
+
+
+def identificar_cliente(request) -> str:
+    """Clave de la cubeta: una identidad que el cliente no elige
+
+    La cabecera ``X-Cliente-Id`` no interviene: rotándola, un cliente
+    obtendría cubetas nuevas sin límite.
+    """
+    usuario = getattr(request, 'user', None)
+    if usuario is not None and usuario.is_authenticated:
+        return f'usuario:{usuario.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', 'anonimo')}"
+
+
+def _demasiadas_peticiones(mensaje, reintentar_en):
+    response = JsonResponse({'success': False, 'message': mensaje}, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(reintentar_en)))
+    return response
+
+
+def controlar_ingesta(view_func=None, *, agrupable: bool = False):
+    """Decorador para las vistas de escritura: limita la tasa y acota la cola
+
+    ``@controlar_ingesta(agrupable=True)`` marca las altas de una sola fila
+    que pasan por el escritor agrupado.
+    """
+    if view_func is None:
+        return partial(controlar_ingesta, agrupable=agrupable)
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        config = configuracion()
+        max_escrituras = config['MAX_ESCRITURAS']
+        if agrupable and escritura_agrupada.activa():
+            max_escrituras = max(max_escrituras, escritura_agrupada.configuracion()['MAX_FILAS'])
+        cubeta = cubeta_cache if config['BACKEND'] == 'cache' else cubeta_memoria
+        espera = cubeta.consumir(
+            identificar_cliente(request), config['TASA'], config['RAFAGA'], config['MAX_CLIENTES']
+        )
+        if espera > 0:
+            admision.registrar_rechazo_tasa()
+            return _demasiadas_peticiones("Límite de peticiones excedido", espera)
+
+        if not admision.entrar(max_escrituras, config['MAX_COLA'], config['ESPERA_MAXIMA']):
+            return _demasiadas_peticiones("Servidor saturado, reintente más tarde", config['ESPERA_MAXIMA'])
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            admision.salir()
+
+    return _wrapped_view
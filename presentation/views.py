@@ -1,23 +1,48 @@
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views import View
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.decorators import method_decorator
+import asyncio
 import json
+import time
+from datetime import datetime, time as datetime_time
+from business.eventos import configuracion as configuracion_eventos, eventos_transporte
 from business.services import (
     LoteService, 
     TransformacionService, 
-    TransporteService
-)
-from .serializers import (
-    LoteCultivoSerializer,
-    ProcesoTransformacionSerializer,
-    TransporteSerializer,
-    EntregaSerializer
+    ControlCalidadService,
+    TransporteService,
+    EstimacionTransporteService,
+    GenealogiaService,
+    GeoService,
+    ResumenService,
+    AuditoriaService
 )
+from .throttling import admision, controlar_ingesta
+from .http import condicional
+
+# Los serializadores (Django REST framework) se importan dentro de cada POST:
+# DRF es la importación más costosa del arranque y las lecturas no lo usan.
+
+
+def version_lotes(request, lote_id=None):
+    """Versión del recurso para el GET condicional (una sola consulta agregada)"""
+    from core.repositories import LoteRepository
+    if lote_id:
+        ultima, total = LoteRepository.version_trazabilidad(lote_id)
+        # Lote inexistente o archivado: sin validadores
+        return (ultima, total) if total else None
+    return LoteRepository.version_listado()
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(controlar_ingesta, name='post')
+@method_decorator(condicional(version_lotes), name='get')
 class LoteCultivoView(View):
     """Vista para gestión de Lotes de Cultivo"""
     
@@ -39,7 +64,7 @@ class LoteCultivoView(View):
         
         # Listar todos los lotes
         from core.repositories import LoteRepository
-        lotes = LoteRepository.obtener_todos()
+        lotes = LoteRepository.listar_vistas()
         data = [
             {
                 'id': l.id,
@@ -59,6 +84,7 @@ class LoteCultivoView(View):
     def post(self, request):
         try:
             data = json.loads(request.body)
+            from .serializers import LoteCultivoSerializer
             serializer = LoteCultivoSerializer(data=data)
             
             if serializer.is_valid():
@@ -95,12 +121,14 @@ class LoteCultivoView(View):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(controlar_ingesta(agrupable=True), name='post')
 class ProcesoTransformacionView(View):
     """Vista para gestión de Procesos de Transformación"""
     
     def post(self, request):
         try:
             data = json.loads(request.body)
+            from .serializers import ProcesoTransformacionSerializer
             serializer = ProcesoTransformacionSerializer(data=data)
             
             if serializer.is_valid():
@@ -134,12 +162,61 @@ class ProcesoTransformacionView(View):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(controlar_ingesta, name='post')
+class ControlCalidadView(View):
+    """Vista para registrar controles de calidad (uno o una lista)"""
+    
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            es_lista = isinstance(data, list)
+            if es_lista and len(data) > settings.CONTROLES_MAX_POR_PETICION:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'Máximo {settings.CONTROLES_MAX_POR_PETICION} controles por petición'
+                }, status=400)
+            
+            from .serializers import ControlCalidadSerializer
+            serializer = ControlCalidadSerializer(data=data, many=es_lista)
+            
+            if serializer.is_valid():
+                # Usar el servicio de negocio
+                datos = serializer.validated_data if es_lista else [serializer.validated_data]
+                resultado, mensaje = ControlCalidadService.registrar_controles(datos)
+                if resultado:
+                    return JsonResponse({
+                        'success': True,
+                        'data': resultado,
+                        'message': mensaje
+                    }, status=201)
+                else:
+                    return JsonResponse({
+                        'success': False,
+                        'message': mensaje
+                    }, status=400)
+            else:
+                return JsonResponse({
+                    'success': False,
+                    'errors': serializer.errors,
+                    'message': 'Datos inválidos'
+                }, status=400)
+                
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Error en el formato JSON'
+            }, status=400)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(controlar_ingesta(agrupable=True), name='post')
 class TransporteView(View):
     """Vista para gestión de Transportes"""
     
     def post(self, request):
         try:
             data = json.loads(request.body)
+            from .serializers import TransporteSerializer
             serializer = TransporteSerializer(data=data)
             
             if serializer.is_valid():
@@ -173,12 +250,14 @@ class TransporteView(View):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(controlar_ingesta, name='post')
 class EntregaView(View):
     """Vista para registrar entregas"""
     
     def post(self, request, transporte_id):
         try:
             data = json.loads(request.body)
+            from .serializers import EntregaSerializer
             serializer = EntregaSerializer(data=data)
             
             if serializer.is_valid():
@@ -211,14 +290,432 @@ class EntregaView(View):
             }, status=400)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(controlar_ingesta, name='post')
+class LecturaTemperaturaView(View):
+    """Vista para registrar lecturas de temperatura en ruta"""
+    
+    def post(self, request, transporte_id):
+        try:
+            data = json.loads(request.body)
+            from .serializers import LecturaTemperaturaSerializer
+            serializer = LecturaTemperaturaSerializer(data=data)
+            
+            if serializer.is_valid():
+                resultado, mensaje = TransporteService.registrar_temperatura(
+                    transporte_id, serializer.validated_data['temperatura']
+                )
+                if resultado:
+                    return JsonResponse({
+                        'success': True,
+                        'data': resultado,
+                        'message': mensaje
+                    }, status=200)
+                else:
+                    return JsonResponse({
+                        'success': False,
+                        'message': mensaje
+                    }, status=404)
+            else:
+                return JsonResponse({
+                    'success': False,
+                    'errors': serializer.errors,
+                    'message': 'Datos inválidos'
+                }, status=400)
+                
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Error en el formato JSON'
+            }, status=400)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(controlar_ingesta, name='post')
+class UbicacionView(View):
+    """Vista para asignar coordenadas a una finca o a un destino"""
+    
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            from .serializers import UbicacionSerializer
+            serializer = UbicacionSerializer(data=data)
+            
+            if serializer.is_valid():
+                resultado, mensaje = GeoService.ubicar(**serializer.validated_data)
+                if resultado:
+                    return JsonResponse({
+                        'success': True,
+                        'data': resultado,
+                        'message': mensaje
+                    }, status=200)
+                else:
+                    return JsonResponse({
+                        'success': False,
+                        'message': mensaje
+                    }, status=404)
+            else:
+                return JsonResponse({
+                    'success': False,
+                    'errors': serializer.errors,
+                    'message': 'Datos inválidos'
+                }, status=400)
+                
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Error en el formato JSON'
+            }, status=400)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(controlar_ingesta, name='post')
+class EnlaceGenealogiaView(View):
+    """Vista para registrar repartos y mezclas entre lotes, procesos y transportes"""
+    
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            from .serializers import EnlaceGenealogiaSerializer
+            serializer = EnlaceGenealogiaSerializer(data=data)
+            
+            if serializer.is_valid():
+                # Usar el servicio de negocio
+                resultado, mensaje = GenealogiaService.registrar_enlace(serializer.validated_data)
+                if resultado:
+                    return JsonResponse({
+                        'success': True,
+                        'data': resultado,
+                        'message': mensaje
+                    }, status=201)
+                else:
+                    return JsonResponse({
+                        'success': False,
+                        'message': mensaje
+                    }, status=400)
+            else:
+                return JsonResponse({
+                    'success': False,
+                    'errors': serializer.errors,
+                    'message': 'Datos inválidos'
+                }, status=400)
+                
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Error en el formato JSON'
+            }, status=400)
+
+
+def linaje_view(request, tipo, nodo_id):
+    """Trazabilidad hacia adelante o hacia atrás de un lote, proceso o transporte"""
+    direccion = request.GET.get('direccion', 'adelante')
+    linaje, mensaje = GenealogiaService.obtener_linaje(tipo, nodo_id, direccion)
+    if linaje:
+        return JsonResponse({
+            'success': True,
+            'data': linaje,
+            'message': mensaje
+        })
+    return JsonResponse({
+        'success': False,
+        'message': mensaje
+    }, status=404)
+
+
+def consumidores_finca_view(request):
+    """Envíos que recibieron fruta de una finca"""
+    finca = request.GET.get('finca', '').strip()
+    if not finca:
+        return JsonResponse({
+            'success': False,
+            'message': 'El parámetro finca es obligatorio'
+        }, status=400)
+    
+    resultado, mensaje = GenealogiaService.consumidores_por_finca(finca)
+    if resultado is None:
+        return JsonResponse({
+            'success': False,
+            'message': mensaje
+        }, status=500)
+    return JsonResponse({
+        'success': True,
+        'data': resultado,
+        'message': mensaje
+    })
+
+
+def historial_auditoria_view(request, lote_id):
+    """Últimos cambios del lote y de sus procesos, controles y transportes"""
+    try:
+        limite = int(request.GET['limite']) if 'limite' in request.GET else None
+        if limite is not None and limite < 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'message': 'El parámetro limite debe ser un entero positivo'
+        }, status=400)
+    
+    resultado, mensaje = AuditoriaService.historial(lote_id, limite)
+    if resultado is None:
+        return JsonResponse({
+            'success': False,
+            'message': mensaje
+        }, status=404)
+    return JsonResponse({
+        'success': True,
+        'data': resultado,
+        'message': mensaje
+    })
+
+
+def reconstruccion_auditoria_view(request, lote_id):
+    """Trazabilidad del lote tal como estaba en ``?fecha=`` (ISO 8601; por defecto ahora)"""
+    valor = request.GET.get('fecha', '').strip()
+    fecha = timezone.now()
+    if valor:
+        try:
+            fecha = parse_datetime(valor)
+            if fecha is None and parse_date(valor):
+                # Una fecha sin hora incluye todo ese día
+                fecha = datetime.combine(parse_date(valor), datetime_time.max)
+        except ValueError:
+            fecha = None
+        if fecha is None:
+            return JsonResponse({
+                'success': False,
+                'message': 'El parámetro fecha debe estar en formato ISO 8601'
+            }, status=400)
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+    
+    resultado, mensaje = AuditoriaService.reconstruir(lote_id, fecha)
+    if resultado is None:
+        return JsonResponse({
+            'success': False,
+            'message': mensaje
+        }, status=404)
+    return JsonResponse({
+        'success': True,
+        'data': resultado,
+        'message': mensaje
+    })
+
+
+def busqueda_geo_view(request, recurso):
+    """Lotes o transportes por caja (?bbox=), radio (?lat=&lon=&radio_km=) o cercanía (?lat=&lon=&k=)"""
+    parametros = request.GET
+    try:
+        if 'bbox' in parametros:
+            # Orden GeoJSON: oeste, sur, este, norte
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in parametros['bbox'].split(','))
+            resultado, mensaje = GeoService.buscar_en_caja(recurso, min_lat, max_lat, min_lon, max_lon)
+        elif 'lat' in parametros and 'lon' in parametros:
+            lat, lon = float(parametros['lat']), float(parametros['lon'])
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ValueError
+            if 'radio_km' in parametros:
+                radio_km = float(parametros['radio_km'])
+                if radio_km <= 0:
+                    raise ValueError
+                resultado, mensaje = GeoService.buscar_en_radio(recurso, lat, lon, radio_km)
+            else:
+                k = int(parametros.get('k', 10))
+                if not 1 <= k <= settings.GEO_MAX_RESULTADOS:
+                    raise ValueError
+                resultado, mensaje = GeoService.mas_cercanos(recurso, lat, lon, k)
+        else:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Use bbox=oeste,sur,este,norte o lat y lon con radio_km o k'
+        }, status=400)
+    
+    if resultado is None:
+        return JsonResponse({
+            'success': False,
+            'message': mensaje
+        }, status=404 if mensaje == "Recurso no válido" else 400)
+    return JsonResponse({
+        'success': True,
+        'data': resultado,
+        'message': mensaje
+    })
+
+
+def estimacion_transporte_view(request):
+    """Tiempo de tránsito esperado y riesgo de excursión térmica para un destino"""
+    destino = request.GET.get('destino', '').strip()
+    if not destino:
+        return JsonResponse({
+            'success': False,
+            'message': 'El parámetro destino es obligatorio'
+        }, status=400)
+    
+    estimacion, mensaje = EstimacionTransporteService.estimar(destino)
+    if estimacion:
+        return JsonResponse({
+            'success': True,
+            'data': estimacion,
+            'message': mensaje
+        })
+    return JsonResponse({
+        'success': False,
+        'message': mensaje
+    }, status=404)
+
+
+async def eventos_transporte_view(request):
+    """Flujo SSE de cambios en los transportes, filtrable por ?lote= o ?destino="""
+    if not hasattr(request, 'scope'):
+        return JsonResponse({
+            'success': False,
+            'message': 'El flujo de eventos requiere un servidor ASGI (config.asgi)'
+        }, status=501)
+    
+    try:
+        lote_id = int(request.GET['lote']) if request.GET.get('lote') else None
+        ultimo_id = request.headers.get('Last-Event-ID') or request.GET.get('desde')
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Los parámetros lote y Last-Event-ID deben ser enteros'
+        }, status=400)
+    
+    suscripcion = eventos_transporte.suscribir(
+        lote_id=lote_id, destino=request.GET.get('destino', '').strip() or None, ultimo_id=ultimo_id
+    )
+    if suscripcion is None:
+        response = JsonResponse({
+            'success': False,
+            'message': 'Demasiadas suscripciones activas, reintente más tarde'
+        }, status=503)
+        response['Retry-After'] = '5'
+        return response
+    
+    response = StreamingHttpResponse(_flujo_eventos(suscripcion), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Sin búfer en nginx
+    return response
+
+
+async def _flujo_eventos(suscripcion):
+    config = configuracion_eventos()
+    limite = time.monotonic() + config['DURACION_MAXIMA']
+    try:
+        yield f"retry: {config['RECONEXION_MS']}\n\n"
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                # Cierre periódico: libera conexiones que el servidor no detectó caídas
+                break
+            try:
+                evento = await asyncio.wait_for(suscripcion.cola.get(), min(config['KEEPALIVE'], restante))
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if evento is None:
+                break
+            yield f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
+    finally:
+        eventos_transporte.cancelar(suscripcion)
+
+
+def metricas_eventos_view(request):
+    """Suscriptores activos y eventos difundidos por el flujo SSE"""
+    return JsonResponse({'success': True, 'data': eventos_transporte.metricas()})
+
+
+def metricas_ingesta_view(request):
+    """Cola de escrituras, carga rechazada, escritura agrupada, auditoría y almacén de trazas"""
+    from core.almacen_trazas import almacen_trazas
+    from core.auditoria import auditor
+    from core.escritura_agrupada import escritor_agrupado
+    return JsonResponse({
+        'success': True,
+        'data': {
+            **admision.metricas(),
+            'escritura_agrupada': escritor_agrupado.metricas(),
+            'auditoria': auditor.metricas(),
+            'almacen_trazas': almacen_trazas().metricas()
+        }
+    })
+
+
+def resumen_view(request):
+    """Cifras del panel en JSON (contadores en memoria, sin recorrer las tablas)"""
+    resumen, mensaje = ResumenService.obtener_resumen()
+    if resumen is None:
+        return JsonResponse({
+            'success': False,
+            'message': mensaje
+        }, status=500)
+    return JsonResponse({
+        'success': True,
+        'data': resumen,
+        'message': mensaje
+    })
+
+
 def dashboard_view(request):
     """Vista HTML para dashboard de trazabilidad"""
     from core.repositories import LoteRepository
-    lotes = LoteRepository.obtener_todos()[:10]  # Últimos 10 lotes
+    lotes = LoteRepository.listar_vistas(limite=10)  # Últimos 10 lotes
+    resumen, _ = ResumenService.obtener_resumen()
     
     context = {
         'lotes': lotes,
-        'total_lotes': len(lotes),
+        **(resumen or {}),
         'titulo': 'Dashboard de Trazabilidad'
     }
-    return render(request, 'presentation/index.html', context)
\ No newline at end of file
+    return render(request, 'presentation/index.html', context)
+
+
+def trazabilidad_publica_view(request, codigo):
+    """Página pública del QR, servida desde la instantánea estática del lote"""
+    from . import snapshots
+    
+    formato = 'json' if (
+        request.GET.get('formato') == 'json'
+        or 'application/json' in request.headers.get('Accept', '')
+    ) else 'html'
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    if snapshots.nombre_fichero(codigo) is None:
+        # Código imposible (vacío o más largo que el campo): ni disco ni base
+        return JsonResponse({'success': False, 'message': "Lote no encontrado"}, status=404)
+    
+    trazabilidad = None
+    fichero, codificacion = snapshots.seleccionar(codigo, formato, accept_encoding)
+    if fichero is None:
+        publicada, trazabilidad, mensaje = snapshots.generar(codigo)
+        if publicada:
+            # Primera visita tras crear o modificar el lote
+            fichero, codificacion = snapshots.seleccionar(codigo, formato, accept_encoding)
+    
+    if fichero is None:
+        # Trazabilidad aún abierta: se sirve en vivo y sin caché, con la traza ya compuesta
+        if not trazabilidad:
+            return JsonResponse({'success': False, 'message': mensaje}, status=404)
+        if formato == 'json':
+            response = JsonResponse({'success': True, 'data': trazabilidad, 'message': mensaje})
+        else:
+            response = render(request, 'presentation/trazabilidad_publica.html', {'traza': trazabilidad})
+        response['Cache-Control'] = 'no-cache'
+        return response
+    
+    estado = fichero.stat()
+    etag = f'"{estado.st_mtime_ns:x}-{estado.st_size:x}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(fichero.read_bytes(), content_type=snapshots.FORMATOS[formato])
+        if codificacion:
+            response['Content-Encoding'] = codificacion
+    response['ETag'] = etag
+    response['Vary'] = 'Accept, Accept-Encoding'
+    # La URL no lleva versión y la instantánea se regenera con cada cambio del
+    # lote: vigencia corta y revalidación con ETag, nunca ``immutable``
+    response['Cache-Control'] = f'public, max-age={settings.SNAPSHOT_MAX_AGE}'
+    return response
@@ -0,0 +1,145 @@
+"""
+Utilidades comunes de las pruebas: datos sembrados por abanico (1, 10 y 100
+procesos por lote) y una clase base que cuenta consultas.
+"""
+import json
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from business.services import EstimacionTransporteService
+from core import almacen_trazas
+from core.auditoria import auditor
+from core.contadores import contadores
+from core.models import ControlCalidad, LoteCultivo, ProcesoTransformacion, Transporte
+from core.repositories import ControlCalidadRepository
+from presentation.throttling import admision, cubeta_memoria
+
+
+ABANICOS = (1, 10, 100)
+# Finca y destino de cada abanico, a más de 25 km entre sí
+UBICACIONES = {1: (-12.05, -77.04), 10: (-8.11, -79.03), 100: (-5.19, -80.63)}
+
+
+def sembrar_lote(codigo: str, abanico: int, finca: str = 'Finca Regresion') -> LoteCultivo:
+    """Lote con ``abanico`` procesos, cada uno con un control aprobado y un transporte entregado"""
+    ahora = timezone.now()
+    lote = LoteCultivo.objects.create(
+        codigo_lote=codigo, finca=finca, variedad='Kent', hectareas=Decimal('2.50'),
+        fecha_siembra=date(2025, 1, 10), fecha_cosecha=date(2025, 9, 1), responsable='Ana'
+    )
+    procesos = ProcesoTransformacion.objects.bulk_create([
+        ProcesoTransformacion(
+            lote=lote, fecha_lavado=ahora, responsable_lavado='Luis', metodo_lavado='Inmersion',
+            fecha_empaquetado=ahora + timedelta(hours=2), tipo_empaque='Caja', cantidad_empaquetada=10,
+            unidad_medida='kg'
+        )
+        for _ in range(abanico)
+    ])
+    ControlCalidadRepository.crear_varios([
+        {'proceso_id': p.id, 'inspector': 'Eva', 'estado': ControlCalidad.APROBADO,
+         'ph': Decimal('4.0'), 'brix': Decimal('14.0')}
+        for p in procesos
+    ])
+    Transporte.objects.bulk_create([
+        Transporte(
+            lote=lote, proceso=p, fecha_salida=ahora, fecha_entrega=ahora + timedelta(hours=30),
+            vehiculo='ABC-123', conductor='Juan', destino='Lima',
+            temperatura_minima=Decimal('10.0'), temperatura_maxima=Decimal('14.0'),
+            temperatura_promedio=Decimal('12.0'), recibido_por='Rosa', estado_entrega='ENTREGADO'
+        )
+        for p in procesos
+    ])
+    return lote
+
+
+class ConsultasBase(TestCase):
+    """Utilidades para contar consultas por abanico"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._snapshots = tempfile.mkdtemp()
+        cls._ajustes = override_settings(
+            SNAPSHOT_ROOT=cls._snapshots,
+            INGESTA_LIMITES={'TASA': 1e6, 'RAFAGA': 10 ** 6},
+            COMPRESION_MINIMO_BYTES=10 ** 9,
+            CONTADORES={'RECONCILIACION_SEGUNDOS': 0},
+        )
+        cls._ajustes.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._ajustes.disable()
+        shutil.rmtree(cls._snapshots, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cubeta_memoria.reiniciar()
+        admision.reiniciar()
+        auditor.reiniciar()
+        almacen_trazas.reiniciar()
+        EstimacionTransporteService.invalidar()
+        # Sin auditoría: el historial de cada prueba parte vacío
+        with override_settings(AUDITORIA={'ACTIVA': False}):
+            self.lotes = {n: sembrar_lote(f'REG-{n}', n) for n in ABANICOS}
+        # sembrar_lote usa bulk_create (sin señales): se parte de un recuento
+        contadores.reiniciar()
+        contadores.reconciliar()
+
+    def contar(self, funcion) -> int:
+        with CaptureQueriesContext(connection) as consultas:
+            funcion()
+        return len(consultas)
+
+    def assertConstante(self, caso: str, funcion_por_abanico) -> None:
+        """``funcion_por_abanico(n)`` devuelve la llamada a medir para el lote de abanico n"""
+        conteos = {n: self.contar(funcion_por_abanico(n)) for n in ABANICOS}
+        self.assertEqual(
+            len(set(conteos.values())), 1,
+            f'{caso}: el número de consultas crece con el abanico {conteos}'
+        )
+
+    def get_ok(self, url, **extra):
+        def _get():
+            response = self.client.get(url, **extra)
+            self.assertLess(response.status_code, 400, f'{url}: {response.status_code}')
+        return _get
+
+    def post_ok(self, url, cuerpo, estado=201):
+        def _post():
+            response = self.client.post(url, json.dumps(cuerpo), content_type='application/json')
+            self.assertEqual(response.status_code, estado, response.content)
+        return _post
+
+    def proceso_de(self, n) -> ProcesoTransformacion:
+        return ProcesoTransformacion.objects.filter(lote=self.lotes[n]).first()
+
+    def datos_proceso(self, n):
+        ahora = timezone.now()
+        return {
+            'lote_id': self.lotes[n].id, 'fecha_lavado': ahora.isoformat(),
+            'responsable_lavado': 'Luis', 'metodo_lavado': 'Inmersion',
+            'fecha_empaquetado': (ahora + timedelta(hours=1)).isoformat(), 'tipo_empaque': 'Caja',
+            'cantidad_empaquetada': 5, 'unidad_medida': 'kg'
+        }
+
+    def datos_transporte(self, n):
+        return {
+            'lote_id': self.lotes[n].id, 'proceso_id': self.proceso_de(n).id,
+            'fecha_salida': timezone.now().isoformat(), 'vehiculo': 'XYZ-987', 'conductor': 'Juan',
+            'destino': 'Lima', 'temperatura_minima': '10.0', 'temperatura_maxima': '14.0',
+            'temperatura_promedio': '12.0'
+        }
+
+    def llamar(self, metodo, *args):
+        def _llamar():
+            resultado, mensaje = metodo(*args)
+            self.assertIsNotNone(resultado, mensaje)
+        return _llamar
@@ -0,0 +1,101 @@
+"""
+Almacén de documentos de trazabilidad (``core.almacen_trazas``): lecturas sin
+consultas, escritura desde los servicios, invalidación por señales y versión
+por lote compartida entre procesos.
+
+Ejecución: ``python manage.py test tests``
+"""
+from decimal import Decimal
+
+from django.test import override_settings
+from django.utils import timezone
+
+from business.services import ControlCalidadService, LoteService, TransporteService
+from core import almacen_trazas
+from core.models import ControlCalidad, LoteCultivo
+from core.repositories import LoteRepository
+from tests.base import ABANICOS, ConsultasBase
+
+
+class AlmacenTrazasTest(ConsultasBase):
+    """Documentos de trazabilidad servidos desde el almacén e invalidados a tiempo"""
+
+    def test_almacen_trazas(self):
+        for backend in ('memoria', 'cache'):
+            with self.subTest(backend=backend), override_settings(ALMACEN_TRAZAS={'BACKEND': backend}):
+                almacen_trazas.reiniciar()
+                codigos = dict(LoteCultivo.objects.values_list('id', 'codigo_lote'))
+                # Primera lectura: se compone con el ORM y se guarda
+                self.assertConstante('LoteService.obtener_trazabilidad', lambda n: self.llamar(
+                    LoteService.obtener_trazabilidad, self.lotes[n].id
+                ))
+                for n in ABANICOS:
+                    with self.assertNumQueries(0):
+                        traza, _ = LoteService.obtener_trazabilidad(self.lotes[n].id)
+                        por_codigo, _ = LoteService.obtener_trazabilidad_por_codigo(codigos[self.lotes[n].id])
+                    self.assertEqual(por_codigo, traza)
+                    self.assertEqual(traza, LoteService.componer_trazabilidad(self.lotes[n].id))
+
+                # Escritura a través del almacén desde el servicio
+                with self.captureOnCommitCallbacks(execute=True):
+                    transporte, _ = TransporteService.registrar_transporte({
+                        'lote_id': self.lotes[10].id, 'proceso_id': self.proceso_de(10).id,
+                        'fecha_salida': timezone.now(), 'vehiculo': 'XYZ-987', 'conductor': 'Juan',
+                        'destino': 'Cusco', 'temperatura_minima': Decimal('10.0'),
+                        'temperatura_maxima': Decimal('14.0'), 'temperatura_promedio': Decimal('12.0')
+                    })
+                with self.assertNumQueries(0):
+                    traza, _ = LoteService.obtener_trazabilidad(self.lotes[10].id)
+                self.assertIn(transporte['id'], [t['id'] for t in traza['transportes']])
+
+                # Escrituras fuera de los servicios: las señales invalidan el documento
+                with self.captureOnCommitCallbacks(execute=True):
+                    LoteRepository.actualizar(self.lotes[10].id, {'responsable': f'Beatriz {backend}'})
+                traza, _ = LoteService.obtener_trazabilidad(self.lotes[10].id)
+                self.assertEqual(traza['lote']['responsable'], f'Beatriz {backend}')
+                # Un código reasignado no devuelve el documento del lote anterior
+                with self.captureOnCommitCallbacks(execute=True):
+                    LoteRepository.actualizar(self.lotes[1].id, {'codigo_lote': f'REG-1-{backend}'})
+                self.assertIsNone(LoteService.obtener_trazabilidad_por_codigo(codigos[self.lotes[1].id])[0])
+                self.assertGreater(almacen_trazas.almacen_trazas().metricas()['aciertos'], 0)
+
+    @override_settings(ALMACEN_TRAZAS={'BACKEND': 'cache'})
+    def test_almacen_cache_entre_procesos(self):
+        # Dos instancias sobre la misma caché, como dos procesos servidores
+        almacen_trazas.reiniciar()
+        uno, otro = almacen_trazas.AlmacenCache(), almacen_trazas.AlmacenCache()
+        self.addCleanup(uno.vaciar)
+        lote_id = self.lotes[1].id
+        uno.obtener(lote_id, LoteService.componer_trazabilidad)
+        with self.assertNumQueries(0):
+            otro.obtener(lote_id, LoteService.componer_trazabilidad)
+        # La invalidación de un proceso la ve el otro
+        otro.invalidar([lote_id])
+        self.assertEqual(uno.metricas()['aciertos'], 0)
+        uno.obtener(lote_id, LoteService.componer_trazabilidad)
+        self.assertEqual(uno.metricas()['fallos'], 2)
+
+        # Un documento compuesto antes de que otro proceso invalide el lote no se sirve
+        otro.invalidar([lote_id])
+
+        def componer_e_invalidar(lote):
+            documento = LoteService.componer_trazabilidad(lote)
+            otro.invalidar([lote])
+            return documento
+
+        uno.obtener(lote_id, componer_e_invalidar)
+        uno.obtener(lote_id, LoteService.componer_trazabilidad)
+        self.assertEqual((uno.metricas()['aciertos'], uno.metricas()['fallos']), (0, 4))
+
+    def test_controles_escriben_en_el_almacen(self):
+        with override_settings(ALMACEN_TRAZAS={'BACKEND': 'memoria'}):
+            almacen_trazas.reiniciar()
+            with self.captureOnCommitCallbacks(execute=True):
+                resultado, mensaje = ControlCalidadService.registrar_controles([
+                    {'proceso_id': self.proceso_de(n).id, 'inspector': 'Eva', 'estado': ControlCalidad.PENDIENTE}
+                    for n in (1, 10)
+                ])
+            self.assertEqual(resultado['creados'], 2, mensaje)
+            with self.assertNumQueries(0):
+                for n in (1, 10):
+                    LoteService.obtener_trazabilidad(self.lotes[n].id)
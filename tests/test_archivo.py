@@ -0,0 +1,96 @@
+"""
+Archivado de temporadas (``ArchivoService``): las filas se mueven con SQL
+directo, sin señales de Django, así que el archivado avisa él mismo a los
+contadores, la auditoría, las instantáneas y el almacén. Las aristas de
+genealogía se quedan en la primaria.
+
+``ATTACH`` no se permite dentro de una transacción: estas pruebas no pueden
+envolverse en la de ``TestCase``.
+
+Ejecución: ``python manage.py test tests``
+"""
+import json
+import shutil
+import tempfile
+from datetime import date
+
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+
+from business.services import ArchivoService, AuditoriaService, LoteService, ResumenService
+from core import almacen_trazas
+from core.contadores import contadores
+from core.models import EnlaceGenealogia, LoteArchivado, LoteCultivo, RegistroAuditoria, Transporte
+from presentation import snapshots
+from tests.base import sembrar_lote
+
+
+class ArchivoTest(TransactionTestCase):
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(
+            ARCHIVO_DIR=f'{directorio}/archivo', SNAPSHOT_ROOT=f'{directorio}/snapshots',
+            ALMACEN_TRAZAS={'BACKEND': 'memoria'}, CONTADORES={'RECONCILIACION_SEGUNDOS': 0},
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        almacen_trazas.reiniciar()
+        with override_settings(AUDITORIA={'ACTIVA': False}):
+            self.cerrado = sembrar_lote('ARC-1', 2)
+            self.abierto = sembrar_lote('ARC-2', 2)
+        # Cosechado después del corte: sigue en la primaria
+        LoteCultivo.objects.filter(id=self.abierto.id).update(fecha_cosecha=date(2026, 3, 1))
+        self.enlace = EnlaceGenealogia.objects.create(
+            origen_tipo=EnlaceGenealogia.LOTE, origen_id=self.cerrado.id,
+            destino_tipo=EnlaceGenealogia.TRANSPORTE,
+            destino_id=Transporte.objects.filter(lote=self.abierto).values_list('id', flat=True).first(),
+        )
+        contadores.reiniciar()
+        contadores.reconciliar()
+
+    def tearDown(self):
+        for alias in [alias for alias in connections.settings if alias.startswith('archivo_')]:
+            connections[alias].close()
+            connections.settings.pop(alias)
+
+    def archivar(self):
+        resultado, mensaje = ArchivoService.archivar(date(2026, 1, 1))
+        self.assertEqual(resultado['temporadas'], {2025: 1}, mensaje)
+
+    def test_archivado_avisa_a_los_suscriptores(self):
+        self.assertEqual(self.client.get('/t/ARC-1/?formato=json').status_code, 200)
+        self.assertTrue(snapshots.ruta('ARC-1', 'json').exists())
+        LoteService.obtener_trazabilidad(self.cerrado.id)
+        total_lotes = ResumenService.obtener_resumen()[0]['total_lotes']
+        invalidaciones = almacen_trazas.almacen_trazas().metricas()['invalidaciones']
+
+        self.archivar()
+
+        self.assertTrue(LoteArchivado.objects.filter(lote_id=self.cerrado.id, temporada=2025).exists())
+        # Contadores recontados sin esperar al hilo de reconciliación
+        self.assertEqual(ResumenService.obtener_resumen()[0]['total_lotes'], total_lotes - 1)
+        # Una entrada de auditoría por lote archivado
+        entradas = list(RegistroAuditoria.objects.filter(lote_id=self.cerrado.id).values_list('operacion', 'cambios'))
+        self.assertEqual([(operacion, json.loads(cambios)) for operacion, cambios in entradas],
+                         [(RegistroAuditoria.ARCHIVADO, {'temporada': 2025})])
+        historial, _ = AuditoriaService.historial(self.cerrado.id)
+        self.assertEqual(historial['entradas'][0]['operacion'], 'archivado')
+        # Instantánea y documento del almacén descartados: se recomponen desde el archivo
+        self.assertFalse(snapshots.ruta('ARC-1', 'json').exists())
+        self.assertEqual(almacen_trazas.almacen_trazas().metricas()['invalidaciones'], invalidaciones + 1)
+        traza, mensaje = LoteService.obtener_trazabilidad(self.cerrado.id)
+        self.assertEqual(len(traza['procesos']), 2, mensaje)
+
+    def test_genealogia_se_queda_en_la_primaria(self):
+        self.archivar()
+        self.assertTrue(EnlaceGenealogia.objects.filter(id=self.enlace.id).exists())
+        # El linaje del envío abierto sigue llegando al lote archivado por la arista
+        response = self.client.get(f'/api/genealogia/transporte/{self.enlace.destino_id}/?direccion=atras')
+        self.assertEqual(response.status_code, 200, response.content)
+        lotes = {lote['id']: lote for lote in response.json()['data']['lotes']}
+        self.assertEqual(set(lotes), {self.cerrado.id, self.abierto.id})
+        self.assertEqual(
+            (lotes[self.cerrado.id]['codigo_lote'], lotes[self.cerrado.id]['temporada_archivada']), ('ARC-1', 2025)
+        )
@@ -0,0 +1,90 @@
+"""
+Auditoría de cambios (``core.auditoria``): un INSERT por transacción antes
+de confirmarla, lecturas sin escrituras y autor de la petición.
+
+Ejecución: ``python manage.py test tests``
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models.signals import post_init
+from django.test.utils import CaptureQueriesContext
+
+from core.models import LoteCultivo, RegistroAuditoria
+from core.repositories import LoteRepository
+from tests.base import ConsultasBase
+
+
+class AuditoriaTest(ConsultasBase):
+    """Las entradas se escriben con el cambio y el autor no se toma de la cabecera"""
+
+    def entradas(self, lote_id):
+        return list(RegistroAuditoria.objects.filter(lote_id=lote_id).values_list('operacion', 'actor__nombre'))
+
+    def test_entradas_en_la_transaccion(self):
+        lote_id = self.lotes[1].id
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                LoteRepository.actualizar(lote_id, {'responsable': 'Beatriz'})
+                # Pendientes hasta que se confirme la transacción
+                self.assertEqual(self.entradas(lote_id), [])
+                raise RuntimeError('deshacer')
+        # Se descartan con el cambio que auditaban
+        with transaction.atomic():
+            LoteRepository.actualizar(lote_id, {'responsable': 'Carmen'})
+        self.assertEqual(self.entradas(lote_id), [('M', 'sistema')])
+
+    def test_un_insert_por_transaccion(self):
+        with CaptureQueriesContext(connection) as consultas, transaction.atomic():
+            for n, lote in self.lotes.items():
+                LoteRepository.actualizar(lote.id, {'responsable': f'Responsable {n}'})
+            # Lo escrito en un savepoint revertido no se audita
+            try:
+                with transaction.atomic():
+                    lote_id = LoteRepository.crear({
+                        'codigo_lote': 'REV-1', 'finca': 'F', 'variedad': 'Kent', 'hectareas': '1.00',
+                        'fecha_siembra': '2025-01-01', 'fecha_cosecha': '2025-06-01', 'responsable': 'Ana'
+                    }).id
+                    raise RuntimeError('deshacer')
+            except RuntimeError:
+                pass
+        inserciones = [q for q in consultas if q['sql'].startswith('INSERT INTO "core_registroauditoria"')]
+        self.assertEqual(len(inserciones), 1)
+        self.assertEqual(RegistroAuditoria.objects.count(), len(self.lotes))
+        self.assertEqual(self.entradas(lote_id), [])
+
+    def test_cambio_sin_post_init(self):
+        self.assertFalse(post_init.has_listeners(LoteCultivo))
+        lote = LoteCultivo.objects.get(id=self.lotes[1].id)
+        lote.responsable = 'Beatriz'
+        lote.save()
+        # Sin cambios respecto a la base: no hay entrada
+        lote.save()
+        entradas = RegistroAuditoria.objects.filter(lote_id=lote.id).values_list('operacion', 'cambios')
+        self.assertEqual([(op, json.loads(c)) for op, c in entradas], [('M', {'responsable': 'Beatriz'})])
+
+    def test_fuera_de_transaccion(self):
+        LoteRepository.actualizar(self.lotes[1].id, {'responsable': 'Beatriz'})
+        self.assertEqual(self.entradas(self.lotes[1].id), [('M', 'sistema')])
+
+    def test_lectura_no_escribe(self):
+        LoteRepository.actualizar(self.lotes[1].id, {'responsable': 'Beatriz'})
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(f'/api/auditoria/lotes/{self.lotes[1].id}/')
+        self.assertFalse([q for q in consultas if not q['sql'].upper().startswith('SELECT')])
+
+    def test_actor_de_la_peticion(self):
+        def alta(codigo, **cabeceras):
+            response = self.client.post('/api/lotes/', json.dumps({
+                'codigo_lote': codigo, 'finca': 'F', 'variedad': 'Kent', 'hectareas': '1.00',
+                'fecha_siembra': '2025-01-01', 'fecha_cosecha': '2025-06-01', 'responsable': 'Ana'
+            }), content_type='application/json', REMOTE_ADDR='10.0.0.7', **cabeceras)
+            self.assertEqual(response.status_code, 201, response.content)
+            return self.entradas(LoteCultivo.objects.get(codigo_lote=codigo).id)
+
+        self.assertEqual(alta('ACT-1'), [('C', 'ip:10.0.0.7')])
+        self.assertEqual(alta('ACT-2', HTTP_X_ACTOR='balanza-3'), [('C', 'ip:10.0.0.7 dispositivo:balanza-3')])
+        usuario = User.objects.create_user('ana')
+        self.client.force_login(usuario)
+        self.assertEqual(alta('ACT-3', HTTP_X_ACTOR='admin'), [('C', 'usuario:ana dispositivo:admin')])
@@ -0,0 +1,53 @@
+"""
+Negociación de ``Accept-Encoding`` en la compresión de respuestas y en las
+instantáneas precomprimidas: una codificación con ``q=0`` queda rechazada.
+
+Ejecución: ``python manage.py test tests``
+"""
+from django.test import SimpleTestCase, override_settings
+
+from presentation.http import codificaciones_aceptadas
+from tests.base import ConsultasBase
+
+
+class CodificacionesAceptadasTest(SimpleTestCase):
+
+    def test_pesos(self):
+        casos = {
+            'gzip, br': {'gzip', 'br'},
+            'gzip;q=0, br': {'br'},
+            'br;q=0, gzip;q=0.5': {'gzip'},
+            'GZIP; Q=0.0': set(),
+            '*': {'gzip', 'br'},
+            '*;q=0, gzip': {'gzip'},
+            'br;q=0, *': {'gzip'},
+            'gzip;q=x': set(),
+            'identity, deflate': set(),
+            'gzipped, xbr': set(),
+            '': set(),
+        }
+        for cabecera, esperado in casos.items():
+            with self.subTest(cabecera=cabecera):
+                self.assertEqual(codificaciones_aceptadas(cabecera, ('br', 'gzip')), esperado)
+
+
+class CompresionTest(ConsultasBase):
+
+    @override_settings(COMPRESION_MINIMO_BYTES=0)
+    def test_q_cero_no_comprime(self):
+        for cabecera in ('gzip;q=0', 'gzip;q=0, br;q=0', 'identity'):
+            with self.subTest(cabecera=cabecera):
+                response = self.client.get('/api/lotes/', HTTP_ACCEPT_ENCODING=cabecera)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get('/api/lotes/', HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_instantanea_sin_precomprimida_rechazada(self):
+        url = '/t/REG-1/?formato=json'
+        self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0, br;q=0')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
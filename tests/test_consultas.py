@@ -0,0 +1,333 @@
+"""
+Regresión de consultas: cada endpoint de ``config/urls.py`` y cada método
+público de los servicios de lotes, procesos y transportes debe ejecutar el
+mismo número de consultas con 1, 10 o 100 procesos/controles/transportes por
+lote. Un N+1 reintroducido hace fallar la prueba del endpoint afectado.
+
+Ejecución: ``python manage.py test tests``
+
+Al añadir un endpoint o un método de servicio, añada aquí su caso.
+"""
+import math
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from business.services import (
+    AuditoriaService, EstimacionTransporteService, GeoService, LoteService, ResumenService,
+    TransformacionService, TransporteService
+)
+from core.auditoria import contexto_actor
+from core.contadores import contadores
+from core.models import ControlCalidad, EnlaceGenealogia, LoteCultivo, ProcesoTransformacion, Transporte
+from core.repositories import ControlCalidadRepository, LoteRepository
+from tests.base import ABANICOS, ConsultasBase, UBICACIONES
+
+
+class EndpointsConsultasTest(ConsultasBase):
+    """Número de consultas constante para cada ruta de config/urls.py"""
+
+    def test_dashboard(self):
+        # El abanico del panel es el número de lotes: se añaden lotes entre mediciones
+        conteos = []
+        for n in ABANICOS:
+            LoteCultivo.objects.bulk_create([
+                LoteCultivo(
+                    codigo_lote=f'PANEL-{n}-{i}', finca='F', variedad='Kent', hectareas=1,
+                    fecha_siembra=date(2025, 1, 1), fecha_cosecha=date(2025, 6, 1), responsable='Ana'
+                )
+                for i in range(n)
+            ])
+            conteos.append(self.contar(self.get_ok('/')))
+        self.assertEqual(len(set(conteos)), 1, conteos)
+
+    def test_listado_lotes(self):
+        conteos = []
+        for n in ABANICOS:
+            LoteCultivo.objects.bulk_create([
+                LoteCultivo(
+                    codigo_lote=f'LISTA-{n}-{i}', finca='F', variedad='Kent', hectareas=1,
+                    fecha_siembra=date(2025, 1, 1), fecha_cosecha=date(2025, 6, 1), responsable='Ana'
+                )
+                for i in range(n)
+            ])
+            conteos.append(self.contar(self.get_ok('/api/lotes/')))
+        self.assertEqual(len(set(conteos)), 1, conteos)
+
+    def test_detalle_lote(self):
+        self.assertConstante('GET /api/lotes/<id>/', lambda n: self.get_ok(f'/api/lotes/{self.lotes[n].id}/'))
+
+    def test_detalle_lote_no_modificado(self):
+        etags = {n: self.client.get(f'/api/lotes/{self.lotes[n].id}/')['ETag'] for n in ABANICOS}
+        self.assertConstante('GET /api/lotes/<id>/ (304)', lambda n: self.get_ok(
+            f'/api/lotes/{self.lotes[n].id}/', HTTP_IF_NONE_MATCH=etags[n]
+        ))
+
+    def test_crear_lote(self):
+        self.assertConstante('POST /api/lotes/', lambda n: self.post_ok('/api/lotes/', {
+            'codigo_lote': f'NUEVO-{n}', 'finca': 'F', 'variedad': 'Kent', 'hectareas': '1.00',
+            'fecha_siembra': '2025-01-01', 'fecha_cosecha': '2025-06-01', 'responsable': 'Ana'
+        }))
+
+    def test_trazabilidad_publica(self):
+        # Primera visita: genera la instantánea; las siguientes no tocan la base
+        self.assertConstante('GET /t/<codigo>/ (generación)', lambda n: self.get_ok(f'/t/REG-{n}/'))
+        for n in ABANICOS:
+            self.assertEqual(self.contar(self.get_ok(f'/t/REG-{n}/')), 0)
+
+    def test_trazabilidad_publica_en_vivo(self):
+        # Sin entrega registrada la traza no se congela y se sirve en vivo
+        Transporte.objects.update(estado_entrega='', fecha_entrega=None)
+        self.assertConstante('GET /t/<codigo>/ (en vivo)', lambda n: self.get_ok(f'/t/REG-{n}/?formato=json'))
+        # La traza se compone una sola vez por petición
+        self.assertEqual(
+            self.contar(self.get_ok('/t/REG-10/?formato=json')),
+            self.contar(lambda: LoteService.obtener_trazabilidad_por_codigo('REG-10'))
+        )
+
+    def test_trazabilidad_publica_codigo_invalido(self):
+        for codigo in ('x' * 5000, '%E2%82%AC' * 100):
+            with self.assertNumQueries(0):
+                response = self.client.get(f'/t/{codigo}/')
+            self.assertEqual(response.status_code, 404)
+
+    def test_crear_proceso(self):
+        self.assertConstante('POST /api/procesos/', lambda n: self.post_ok('/api/procesos/', self.datos_proceso(n)))
+
+    def test_crear_controles(self):
+        # El abanico aquí es el tamaño del lote de controles, repartido entre procesos
+        # distintos. bulk_create parte las inserciones según el límite de parámetros
+        # de SQLite: esa sentencia extra por bloque es el único crecimiento admitido.
+        campos = [f for f in ControlCalidad._meta.concrete_fields if not f.primary_key]
+        por_sentencia = connection.ops.bulk_batch_size(campos, [None] * max(ABANICOS))
+        conteos = {}
+        for n in ABANICOS:
+            procesos = ProcesoTransformacion.objects.filter(lote=self.lotes[n]).values_list('id', flat=True)
+            cuerpo = [
+                {'proceso_id': proceso_id, 'inspector': 'Eva', 'estado': 'A', 'ph': '4.1', 'brix': '15.0'}
+                for proceso_id in procesos
+            ]
+            total = self.contar(self.post_ok('/api/controles/', cuerpo))
+            conteos[n] = total - math.ceil(n / por_sentencia)
+        self.assertEqual(len(set(conteos.values())), 1, f'POST /api/controles/: {conteos}')
+
+    def test_crear_transporte(self):
+        self.assertConstante('POST /api/transportes/', lambda n: self.post_ok('/api/transportes/', self.datos_transporte(n)))
+
+    def test_estimacion_transporte(self):
+        def estimar(n):
+            def _estimar():
+                # Cada medición reconstruye los modelos sobre los transportes sembrados
+                EstimacionTransporteService.invalidar()
+                self.get_ok('/api/transportes/estimacion/?destino=Lima')()
+            return _estimar
+        self.assertConstante('GET /api/transportes/estimacion/', estimar)
+
+    def test_registrar_entrega(self):
+        transportes = {n: Transporte.objects.filter(lote=self.lotes[n]).first() for n in ABANICOS}
+        self.assertConstante('POST /api/entregas/<id>/', lambda n: self.post_ok(
+            f'/api/entregas/{transportes[n].id}/', {'recibido_por': 'Rosa'}, estado=200
+        ))
+
+    def test_lectura_temperatura(self):
+        transportes = {n: Transporte.objects.filter(lote=self.lotes[n]).first() for n in ABANICOS}
+        self.assertConstante('POST /api/transportes/<id>/temperatura/', lambda n: self.post_ok(
+            f'/api/transportes/{transportes[n].id}/temperatura/', {'temperatura': '16.5'}, estado=200
+        ))
+
+    def test_eventos_transporte(self):
+        # El flujo SSE no consulta la base (el cliente de pruebas no es ASGI: 501)
+        for n in ABANICOS:
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(f'/api/transportes/eventos/?lote={self.lotes[n].id}')
+            self.assertEqual(response.status_code, 501)
+            self.assertEqual(len(consultas), 0)
+        self.assertEqual(self.contar(self.get_ok('/api/metricas/eventos/')), 0)
+
+    def test_crear_enlace(self):
+        self.assertConstante('POST /api/genealogia/enlaces/', lambda n: self.post_ok('/api/genealogia/enlaces/', {
+            'origen_tipo': 'L', 'origen_id': self.lotes[n].id,
+            'destino_tipo': 'P', 'destino_id': self.proceso_de(ABANICOS[0]).id
+        }))
+
+    def test_linaje(self):
+        # Cada lote mezcla fruta en el primer proceso del siguiente abanico
+        for origen, destino in zip(ABANICOS, ABANICOS[1:]):
+            EnlaceGenealogia.objects.create(
+                origen_tipo='L', origen_id=self.lotes[origen].id,
+                destino_tipo='P', destino_id=self.proceso_de(destino).id
+            )
+        for direccion in ('adelante', 'atras'):
+            self.assertConstante(f'GET /api/genealogia/<tipo>/<id>/ ({direccion})', lambda n: self.get_ok(
+                f'/api/genealogia/lote/{self.lotes[n].id}/?direccion={direccion}'
+            ))
+
+    def test_consumidores_finca(self):
+        for n in ABANICOS:
+            LoteCultivo.objects.filter(id=self.lotes[n].id).update(finca=f'Finca {n}')
+        self.assertConstante('GET /api/genealogia/consumidores/', lambda n: self.get_ok(
+            f'/api/genealogia/consumidores/?finca=Finca%20{n}'
+        ))
+
+    def test_busqueda_geo(self):
+        # El abanico es el número de transportes con el destino buscado
+        for n in ABANICOS:
+            Transporte.objects.filter(lote=self.lotes[n]).update(destino=f'Destino {n}')
+        self.assertConstante('POST /api/geo/ubicaciones/', lambda n: self.post_ok('/api/geo/ubicaciones/', {
+            'tipo': 'destino', 'nombre': f'Destino {n}',
+            'latitud': UBICACIONES[n][0], 'longitud': UBICACIONES[n][1]
+        }, estado=200))
+        for consulta in ('radio_km=10', 'k=1'):
+            self.assertConstante(f'GET /api/geo/transportes/?{consulta}', lambda n: self.get_ok(
+                f'/api/geo/transportes/?lat={UBICACIONES[n][0]}&lon={UBICACIONES[n][1]}&{consulta}'
+            ))
+        self.assertConstante('GET /api/geo/transportes/?bbox=', lambda n: self.get_ok(
+            '/api/geo/transportes/?bbox={},{},{},{}'.format(
+                UBICACIONES[n][1] - 0.1, UBICACIONES[n][0] - 0.1, UBICACIONES[n][1] + 0.1, UBICACIONES[n][0] + 0.1
+            )
+        ))
+
+    def test_auditoria(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AuditoriaService.registrar_linea_base()
+        self.assertConstante('GET /api/auditoria/lotes/<id>/', lambda n: self.get_ok(
+            f'/api/auditoria/lotes/{self.lotes[n].id}/'
+        ))
+        self.assertConstante('GET /api/auditoria/lotes/<id>/traza/', lambda n: self.get_ok(
+            f'/api/auditoria/lotes/{self.lotes[n].id}/traza/'
+        ))
+
+    def test_resumen(self):
+        # Servido desde los contadores en memoria: ninguna consulta
+        for n in ABANICOS:
+            with CaptureQueriesContext(connection) as consultas:
+                self.get_ok('/api/resumen/')()
+            self.assertEqual(len(consultas), 0)
+
+    def test_metricas_ingesta(self):
+        self.assertConstante('GET /api/metricas/ingesta/', lambda n: self.get_ok('/api/metricas/ingesta/'))
+
+
+class ServiciosConsultasTest(ConsultasBase):
+    """Número de consultas constante para los métodos públicos de los servicios"""
+
+    def test_lote_service(self):
+        self.assertConstante('LoteService.crear_lote', lambda n: self.llamar(LoteService.crear_lote, {
+            'codigo_lote': f'SRV-{n}', 'finca': 'F', 'variedad': 'Kent', 'hectareas': Decimal('1.00'),
+            'fecha_siembra': date(2025, 1, 1), 'fecha_cosecha': date(2025, 6, 1), 'responsable': 'Ana'
+        }))
+        self.assertConstante('LoteService.obtener_trazabilidad', lambda n: self.llamar(
+            LoteService.obtener_trazabilidad, self.lotes[n].id
+        ))
+        self.assertConstante('LoteService.obtener_trazabilidad_por_codigo', lambda n: self.llamar(
+            LoteService.obtener_trazabilidad_por_codigo, f'REG-{n}'
+        ))
+
+    def test_transformacion_service(self):
+        def datos(n):
+            ahora = timezone.now()
+            return {
+                'lote_id': self.lotes[n].id, 'fecha_lavado': ahora, 'responsable_lavado': 'Luis',
+                'metodo_lavado': 'Inmersion', 'fecha_empaquetado': ahora + timedelta(hours=1),
+                'tipo_empaque': 'Caja', 'cantidad_empaquetada': 5, 'unidad_medida': 'kg'
+            }
+        self.assertConstante('TransformacionService.registrar_proceso', lambda n: self.llamar(
+            TransformacionService.registrar_proceso, datos(n)
+        ))
+
+    def test_transporte_service(self):
+        def datos(n):
+            return {
+                'lote_id': self.lotes[n].id, 'proceso_id': self.proceso_de(n).id,
+                'fecha_salida': timezone.now(), 'vehiculo': 'XYZ-987', 'conductor': 'Juan', 'destino': 'Lima',
+                'temperatura_minima': Decimal('10.0'), 'temperatura_maxima': Decimal('14.0'),
+                'temperatura_promedio': Decimal('12.0')
+            }
+        self.assertConstante('TransporteService.registrar_transporte', lambda n: self.llamar(
+            TransporteService.registrar_transporte, datos(n)
+        ))
+        transportes = {n: Transporte.objects.filter(lote=self.lotes[n]).first() for n in ABANICOS}
+        self.assertConstante('TransporteService.registrar_entrega', lambda n: self.llamar(
+            TransporteService.registrar_entrega, transportes[n].id, {'recibido_por': 'Rosa'}
+        ))
+        self.assertConstante('TransporteService.registrar_temperatura', lambda n: self.llamar(
+            TransporteService.registrar_temperatura, transportes[n].id, Decimal('9.5')
+        ))
+
+
+    def test_geo_service(self):
+        for n in ABANICOS:
+            LoteCultivo.objects.filter(id=self.lotes[n].id).update(finca=f'Finca {n}')
+        self.assertConstante('GeoService.ubicar', lambda n: self.llamar(
+            GeoService.ubicar, 'finca', f'Finca {n}', Decimal(str(UBICACIONES[n][0])), Decimal(str(UBICACIONES[n][1]))
+        ))
+        self.assertConstante('GeoService.buscar_en_radio', lambda n: self.llamar(
+            GeoService.buscar_en_radio, 'lotes', *UBICACIONES[n], 10
+        ))
+        self.assertConstante('GeoService.mas_cercanos', lambda n: self.llamar(
+            GeoService.mas_cercanos, 'lotes', *UBICACIONES[n], 1
+        ))
+        resultado, _ = GeoService.mas_cercanos('lotes', *UBICACIONES[1], 3)
+        self.assertEqual(
+            [fila['codigo_lote'] for fila in resultado['resultados']], [f'REG-{n}' for n in ABANICOS]
+        )
+
+
+    def test_auditoria_service(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AuditoriaService.registrar_linea_base()
+        antes = timezone.now()
+        for n in ABANICOS:
+            with self.captureOnCommitCallbacks(execute=True), contexto_actor('inspector'):
+                LoteRepository.actualizar(self.lotes[n].id, {'responsable': 'Beatriz'})
+        self.assertConstante('AuditoriaService.historial', lambda n: self.llamar(
+            AuditoriaService.historial, self.lotes[n].id
+        ))
+        self.assertConstante('AuditoriaService.reconstruir', lambda n: self.llamar(
+            AuditoriaService.reconstruir, self.lotes[n].id, antes
+        ))
+        historial, _ = AuditoriaService.historial(self.lotes[100].id)
+        ultima = historial['entradas'][0]
+        self.assertEqual((ultima['operacion'], ultima['actor'], ultima['cambios']),
+                         ('modificacion', 'inspector', {'responsable': 'Beatriz'}))
+        pasado, _ = AuditoriaService.reconstruir(self.lotes[100].id, antes)
+        self.assertEqual(pasado['lote']['responsable'], 'Ana')
+        self.assertEqual((len(pasado['procesos']), len(pasado['transportes'])), (100, 100))
+        self.assertEqual(len(pasado['procesos'][0]['controles_calidad']), 1)
+        actual, _ = AuditoriaService.reconstruir(self.lotes[100].id, timezone.now())
+        self.assertEqual(actual['lote']['responsable'], 'Beatriz')
+
+
+    def test_resumen_service(self):
+        inicial, _ = ResumenService.obtener_resumen()
+        self.assertEqual((inicial['total_lotes'], inicial['lotes_en_transito']), (3, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            LoteService.crear_lote({
+                'codigo_lote': 'RES-1', 'finca': 'F', 'variedad': 'Kent', 'hectareas': Decimal('1.00'),
+                'fecha_siembra': date(2025, 1, 1), 'fecha_cosecha': date(2025, 6, 1), 'responsable': 'Ana'
+            })
+        with self.captureOnCommitCallbacks(execute=True):
+            ControlCalidadRepository.crear_varios([
+                {'proceso_id': self.proceso_de(1).id, 'inspector': 'Eva', 'estado': ControlCalidad.PENDIENTE}
+            ])
+        with self.captureOnCommitCallbacks(execute=True):
+            transporte, _ = TransporteService.registrar_transporte({
+                'lote_id': self.lotes[10].id, 'proceso_id': self.proceso_de(10).id,
+                'fecha_salida': timezone.now(), 'vehiculo': 'XYZ-987', 'conductor': 'Juan', 'destino': 'Lima',
+                'temperatura_minima': Decimal('10.0'), 'temperatura_maxima': Decimal('14.0'),
+                'temperatura_promedio': Decimal('12.0')
+            })
+        self.assertEqual(ResumenService.obtener_resumen()[0]['lotes_en_transito'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            TransporteService.registrar_entrega(transporte['id'], {'recibido_por': 'Rosa'})
+        resumen, _ = ResumenService.obtener_resumen()
+        self.assertEqual(
+            (resumen['total_lotes'], resumen['lotes_en_transito'], resumen['controles_pendientes'],
+             resumen['entregas_hoy']),
+            (4, 0, inicial['controles_pendientes'] + 1, inicial['entregas_hoy'] + 1)
+        )
+        # Los incrementos coinciden con un recuento completo
+        self.assertEqual(set(contadores.reconciliar().values()), {0})
@@ -0,0 +1,65 @@
+"""
+Contadores del panel (``core.contadores``): reconciliación contra la
+primaria, repetición de los incrementos posteriores a su instantánea y
+estado anterior leído al guardar.
+
+Ejecución: ``python manage.py test tests``
+"""
+from unittest import mock
+
+from django.db import connection
+from django.db.models.signals import post_init
+from django.test.utils import CaptureQueriesContext
+
+from business.services import ResumenService
+from core.contadores import CIFRAS, contadores
+from core.models import ControlCalidad, Transporte
+from core.repositories import ResumenRepository
+from tests.base import ConsultasBase
+
+
+class ContadoresTest(ConsultasBase):
+    """Las cifras del panel se reconcilian sobre una sola instantánea"""
+
+    def test_reconciliacion_sobre_una_instantanea(self):
+        conteos = ResumenRepository.conteos
+
+        def conteos_con_escrituras(hoy, antes_de_leer=None):
+            # Confirmado (e incluido en el recuento) antes de la instantánea: no se repite
+            contadores.aplicar(lotes=1)
+
+            def al_fijar():
+                antes_de_leer()
+                # Confirmado tras fijar la instantánea: se repite sobre el recuento
+                contadores.aplicar(pendientes=1)
+            return conteos(hoy, antes_de_leer=al_fijar)
+
+        esperado = ResumenService.obtener_resumen()[0]
+        with mock.patch.object(ResumenRepository, 'conteos', conteos_con_escrituras), \
+                CaptureQueriesContext(connection) as consultas:
+            contadores.reconciliar()
+        resumen = ResumenService.obtener_resumen()[0]
+        self.assertEqual((resumen['total_lotes'], resumen['controles_pendientes']),
+                         (esperado['total_lotes'], esperado['controles_pendientes'] + 1))
+        # Los recuentos, dentro de una única transacción
+        sql = [q['sql'].split()[0].upper() for q in consultas]
+        self.assertEqual((sql[0], sql[-1], sql.count('SELECT')), ('SAVEPOINT', 'RELEASE', 4))
+
+    def test_cambios_sin_post_init(self):
+        # Cargar instancias no pasa por ningún receptor
+        self.assertFalse(post_init.has_listeners(ControlCalidad) or post_init.has_listeners(Transporte))
+        transporte = Transporte.objects.filter(lote=self.lotes[10]).first()
+        control = ControlCalidad.objects.filter(proceso__lote=self.lotes[10]).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            transporte.fecha_entrega = None
+            transporte.save()
+            control.estado = ControlCalidad.PENDIENTE
+            control.save()
+            # Guardar otra vez sin cambios no vuelve a contar
+            transporte.save()
+            control.save()
+        resumen = ResumenService.obtener_resumen()[0]
+        self.assertEqual((resumen['lotes_en_transito'], resumen['controles_pendientes']), (1, 1))
+        contadores.reconciliar()
+        reconciliado = ResumenService.obtener_resumen()[0]
+        self.assertEqual({c: resumen[c] for c in CIFRAS}, {c: reconciliado[c] for c in CIFRAS})
@@ -0,0 +1,56 @@
+"""
+Crecimiento del tiempo de respuesta con el abanico: las lecturas por lote
+deben crecer, como mucho, de forma lineal.
+
+Mide tiempos de reloj y depende de la carga de la máquina, así que no forma
+parte de la batería normal. Ejecución:
+``PRUEBAS_TIEMPO=1 python manage.py test tests.test_crecimiento_tiempo``
+"""
+import math
+import os
+import time
+from unittest import skipUnless
+
+from core.models import Transporte
+from tests.base import ABANICOS, ConsultasBase
+
+
+# Crecimiento tolerado del tiempo de respuesta al pasar de 10 a 100 filas por
+# lote. El coste lineal (serializar 10 veces más filas) queda muy por debajo;
+# un recorrido cuadrático o una consulta por fila lo superan.
+CRECIMIENTO_MAXIMO = 25
+REPETICIONES = 5
+
+
+@skipUnless(os.environ.get('PRUEBAS_TIEMPO'), 'mide tiempos de reloj: PRUEBAS_TIEMPO=1 para ejecutarla')
+class CrecimientoTiempoTest(ConsultasBase):
+    """El tiempo de las lecturas por lote debe crecer, como mucho, de forma lineal"""
+
+    def medir(self, funcion) -> float:
+        mejor = math.inf
+        for _ in range(REPETICIONES):
+            inicio = time.perf_counter()
+            funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor
+
+    def assertCrecimientoAcotado(self, caso, funcion_por_abanico):
+        pequeno, grande = ABANICOS[-2], ABANICOS[-1]
+        t_pequeno = self.medir(funcion_por_abanico(pequeno))
+        t_grande = self.medir(funcion_por_abanico(grande))
+        self.assertLess(
+            t_grande / t_pequeno, CRECIMIENTO_MAXIMO,
+            f'{caso}: {t_pequeno * 1000:.2f} ms con {pequeno} filas y {t_grande * 1000:.2f} ms con {grande}'
+        )
+
+    def test_detalle_lote(self):
+        self.assertCrecimientoAcotado('GET /api/lotes/<id>/', lambda n: self.get_ok(f'/api/lotes/{self.lotes[n].id}/'))
+
+    def test_trazabilidad_en_vivo(self):
+        Transporte.objects.update(estado_entrega='', fecha_entrega=None)
+        self.assertCrecimientoAcotado('GET /t/<codigo>/', lambda n: self.get_ok(f'/t/REG-{n}/?formato=json'))
+
+    def test_linaje(self):
+        self.assertCrecimientoAcotado('GET /api/genealogia/lote/<id>/', lambda n: self.get_ok(
+            f'/api/genealogia/lote/{self.lotes[n].id}/'
+        ))
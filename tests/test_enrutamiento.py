@@ -0,0 +1,65 @@
+"""
+Enrutamiento primaria/réplicas: las lecturas no fijan al cliente a la primaria,
+sólo las escrituras lo hacen, y cada petición lee de una sola réplica.
+
+Ejecución: ``python manage.py test tests``
+"""
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from business.services import AuditoriaService
+from core.models import LoteCultivo, ProcesoTransformacion, Transporte
+from core.routers import PrimaryReplicaRouter, contexto_peticion, marcar_escritura
+from tests.base import ConsultasBase
+
+
+class EnrutamientoTest(ConsultasBase):
+    """Sólo las escrituras fijan al cliente a la primaria"""
+
+    def test_lecturas_sin_cookie_primaria(self):
+        from presentation.middleware import COOKIE_PRIMARIA
+        with self.captureOnCommitCallbacks(execute=True):
+            AuditoriaService.registrar_linea_base()
+        lote_id = self.lotes[10].id
+        for url in (
+            f'/api/lotes/{lote_id}/', f'/api/genealogia/lote/{lote_id}/',
+            f'/api/auditoria/lotes/{lote_id}/', f'/api/auditoria/lotes/{lote_id}/traza/',
+        ):
+            response = self.client.get(url)
+            self.assertLess(response.status_code, 400, url)
+            self.assertNotIn(COOKIE_PRIMARIA, response.cookies, url)
+        response = self.client.post('/api/lotes/', json.dumps({
+            'codigo_lote': 'RUTA-1', 'finca': 'F', 'variedad': 'Kent', 'hectareas': '1.00',
+            'fecha_siembra': '2025-01-01', 'fecha_cosecha': '2025-06-01', 'responsable': 'Ana'
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(COOKIE_PRIMARIA, response.cookies)
+
+
+@override_settings(DATABASE_READ_REPLICAS={'replica_a': {}, 'replica_b': {}, 'replica_c': {}})
+class ReplicaPorPeticionTest(SimpleTestCase):
+    """Todas las lecturas de una petición van a la misma réplica"""
+
+    def lecturas(self, router):
+        return {router.db_for_read(model) for model in (LoteCultivo, ProcesoTransformacion, Transporte) * 5}
+
+    def test_una_replica_por_peticion(self):
+        router = PrimaryReplicaRouter()
+        with mock.patch('core.routers.random.choice', side_effect=['replica_b', 'replica_c']) as eleccion:
+            with contexto_peticion():
+                self.assertEqual(self.lecturas(router), {'replica_b'})
+            with contexto_peticion():
+                self.assertEqual(self.lecturas(router), {'replica_c'})
+        # Se elige una vez por petición, en la primera lectura
+        self.assertEqual(eleccion.call_count, 2)
+
+    def test_escritura_vuelve_a_la_primaria(self):
+        router = PrimaryReplicaRouter()
+        with contexto_peticion():
+            self.assertEqual(len(self.lecturas(router)), 1)
+            marcar_escritura()
+            self.assertEqual(self.lecturas(router), {'default'})
+        with contexto_peticion(pegado_a_primaria=True):
+            self.assertEqual(self.lecturas(router), {'default'})
@@ -0,0 +1,111 @@
+"""
+Escritura agrupada (``core.escritura_agrupada``): varias altas concurrentes
+se confirman en una transacción, un lote fallido se reintenta fila a fila y
+cada petición recibe su propio error.
+
+El escritor confirma en su propia conexión, así que estas pruebas no pueden
+envolverse en la transacción de ``TestCase``: las altas se lanzan desde
+hilos, como las peticiones del servidor.
+
+Ejecución: ``python manage.py test tests``
+"""
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from business.services import TransformacionService
+from core.escritura_agrupada import EscritorAgrupado, TimeoutError
+from core.models import LoteCultivo, ProcesoTransformacion
+
+
+@override_settings(
+    ESCRITURA_AGRUPADA={'ACTIVA': True, 'MAX_FILAS': 50, 'ESPERA_MS': 200.0, 'ESPERA_RESULTADO': 10.0},
+)
+class EscrituraAgrupadaTest(TransactionTestCase):
+
+    def setUp(self):
+        self.escritor = EscritorAgrupado()
+        self.lote = LoteCultivo.objects.create(
+            codigo_lote='AGR-1', finca='Finca', variedad='Kent', hectareas=Decimal('1.50'),
+            fecha_siembra=date(2025, 1, 1), fecha_cosecha=date(2025, 6, 1), responsable='Ana'
+        )
+
+    def datos(self, lote_id=None):
+        ahora = timezone.now()
+        return {
+            'lote_id': lote_id or self.lote.id, 'fecha_lavado': ahora, 'responsable_lavado': 'Luis',
+            'metodo_lavado': 'Inmersion', 'fecha_empaquetado': ahora + timedelta(hours=2),
+            'tipo_empaque': 'Caja', 'cantidad_empaquetada': 10, 'unidad_medida': 'kg',
+        }
+
+    def concurrentes(self, lista_datos):
+        """Inserta cada fila desde su propio hilo; devuelve instancia o excepción por fila"""
+        resultados = [None] * len(lista_datos)
+        salida = threading.Barrier(len(lista_datos))
+
+        def insertar(i, datos):
+            salida.wait()
+            try:
+                resultados[i] = self.escritor.insertar(ProcesoTransformacion, datos)
+            except Exception as e:
+                resultados[i] = e
+
+        hilos = [threading.Thread(target=insertar, args=(i, d)) for i, d in enumerate(lista_datos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultados
+
+    def test_agrupa_altas_concurrentes(self):
+        resultados = self.concurrentes([self.datos() for _ in range(10)])
+        self.assertTrue(all(isinstance(r, ProcesoTransformacion) for r in resultados), resultados)
+        self.assertEqual(len({r.id for r in resultados}), 10)
+        self.assertEqual(ProcesoTransformacion.objects.filter(lote=self.lote).count(), 10)
+        metricas = self.escritor.metricas()
+        self.assertEqual(metricas['filas'], 10)
+        self.assertLess(metricas['transacciones'], 10)
+        self.assertGreater(metricas['max_filas_observadas'], 1)
+        self.assertEqual(metricas['reintentos_fila_a_fila'], 0)
+
+    def test_fila_invalida_se_reintenta_fila_a_fila(self):
+        resultados = self.concurrentes([self.datos() for _ in range(4)] + [self.datos(lote_id=10 ** 9)])
+        # Sólo la fila con el lote inexistente falla, y el error llega a quien la envió
+        self.assertIsInstance(resultados[-1], IntegrityError)
+        self.assertTrue(all(isinstance(r, ProcesoTransformacion) for r in resultados[:-1]), resultados)
+        self.assertEqual(ProcesoTransformacion.objects.filter(lote=self.lote).count(), 4)
+        self.assertGreaterEqual(self.escritor.metricas()['reintentos_fila_a_fila'], 1)
+
+    def test_error_llega_al_servicio(self):
+        with mock.patch('core.repositories.escritura_agrupada.escritor_agrupado', self.escritor):
+            resultado, mensaje = TransformacionService.registrar_proceso(self.datos(lote_id=10 ** 9))
+        self.assertIsNone(resultado)
+        self.assertTrue(mensaje.startswith('Error al registrar proceso'), mensaje)
+        self.assertFalse(ProcesoTransformacion.objects.exists())
+
+    def test_dentro_de_una_transaccion_no_usa_el_escritor(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                proceso = self.escritor.insertar(ProcesoTransformacion, self.datos())
+                self.assertIsNotNone(proceso.id)
+                raise RuntimeError('deshacer')
+        # La fila se deshizo con la transacción de quien la insertó
+        self.assertFalse(ProcesoTransformacion.objects.exists())
+        metricas = self.escritor.metricas()
+        self.assertEqual((metricas['en_transaccion'], metricas['transacciones']), (1, 0))
+
+    def test_espera_acotada(self):
+        # Sin hilo escritor la fila no se confirma: se retira de la cola a tiempo
+        with mock.patch.object(self.escritor, '_arrancar'), \
+                override_settings(ESCRITURA_AGRUPADA={'ACTIVA': True, 'ESPERA_RESULTADO': 0.05}):
+            with self.assertRaises(TimeoutError):
+                self.escritor.insertar(ProcesoTransformacion, self.datos())
+        self.assertEqual(self.escritor.metricas()['expiradas'], 1)
+        # El escritor descarta la fila retirada y sigue atendiendo las nuevas
+        proceso = self.escritor.insertar(ProcesoTransformacion, self.datos())
+        self.assertEqual(list(ProcesoTransformacion.objects.values_list('id', flat=True)), [proceso.id])
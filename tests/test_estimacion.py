@@ -0,0 +1,74 @@
+"""
+Estimación de tránsito por destino (``EstimacionTransporteService``): los
+deciles que agrega SQLite coinciden con ``statistics`` y una entrega nueva
+invalida los modelos en caché.
+
+Ejecución: ``python manage.py test tests``
+"""
+import random
+import statistics
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from business.services import EstimacionTransporteService, TransporteService
+from core.models import Transporte
+from tests.base import ConsultasBase
+
+
+class EstimacionTransporteTest(ConsultasBase):
+
+    def transportes(self, destino, horas, entregado=True, temperatura_maxima='14.0'):
+        salida = timezone.now() - timedelta(days=30)
+        proceso = self.proceso_de(1)
+        return Transporte.objects.bulk_create([
+            Transporte(
+                lote_id=proceso.lote_id, proceso=proceso, fecha_salida=salida, fecha_entrega=salida + timedelta(hours=h) if entregado else None,
+                vehiculo='ABC-123', conductor='Juan', destino=destino,
+                temperatura_minima=Decimal('10.0'), temperatura_maxima=Decimal(temperatura_maxima),
+                temperatura_promedio=Decimal('12.0'),
+            )
+            for h in horas
+        ])
+
+    def comparar(self, modelo, horas, excursiones):
+        """El modelo frente al cálculo con ``statistics`` sobre las mismas duraciones"""
+        horas = sorted(horas)
+        n = len(horas)
+        cuantiles = statistics.quantiles(horas, n=10, method='inclusive') if n > 1 else [horas[0]] * 9
+        esperado = {'mediana': statistics.median(horas), 'p10': cuantiles[0], 'p90': cuantiles[8], 'max': horas[-1]}
+        self.assertEqual((modelo['muestras'], modelo['probabilidad_excursion']), (n, round(excursiones / n, 4)))
+        self.assertEqual(modelo['transito_horas'].keys(), esperado.keys())
+        for clave, valor in esperado.items():
+            # La duración en SQLite (julianday) puede caer al otro lado del redondeo
+            self.assertAlmostEqual(modelo['transito_horas'][clave], valor, delta=0.0051)
+
+    def test_deciles_como_statistics(self):
+        aleatorio = random.Random(7)
+        casos = {'Cusco': 1, 'Arequipa': 2, 'Trujillo': 3, 'Piura': 11, 'Tacna': 137}
+        horas_por_destino = {}
+        for destino, n in casos.items():
+            horas = horas_por_destino[destino] = [round(aleatorio.uniform(2, 80), 3) for _ in range(n)]
+            self.transportes(destino, horas)
+            # Fuera de rango térmico y entregas anteriores a la salida (descartadas)
+            self.transportes(destino, horas[:1], temperatura_maxima='18.0')
+            self.transportes(destino, [-3])
+        for destino, horas in horas_por_destino.items():
+            with self.subTest(destino=destino):
+                self.comparar(EstimacionTransporteService.estimar(destino.upper())[0], horas + horas[:1], 1)
+
+    def test_variantes_del_destino(self):
+        self.transportes('Ica', [5, 9, 30])
+        self.transportes('  ica ', [1, 7])
+        self.transportes('ICA', [12], temperatura_maxima='18.0')
+        self.comparar(EstimacionTransporteService.estimar('ica')[0], [5, 9, 30, 1, 7, 12], 1)
+
+    def test_entrega_invalida_los_modelos(self):
+        self.transportes('Chiclayo', [10, 20])
+        pendiente, = self.transportes('Chiclayo', [0], entregado=False)
+        self.assertEqual(EstimacionTransporteService.estimar('Chiclayo')[0]['muestras'], 2)
+        entrega = (pendiente.fecha_salida + timedelta(hours=40)).isoformat()
+        self.assertIsNotNone(TransporteService.registrar_entrega(pendiente.id, {'fecha_entrega': entrega})[0])
+        modelo, _ = EstimacionTransporteService.estimar('Chiclayo')
+        self.assertEqual((modelo['muestras'], modelo['transito_horas']['max']), (3, 40.0))
@@ -0,0 +1,129 @@
+"""
+Comportamiento de la central de eventos de transporte (``business.eventos``)
+y del flujo SSE que la consume: filtros por lote y destino, reanudación con
+``Last-Event-ID`` y desconexión de los suscriptores lentos.
+
+Ejecución: ``python manage.py test tests``
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, override_settings
+
+from business.eventos import eventos_transporte
+from presentation.views import _flujo_eventos
+
+
+def transporte(transporte_id: int, lote_id: int, destino: str):
+    return SimpleNamespace(id=transporte_id, lote_id=lote_id, destino=destino)
+
+
+def pendientes(suscripcion) -> list:
+    """Vacía la cola del suscriptor: ids de transporte, o None si se cerró"""
+    eventos = []
+    while not suscripcion.cola.empty():
+        evento = suscripcion.cola.get_nowait()
+        eventos.append(evento and evento['transporte_id'])
+    return eventos
+
+
+@override_settings(EVENTOS_TRANSPORTE={
+    'COLA_MAXIMA': 3, 'HISTORIAL': 5, 'MAX_SUSCRIPTORES': 4, 'KEEPALIVE': 0.05, 'DURACION_MAXIMA': 0.2,
+})
+class CentralEventosTest(SimpleTestCase):
+    # ``publicar`` difiere la difusión con on_commit, que consulta la conexión
+    databases = {'default'}
+
+    def setUp(self):
+        # El historial toma su tamaño de la configuración al reiniciar
+        eventos_transporte.reiniciar()
+        self.addCleanup(eventos_transporte.reiniciar)
+
+    def publicar(self, *transportes):
+        # Fuera de una transacción on_commit difunde en el acto. Desde el bucle
+        # se llama en otro hilo, como los servicios síncronos del servidor ASGI
+        for t in transportes:
+            eventos_transporte.publicar('salida', t, temperatura=12.0)
+
+    def test_filtro_por_lote_y_destino(self):
+        async def escenario():
+            suscripciones = [
+                eventos_transporte.suscribir(lote_id=1),
+                eventos_transporte.suscribir(destino='  lima '),
+                eventos_transporte.suscribir(lote_id=2, destino='Cusco'),
+                eventos_transporte.suscribir(),
+            ]
+            await asyncio.to_thread(
+                self.publicar, transporte(1, 1, 'Lima'), transporte(2, 2, 'Cusco'), transporte(3, 2, 'LIMA')
+            )
+            await asyncio.sleep(0)
+            return [pendientes(s) for s in suscripciones]
+
+        por_lote, por_destino, ambos, todos = asyncio.run(escenario())
+        self.assertEqual(por_lote, [1])
+        self.assertEqual(por_destino, [1, 3])
+        self.assertEqual(ambos, [2])
+        self.assertEqual(todos, [1, 2, 3])
+
+    def test_reanudar_con_last_event_id(self):
+        self.publicar(*(transporte(i, 1 + i % 2, 'Lima') for i in range(1, 8)))
+
+        async def escenario():
+            resultado = {
+                'desde_4': eventos_transporte.suscribir(ultimo_id=4),
+                'lote_1': eventos_transporte.suscribir(lote_id=1, ultimo_id=4),
+                # Más pendientes que COLA_MAXIMA: sólo los más recientes
+                'desde_0': eventos_transporte.suscribir(ultimo_id=0),
+                'sin_id': eventos_transporte.suscribir(),
+            }
+            return {clave: pendientes(s) for clave, s in resultado.items()}
+
+        resultado = asyncio.run(escenario())
+        self.assertEqual(resultado['desde_4'], [5, 6, 7])
+        self.assertEqual(resultado['lote_1'], [6])
+        self.assertEqual(resultado['desde_0'], [5, 6, 7])
+        self.assertEqual(resultado['sin_id'], [])
+        self.assertEqual(eventos_transporte.metricas()['ultimo_id'], 7)
+
+    def test_desbordamiento_desconecta(self):
+        async def escenario():
+            lento = eventos_transporte.suscribir()
+            await asyncio.to_thread(self.publicar, *(transporte(i, 1, 'Lima') for i in range(1, 6)))
+            await asyncio.sleep(0)
+            # El flujo termina sin entregar nada y libera la suscripción
+            return [trozo async for trozo in _flujo_eventos(lento)]
+
+        trozos = asyncio.run(escenario())
+        self.assertEqual(trozos, ['retry: 3000\n\n'])
+        metricas = eventos_transporte.metricas()
+        self.assertEqual(metricas['suscriptores'], 0)
+        self.assertEqual(metricas['desconectados_por_lentitud'], 1)
+
+    def test_maximo_de_suscriptores(self):
+        async def escenario():
+            return [eventos_transporte.suscribir(lote_id=i) for i in range(5)]
+
+        suscripciones = asyncio.run(escenario())
+        self.assertIsNone(suscripciones[-1])
+        self.assertEqual(eventos_transporte.metricas()['suscriptores'], 4)
+        for suscripcion in suscripciones[:-1]:
+            eventos_transporte.cancelar(suscripcion)
+        self.assertEqual(eventos_transporte.metricas()['suscriptores'], 0)
+
+    def test_flujo_sse(self):
+        async def escenario():
+            suscripcion = eventos_transporte.suscribir(lote_id=1)
+            await asyncio.to_thread(self.publicar, transporte(1, 1, 'Lima'), transporte(2, 2, 'Lima'))
+            return [trozo async for trozo in _flujo_eventos(suscripcion)]
+
+        trozos = asyncio.run(escenario())
+        self.assertEqual(trozos[0], 'retry: 3000\n\n')
+        cabecera, _, datos = trozos[1].partition('data: ')
+        self.assertEqual(cabecera, 'id: 1\nevent: salida\n')
+        evento = json.loads(datos)
+        self.assertEqual((evento['transporte_id'], evento['datos']), (1, {'temperatura': 12.0}))
+        # Sin más eventos del lote: comentarios de mantenimiento hasta DURACION_MAXIMA
+        self.assertTrue(trozos[2:])
+        self.assertTrue(all(trozo == ': ping\n\n' for trozo in trozos[2:]))
+        self.assertEqual(eventos_transporte.metricas()['suscriptores'], 0)
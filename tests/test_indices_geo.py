@@ -0,0 +1,34 @@
+"""
+Índices R*Tree (``core.indices_geo``): la comprobación del sistema detecta
+los triggers perdidos y ``recrear_indices`` los restaura.
+
+Ejecución: ``python manage.py test tests``
+"""
+from decimal import Decimal
+
+from django.db import connection
+
+from business.services import GeoService
+from tests.base import ABANICOS, ConsultasBase
+
+
+class IndicesGeoTest(ConsultasBase):
+    """Los triggers que mantienen los índices R*Tree existen tras migrar"""
+
+    def test_comprobacion_de_triggers(self):
+        from core.indices_geo import comprobar_indices, recrear_indices
+        self.assertEqual(comprobar_indices(databases=['default']), [])
+        with connection.cursor() as cursor:
+            # Lo que deja una reconstrucción de la tabla (DDL transaccional: se deshace al terminar)
+            cursor.execute('DROP TRIGGER core_lote_rtree_ai')
+        errores = comprobar_indices(databases=['default'])
+        self.assertEqual([(e.id, 'core_lote_rtree_ai' in e.msg) for e in errores], [('core.E001', True)])
+
+        with connection.cursor() as cursor:
+            for sql in recrear_indices().sql:
+                cursor.execute(sql)
+        self.assertEqual(comprobar_indices(databases=['default']), [])
+        # Los triggers recreados mantienen el índice al ubicar las fincas
+        GeoService.ubicar('finca', 'Finca Regresion', Decimal('-12.05'), Decimal('-77.04'))
+        resultado, mensaje = GeoService.buscar_en_caja('lotes', -12.1, -12.0, -77.1, -77.0)
+        self.assertEqual(resultado['count'], len(ABANICOS), mensaje)
@@ -0,0 +1,44 @@
+"""
+Control de ingesta (``presentation.throttling``): la cubeta de fichas por IP y
+el turno de escritura que no esperan las altas agrupables.
+
+Ejecución: ``python manage.py test tests``
+"""
+import json
+
+from django.test import override_settings
+
+from presentation.throttling import admision
+from tests.base import ConsultasBase
+
+
+class IngestaTest(ConsultasBase):
+    """La cubeta de fichas no depende de cabeceras que elige el cliente"""
+
+    def test_cubeta_por_ip(self):
+        cuerpo = json.dumps(self.datos_proceso(1))
+        with override_settings(INGESTA_LIMITES={'TASA': 0.001, 'RAFAGA': 2}):
+            estados = [
+                self.client.post('/api/procesos/', cuerpo, content_type='application/json',
+                                 HTTP_X_CLIENTE_ID=f'dispositivo-{i}').status_code
+                for i in range(4)
+            ]
+            otra_ip = self.client.post('/api/procesos/', cuerpo, content_type='application/json',
+                                       REMOTE_ADDR='10.0.0.2').status_code
+        self.assertEqual(estados, [201, 201, 429, 429])
+        self.assertEqual(otra_ip, 201)
+
+    def test_altas_agrupables_no_esperan_turno(self):
+        # Otra escritura ocupa el único turno de MAX_ESCRITURAS
+        self.assertTrue(admision.entrar(1, 1, 0))
+        self.addCleanup(admision.salir)
+        limites = {'TASA': 1e6, 'RAFAGA': 10 ** 6, 'MAX_ESCRITURAS': 1, 'ESPERA_MAXIMA': 0.05}
+        with override_settings(INGESTA_LIMITES=limites, ESCRITURA_AGRUPADA={'ACTIVA': True}):
+            self.post_ok('/api/procesos/', self.datos_proceso(1))()
+            self.post_ok('/api/transportes/', self.datos_transporte(1))()
+            self.post_ok('/api/genealogia/enlaces/', {
+                'origen_tipo': 'L', 'origen_id': self.lotes[1].id,
+                'destino_tipo': 'L', 'destino_id': self.lotes[10].id,
+            }, estado=429)()
+        with override_settings(INGESTA_LIMITES=limites):
+            self.post_ok('/api/procesos/', self.datos_proceso(1), estado=429)()
@@ -0,0 +1,110 @@
+"""
+Resúmenes de calidad por proceso y por lote: siguen a los borrados (también
+en cascada), a los cambios de proceso y al archivado de temporadas.
+
+Ejecución: ``python manage.py test tests``
+"""
+import shutil
+import sqlite3
+import tempfile
+from decimal import Decimal
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.models import ControlCalidad, LoteCultivo, ProcesoTransformacion
+from core.repositories import ControlCalidadRepository
+from tests.base import ABANICOS, ConsultasBase
+
+
+class ResumenesCalidadTest(ConsultasBase):
+    """Los resúmenes de calidad siguen a los borrados y a los cambios de proceso"""
+
+    def anadir_controles(self, proceso, n):
+        ControlCalidadRepository.crear_varios([
+            {'proceso_id': proceso.id, 'inspector': 'Eva', 'estado': ControlCalidad.RECHAZADO,
+             'ph': Decimal('3.0'), 'brix': Decimal('10.0')}
+            for _ in range(n)
+        ])
+
+    def resumen(self, lote):
+        return ControlCalidadRepository.resumenes_por_lote(lote.id)[0]
+
+    def assertRecalculoConstante(self, caso, funcion_por_abanico, abanicos=ABANICOS):
+        """Sólo cuenta las consultas de los resúmenes: el resto de suscriptores invalida por fila"""
+        conteos = {}
+        for n in abanicos:
+            with CaptureQueriesContext(connection) as consultas:
+                funcion_por_abanico(n)()
+            conteos[n] = sum('resumencalidad' in c['sql'] for c in consultas)
+        self.assertEqual(len(set(conteos.values())), 1, f'{caso}: recálculos por fila {conteos}')
+
+    def test_borrado_en_cascada(self):
+        # El proceso borrado tiene n + 1 controles; el coste no depende de n.
+        # En el lote 1 no quedan controles y su resumen no se vuelve a insertar
+        for n in ABANICOS:
+            self.anadir_controles(self.proceso_de(n), n)
+        self.proceso_de(1).delete()
+        self.assertRecalculoConstante('borrar proceso', lambda n: self.proceso_de(n).delete, (10, 100))
+        self.assertIsNone(self.resumen(self.lotes[1]))
+        for n in (10, 100):
+            self.assertEqual(self.resumen(self.lotes[n]).total_controles, n - 1)
+
+    def test_borrado_de_controles(self):
+        for n in ABANICOS:
+            self.anadir_controles(self.proceso_de(n), n)
+        self.assertRecalculoConstante(
+            'borrar controles',
+            lambda n: ControlCalidad.objects.filter(
+                proceso=self.proceso_de(n), estado=ControlCalidad.RECHAZADO
+            ).delete
+        )
+        for n in ABANICOS:
+            resumen = self.resumen(self.lotes[n])
+            self.assertEqual((resumen.total_controles, resumen.aprobados), (n, n))
+        lote_id = self.lotes[10].id
+        self.lotes[10].delete()
+        self.assertEqual(ControlCalidadRepository.resumenes_por_lote(lote_id), (None, {}))
+
+    def test_cambio_de_proceso(self):
+        control = ControlCalidad.objects.get(proceso=self.proceso_de(1))
+        control.proceso = self.proceso_de(10)
+        control.save()
+        self.assertIsNone(self.resumen(self.lotes[1]))
+        self.assertEqual(self.resumen(self.lotes[10]).total_controles, 11)
+        _, por_proceso = ControlCalidadRepository.resumenes_por_lote(self.lotes[10].id)
+        self.assertEqual(por_proceso[self.proceso_de(10).id].total_controles, 2)
+
+    def test_archivo_sin_resumenes(self):
+        """Un archivo anterior a los resúmenes los recibe al registrarse su alias"""
+        from django.db import connections
+        from core.repositories import ArchivoRepository
+        lote = self.lotes[10]
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        with override_settings(ARCHIVO_DIR=directorio):
+            ruta = ArchivoRepository.ruta_temporada(1990)
+            filtros = [
+                (LoteCultivo, 'id = %s'), (ProcesoTransformacion, 'lote_id = %s'),
+                (ControlCalidad, 'proceso_id IN (SELECT id FROM core_procesotransformacion WHERE lote_id = %s)'),
+            ]
+            archivo = sqlite3.connect(str(ruta))
+            with connection.cursor() as cursor, archivo:
+                for model, filtro in filtros:
+                    tabla = model._meta.db_table
+                    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [tabla])
+                    archivo.execute(cursor.fetchone()[0])
+                    cursor.execute(f'SELECT * FROM "{tabla}" WHERE {filtro}', [lote.id])
+                    filas = cursor.fetchall()
+                    marcas = ', '.join('?' * len(filas[0]))
+                    archivo.executemany(f'INSERT INTO "{tabla}" VALUES ({marcas})', filas)
+            archivo.close()
+
+            alias = ArchivoRepository.alias_temporada(1990)
+            self.addCleanup(connections.settings.pop, alias)
+            self.addCleanup(connections[alias].close)
+            resumen_lote, por_proceso = ControlCalidadRepository.resumenes_por_lote(lote.id, using=alias)
+        self.assertEqual((resumen_lote.total_controles, resumen_lote.aprobados), (10, 10))
+        self.assertEqual(resumen_lote.brix_max, Decimal('14.0'))
+        self.assertEqual(len(por_proceso), 10)
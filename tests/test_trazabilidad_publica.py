@@ -0,0 +1,41 @@
+"""
+Trazabilidad pública (``/t/<codigo>/``) servida desde instantáneas: la URL no
+lleva versión, así que la respuesta se revalida con ETag en lugar de quedar
+en caché como inmutable.
+
+Ejecución: ``python manage.py test tests``
+"""
+from django.test import override_settings
+
+from core.repositories import LoteRepository
+from tests.base import ConsultasBase
+
+
+class TrazabilidadPublicaTest(ConsultasBase):
+
+    def test_revalidacion_con_etag(self):
+        url = '/t/REG-1/?formato=json'
+        primera = self.client.get(url)
+        etag = primera['ETag']
+        self.assertEqual(primera['Cache-Control'], 'public, max-age=60')
+        self.assertNotIn('immutable', primera['Cache-Control'])
+
+        for cabecera in (etag, f'"otra", {etag}', '*'):
+            with self.subTest(cabecera=cabecera):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=cabecera)
+                self.assertEqual((response.status_code, response['ETag']), (304, etag))
+        # Un ETag que sólo contiene al vigente no es una coincidencia
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"x{etag[1:]}')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SNAPSHOT_MAX_AGE=5)
+    def test_cambio_del_lote_cambia_el_etag(self):
+        url = '/t/REG-1/?formato=json'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            LoteRepository.actualizar(self.lotes[1].id, {'responsable': 'Beatriz'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=5')
+        self.assertIn(b'Beatriz', response.content)
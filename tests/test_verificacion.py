@@ -0,0 +1,105 @@
+"""
+Barrido de completitud de la trazabilidad (``VerificacionService``) sobre una
+instantánea SQLite, en serie, con el pool de procesos y desde el comando.
+
+Ejecución: ``python manage.py test tests``
+"""
+import csv
+import io
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from business.services import VerificacionService
+from core.models import LoteCultivo, ProcesoTransformacion, ResumenCalidadLote, Transporte
+from core.repositories import VerificacionRepository
+from tests.base import ABANICOS, ConsultasBase
+
+
+class VerificacionTest(ConsultasBase):
+    """El barrido por rangos detecta los lotes incompletos, en serie o con el pool"""
+
+    def setUp(self):
+        super().setUp()
+        ahora = timezone.now()
+        datos = dict(finca='Finca Regresion', variedad='Kent', hectareas=Decimal('1.00'),
+                     fecha_siembra=date(2025, 1, 10), fecha_cosecha=date(2025, 9, 1), responsable='Ana')
+        self.sin_procesos = LoteCultivo.objects.create(codigo_lote='INC-1', **datos)
+        self.sin_transporte = LoteCultivo.objects.create(codigo_lote='INC-2', **datos)
+        ProcesoTransformacion.objects.create(
+            lote=self.sin_transporte, fecha_lavado=ahora, responsable_lavado='Luis', metodo_lavado='Inmersion',
+            fecha_empaquetado=ahora + timedelta(hours=2), tipo_empaque='Caja', cantidad_empaquetada=10,
+            unidad_medida='kg'
+        )
+        # La instantánea se copia con la conexión del test, la única que ve sus filas sin confirmar
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.ruta = Path(directorio) / 'instantanea.sqlite3'
+        copia = sqlite3.connect(str(self.ruta))
+        with connection.cursor() as cursor, copia:
+            for model in (LoteCultivo, ProcesoTransformacion, Transporte, ResumenCalidadLote):
+                tabla = model._meta.db_table
+                cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [tabla])
+                copia.execute(cursor.fetchone()[0])
+                cursor.execute(f'SELECT * FROM "{tabla}"')
+                filas = cursor.fetchall()
+                if filas:
+                    marcas = ', '.join('?' * len(filas[0]))
+                    copia.executemany(f'INSERT INTO "{tabla}" VALUES ({marcas})', filas)
+        copia.close()
+
+    def incompletos(self, resultado):
+        return {lote['codigo_lote']: lote['motivos'] for lote in resultado['incompletos']}
+
+    def test_repositorio(self):
+        alias = VerificacionRepository.alias_instantanea(self.ruta)
+        try:
+            desde, hasta = VerificacionRepository.rango_ids(alias)
+            self.assertEqual((desde, hasta), (self.lotes[1].id, self.sin_transporte.id))
+            completos = VerificacionRepository.lotes_incompletos(alias, desde, self.lotes[100].id)
+            self.assertEqual(completos, (len(ABANICOS), []))
+            verificados, filas = VerificacionRepository.lotes_incompletos(alias, desde, hasta)
+            self.assertEqual(verificados, len(ABANICOS) + 2)
+            self.assertEqual([(fila[1], fila[4:]) for fila in filas], [('INC-1', (0, 0, 0)), ('INC-2', (1, 0, 0))])
+            self.assertEqual(VerificacionRepository.lotes_incompletos(alias, desde, hasta, temporada=2024), (0, []))
+        finally:
+            VerificacionRepository.liberar()
+
+    def test_rangos_completos_e_incompletos(self):
+        resultado, mensaje = VerificacionService.verificar(ruta=self.ruta, particiones=3)
+        self.assertIsNotNone(resultado, mensaje)
+        self.assertEqual(resultado['verificados'], len(ABANICOS) + 2)
+        self.assertEqual(resultado['particiones'], 3)
+        self.assertEqual(self.incompletos(resultado), {
+            'INC-1': ["Falta proceso de transformación", "Falta registro de transporte",
+                      "Falta control de calidad aprobado"],
+            'INC-2': ["Falta registro de transporte", "Falta control de calidad aprobado"],
+        })
+        # El primer rango sólo contiene lotes completos
+        resultado, _ = VerificacionService.verificar(ruta=self.ruta, particiones=5)
+        self.assertEqual(resultado['particiones'], 5)
+        self.assertEqual(set(self.incompletos(resultado)), {'INC-1', 'INC-2'})
+
+    def test_pool_igual_que_serie(self):
+        serie, mensaje = VerificacionService.verificar(ruta=self.ruta, procesos=1, particiones=4)
+        self.assertIsNotNone(serie, mensaje)
+        pool, mensaje = VerificacionService.verificar(ruta=self.ruta, procesos=2, particiones=4)
+        self.assertIsNotNone(pool, mensaje)
+        self.assertEqual(pool['procesos'], 2)
+        self.assertEqual({**pool, 'procesos': 1}, serie)
+
+    def test_comando(self):
+        salida = self.ruta.with_suffix('.csv')
+        call_command('verificar_trazabilidad', base=self.ruta, procesos=1, salida=str(salida),
+                     stdout=io.StringIO())
+        with open(salida, newline='', encoding='utf-8') as fichero:
+            filas = list(csv.reader(fichero))
+        self.assertEqual(filas[0], ['lote_id', 'codigo_lote', 'finca', 'fecha_cosecha', 'motivos'])
+        self.assertEqual([fila[1] for fila in filas[1:]], ['INC-1', 'INC-2'])